@@ -1,8 +1,12 @@
 # Copyright (c) Microsoft Corporation. All rights reserved.
 # Licensed under the MIT License.
 import sys
+import time
 import traceback
+import uuid
 from datetime import datetime
+from functools import partial
+from typing import Callable, Dict, List, Tuple
 
 from botbuilder.core import (
     BotFrameworkAdapter,
@@ -10,17 +14,76 @@ from botbuilder.core import (
     ConversationState,
     TurnContext,
 )
-from botbuilder.schema import ActivityTypes, Activity
+from botbuilder.schema import (
+    ActivityTypes,
+    Activity,
+    ConversationReference,
+    DeliveryModes,
+    ResourceResponse,
+)
+from botframework.connector import Channels
+from botframework.connector.aio import ConnectorClient
+from botframework.connector.auth import AppCredentials, ClaimsIdentity, MicrosoftAppCredentials
+
+from connector_pool import ConnectorClientPool
+from helpers.reply_coalescing import coalesce_replies, group_replies, merge_replies
+from token_validation import TokenValidationCache
+from turn_metrics import TurnMetrics
 
 
 class AdapterWithErrorHandler(BotFrameworkAdapter):
+    """
+    With `coalesce_replies` (off by default, since the user then sees one
+    message where the bot sent two), the activities a turn sends are
+    buffered and delivered when the turn ends, with consecutive text-only
+    messages merged (see helpers/reply_coalescing.py), so a turn answering
+    with a message and a prompt makes one connector call instead of two.
+    The ids of buffered activities are placeholders until the buffer is
+    delivered (see `send_activities`). A typing activity is
+    delivered at once, with whatever was buffered before it. The buffer is
+    delivered when the bot's logic returns, inside the pipeline, so a
+    connector failure goes to `on_turn_error`; what `on_turn_error` sends is
+    delivered after it. Traces are
+    dropped unless the channel is the Emulator, as `BotFrameworkAdapter`
+    does. Turns with the "expectReplies" delivery mode are answered in the
+    HTTP response; their replies are merged the same way. With buffering,
+    `TurnMetrics.send` only times the buffering; the delivery is timed by
+    `TurnMetrics.reply_flush`.
+
+    With a `connector_pool`, replies are posted through its connector
+    clients, which share a keep-alive aiohttp session per service URL and
+    cached service tokens (see connector_pool.py).
+
+    With a `token_validation_cache`, an Authorization header that was
+    validated is not validated again until its token expires (see
+    token_validation.py).
+
+    `stats` counts turns, the activities they sent and the connector calls
+    made for them.
+    """
+
+    _REPLY_BUFFER_KEY = "AdapterWithErrorHandler.replies"
+    _REPLY_IDS_KEY = "AdapterWithErrorHandler.reply_ids"
+    _PENDING_ID_PREFIX = "pending-"
+
     def __init__(
         self,
         settings: BotFrameworkAdapterSettings,
         conversation_state: ConversationState,
+        coalesce_replies: bool = False,
+        metrics: TurnMetrics = None,
+        connector_pool: ConnectorClientPool = None,
+        token_validation_cache: TokenValidationCache = None,
     ):
         super().__init__(settings)
         self._conversation_state = conversation_state
+        self.coalesce_replies = coalesce_replies
+        self.metrics = metrics
+        self.connector_pool = connector_pool
+        self.token_validation_cache = token_validation_cache
+        self.turns = 0
+        self.activities = 0
+        self.connector_calls = 0
 
         # Catch-all for errors.
         async def on_error(context: TurnContext, error: Exception):
@@ -54,3 +117,162 @@ class AdapterWithErrorHandler(BotFrameworkAdapter):
             await self._conversation_state.delete(context)
 
         self.on_turn_error = on_error
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return {
+            "turns": self.turns,
+            "activities": self.activities,
+            "connector_calls": self.connector_calls,
+        }
+
+    async def _authenticate_request(
+        self, request: Activity, auth_header: str
+    ) -> ClaimsIdentity:
+        if self.token_validation_cache is None or not auth_header:
+            return await super()._authenticate_request(request, auth_header)
+
+        started = time.perf_counter()
+        claims, cached = await self.token_validation_cache.authenticate(
+            auth_header,
+            request.channel_id,
+            request.service_url,
+            partial(super()._authenticate_request, request, auth_header),
+        )
+        if self.metrics is not None:
+            self.metrics.auth.observe(
+                time.perf_counter() - started, "cached" if cached else "validated"
+            )
+        return claims
+
+    def _get_or_create_connector_client(
+        self, service_url: str, credentials: AppCredentials
+    ) -> ConnectorClient:
+        if self.connector_pool is None:
+            return super()._get_or_create_connector_client(service_url, credentials)
+        return self.connector_pool.client(
+            service_url, credentials or MicrosoftAppCredentials.empty()
+        )
+
+    async def run_pipeline(self, context: TurnContext, callback: Callable = None):
+        self.turns += 1
+        if not self.coalesce_replies:
+            return await super().run_pipeline(context, callback)
+
+        async def logic(turn_context: TurnContext):
+            await callback(turn_context)
+            if turn_context.activity.delivery_mode != DeliveryModes.expect_replies:
+                # Inside the pipeline, so a connector failure reaches on_turn_error
+                # like any other error of the turn.
+                await self._flush(turn_context)
+
+        context.turn_state[self._REPLY_BUFFER_KEY] = []
+        context.turn_state[self._REPLY_IDS_KEY] = {}
+        try:
+            return await super().run_pipeline(context, logic if callback else None)
+        finally:
+            # Whatever on_turn_error sent, or the replies of the expectReplies turn.
+            if context.activity.delivery_mode == DeliveryModes.expect_replies:
+                # Returned in the HTTP response by process_activity.
+                self.activities += len(context.buffered_reply_activities)
+                context.buffered_reply_activities[:] = self._outgoing(
+                    context, context.buffered_reply_activities
+                )
+            else:
+                await self._flush(context)
+
+    async def send_activities(
+        self, context: TurnContext, activities: List[Activity]
+    ) -> List[ResourceResponse]:
+        """
+        While replies are buffered, the activities are not delivered yet, so
+        each response carries a placeholder id, which is replaced in place by
+        the id the channel assigns once the buffer is delivered.
+        `update_activity` and `delete_activity` deliver the buffer first and
+        accept a placeholder id. A text-only message merged into the next one
+        takes the id of the merged message.
+        """
+        replies = context.turn_state.get(self._REPLY_BUFFER_KEY)
+        if replies is None:
+            self.activities += len(activities)
+            self.connector_calls += sum(map(self._is_delivered, activities))
+            return await super().send_activities(context, activities)
+
+        responses = [
+            ResourceResponse(id=f"{self._PENDING_ID_PREFIX}{uuid.uuid4().hex}")
+            for _ in activities
+        ]
+        replies.extend(zip(activities, responses))
+        if any(activity.type == ActivityTypes.typing for activity in activities):
+            await self._flush(context)
+        return responses
+
+    async def update_activity(self, context: TurnContext, activity: Activity):
+        if context.turn_state.get(self._REPLY_BUFFER_KEY) is not None:
+            await self._flush(context)
+            activity.id = self._delivered_id(context, activity.id)
+        return await super().update_activity(context, activity)
+
+    async def delete_activity(
+        self, context: TurnContext, reference: ConversationReference
+    ):
+        if context.turn_state.get(self._REPLY_BUFFER_KEY) is not None:
+            await self._flush(context)
+            reference.activity_id = self._delivered_id(context, reference.activity_id)
+        return await super().delete_activity(context, reference)
+
+    async def _flush(self, context: TurnContext):
+        replies: List[Tuple[Activity, ResourceResponse]] = context.turn_state[
+            self._REPLY_BUFFER_KEY
+        ]
+        if not replies:
+            return
+        self.activities += len(replies)
+        kept = []
+        for activity, response in replies:
+            if self._is_kept(context, activity):
+                kept.append((activity, response))
+            else:
+                # Not delivered, so no id, as `BotFrameworkAdapter` answers.
+                self._resolve(context, response, activity.id or "")
+        replies.clear()
+        groups = group_replies([activity for activity, _ in kept])
+        outgoing = [merge_replies(group) for group in groups]
+        self.connector_calls += sum(map(self._is_delivered, outgoing))
+        started = time.perf_counter()
+        try:
+            delivered = await super().send_activities(context, outgoing)
+        finally:
+            if self.metrics is not None:
+                self.metrics.reply_flush.observe(time.perf_counter() - started)
+
+        # The groups are consecutive runs of `kept`, in order.
+        pending = iter(kept)
+        for group, response in zip(groups, delivered):
+            for _ in group:
+                self._resolve(context, next(pending)[1], response.id)
+
+    def _resolve(self, context: TurnContext, response: ResourceResponse, delivered_id: str):
+        context.turn_state[self._REPLY_IDS_KEY][response.id] = delivered_id
+        response.id = delivered_id
+
+    def _delivered_id(self, context: TurnContext, activity_id: str) -> str:
+        return context.turn_state[self._REPLY_IDS_KEY].get(activity_id, activity_id)
+
+    @classmethod
+    def _outgoing(cls, context: TurnContext, activities: List[Activity]) -> List[Activity]:
+        return coalesce_replies(
+            [activity for activity in activities if cls._is_kept(context, activity)]
+        )
+
+    @staticmethod
+    def _is_kept(context: TurnContext, activity: Activity) -> bool:
+        """Traces only go to the Emulator."""
+        return activity.type != ActivityTypes.trace or context.activity.channel_id == Channels.emulator
+
+    @staticmethod
+    def _is_delivered(activity: Activity) -> bool:
+        """Whether sending `activity` posts it to the connector."""
+        if activity.type in ("delay", ActivityTypes.invoke_response):
+            return False
+        return activity.type != ActivityTypes.trace or activity.channel_id == Channels.emulator
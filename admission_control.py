@@ -0,0 +1,201 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Limits the turns processed at once, queueing or refusing the rest."""
+
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from http import HTTPStatus
+from typing import Callable, Deque, Dict, List
+
+
+class Overloaded(Exception):
+    """A turn refused by `AdmissionController`; answer with `status` and a Retry-After header."""
+
+    def __init__(self, status: HTTPStatus, retry_after_seconds: int, reason: str):
+        super(Overloaded, self).__init__(reason)
+        self.status = status
+        self.retry_after_seconds = retry_after_seconds
+        self.reason = reason
+
+
+class _Waiter:
+    __slots__ = ("channel_id", "future")
+
+    def __init__(self, channel_id: str, future: asyncio.Future):
+        self.channel_id = channel_id
+        self.future = future
+
+
+class AdmissionController:
+    """
+    Lets at most `max_concurrent` turns run at once, and at most
+    `max_concurrent_per_channel` from one channel (0 for no channel limit).
+
+    A turn that finds no free slot waits in a FIFO queue of at most
+    `max_queued` turns, for at most `queue_timeout_seconds`; slots go to
+    the first queued turn whose channel is under its limit. A turn that
+    finds the queue full or waits too long is refused with `Overloaded`:
+    429 when its channel is at its own limit, 503 when the bot as a whole
+    is. Retry-After is the time the queue ahead of it should take to drain,
+    from a moving average of turn durations.
+
+    The controller only runs on the event loop, so it needs no lock.
+    `stats` and `channel_stats` hold the gauges.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int = 128,
+        max_concurrent_per_channel: int = 0,
+        max_queued: int = 512,
+        queue_timeout_seconds: float = 5.0,
+        clock: Callable[[], float] = time.perf_counter,
+    ):
+        if max_concurrent <= 0:
+            raise ValueError("AdmissionController(): max_concurrent must be positive.")
+        self.max_concurrent = max_concurrent
+        self.max_concurrent_per_channel = max_concurrent_per_channel
+        self.max_queued = max_queued
+        self.queue_timeout_seconds = queue_timeout_seconds
+        self._clock = clock
+        self.in_flight = 0
+        self._channel_in_flight: Dict[str, int] = {}
+        self._queue: Deque[_Waiter] = deque()
+        self._channel_queued: Dict[str, int] = {}
+        # Moving average of how long an admitted turn runs.
+        self.turn_seconds = 0.0
+        self.admitted = 0
+        self.queued_total = 0
+        self.rejected_full = 0
+        self.rejected_timeout = 0
+
+    @property
+    def queued(self) -> int:
+        return len(self._queue)
+
+    @property
+    def stats(self) -> Dict[str, float]:
+        return {
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "max_concurrent": self.max_concurrent,
+            "max_queued": self.max_queued,
+            "admitted": self.admitted,
+            "queued_total": self.queued_total,
+            "rejected_queue_full": self.rejected_full,
+            "rejected_timeout": self.rejected_timeout,
+            "turn_seconds_average": self.turn_seconds,
+        }
+
+    @property
+    def channel_stats(self) -> Dict[str, Dict[str, int]]:
+        channels = set(self._channel_in_flight) | set(self._channel_queued)
+        return {
+            channel_id: {
+                "in_flight": self._channel_in_flight.get(channel_id, 0),
+                "queued": self._channel_queued.get(channel_id, 0),
+            }
+            for channel_id in sorted(channels)
+        }
+
+    @asynccontextmanager
+    async def admit(self, channel_id: str):
+        """Holds a slot for the turn run in the `async with` block; raises `Overloaded` instead."""
+        channel_id = channel_id or ""
+        await self._acquire(channel_id)
+        started = self._clock()
+        try:
+            yield
+        finally:
+            elapsed = self._clock() - started
+            self.turn_seconds = elapsed if not self.turn_seconds else 0.9 * self.turn_seconds + 0.1 * elapsed
+            self._release(channel_id)
+
+    async def _acquire(self, channel_id: str):
+        if self._has_slot(channel_id) and not self._channel_queued.get(channel_id):
+            self._take(channel_id)
+            return
+
+        if len(self._queue) >= self.max_queued:
+            self.rejected_full += 1
+            raise self._overloaded(channel_id, "The turn queue is full.")
+
+        waiter = _Waiter(channel_id, asyncio.get_event_loop().create_future())
+        self._queue.append(waiter)
+        self._channel_queued[channel_id] = self._channel_queued.get(channel_id, 0) + 1
+        self.queued_total += 1
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), self.queue_timeout_seconds)
+        except asyncio.TimeoutError:
+            if not waiter.future.done():
+                self._dequeue(waiter)
+                self.rejected_timeout += 1
+                raise self._overloaded(channel_id, "The turn waited too long for a slot.")
+        except asyncio.CancelledError:
+            # The client went away; give the slot on if it was granted meanwhile.
+            if waiter.future.done():
+                self._release(channel_id)
+            else:
+                self._dequeue(waiter)
+            raise
+
+    def _has_slot(self, channel_id: str) -> bool:
+        return self.in_flight < self.max_concurrent and (
+            not self.max_concurrent_per_channel
+            or self._channel_in_flight.get(channel_id, 0) < self.max_concurrent_per_channel
+        )
+
+    def _take(self, channel_id: str):
+        self.in_flight += 1
+        self._channel_in_flight[channel_id] = self._channel_in_flight.get(channel_id, 0) + 1
+        self.admitted += 1
+
+    def _release(self, channel_id: str):
+        self.in_flight -= 1
+        remaining = self._channel_in_flight[channel_id] - 1
+        if remaining:
+            self._channel_in_flight[channel_id] = remaining
+        else:
+            del self._channel_in_flight[channel_id]
+        self._grant()
+
+    def _grant(self):
+        """Hands free slots to the first queued turns whose channel is under its limit."""
+        if not self._queue or self.in_flight >= self.max_concurrent:
+            return
+        granted: List[_Waiter] = []
+        for waiter in self._queue:
+            if self.in_flight >= self.max_concurrent:
+                break
+            if self._has_slot(waiter.channel_id):
+                self._take(waiter.channel_id)
+                granted.append(waiter)
+        for waiter in granted:
+            self._dequeue(waiter)
+            waiter.future.set_result(None)
+
+    def _dequeue(self, waiter: _Waiter):
+        self._queue.remove(waiter)
+        remaining = self._channel_queued[waiter.channel_id] - 1
+        if remaining:
+            self._channel_queued[waiter.channel_id] = remaining
+        else:
+            del self._channel_queued[waiter.channel_id]
+
+    def _overloaded(self, channel_id: str, reason: str) -> Overloaded:
+        channel_limited = bool(self.max_concurrent_per_channel) and self.in_flight < self.max_concurrent
+        if channel_limited:
+            ahead = self._channel_queued.get(channel_id, 0)
+            slots = self.max_concurrent_per_channel
+        else:
+            ahead = len(self._queue)
+            slots = self.max_concurrent
+        retry_after = max(1, math.ceil(self.turn_seconds * (ahead + 1) / slots))
+        return Overloaded(
+            HTTPStatus.TOO_MANY_REQUESTS if channel_limited else HTTPStatus.SERVICE_UNAVAILABLE,
+            retry_after,
+            reason,
+        )
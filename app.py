@@ -7,94 +7,326 @@ This sample shows how to create a bot that demonstrates the following:
 - Implement a multi-turn conversation using Dialogs.
 - Handle user interruptions for such things as `Help` or `Cancel`.
 - Prompt for and validate requests for information from the user.
+
+Importing this module only reads the configuration. The adapter, storage,
+dialogs and bot are built by `init_func`, so the parent of a worker pool never
+builds them, and Application Insights and LUIS are only imported when they are
+configured. tests/aiounittest_ImportTime.py keeps the import within budget.
 """
+import asyncio
+import time
+from functools import partial
 from http import HTTPStatus
 
 from aiohttp import web
 from aiohttp.web import Request, Response, json_response
-from botbuilder.core import (
-    BotFrameworkAdapterSettings,
-    ConversationState,
-    MemoryStorage,
-    UserState,
-    TelemetryLoggerMiddleware,
-)
-from botbuilder.core.integration import aiohttp_error_middleware
-from botbuilder.schema import Activity
-from botbuilder.applicationinsights import ApplicationInsightsTelemetryClient
-from botbuilder.integration.applicationinsights.aiohttp import (
-    AiohttpTelemetryProcessor,
-    bot_telemetry_middleware,
-)
 
+from admission_control import Overloaded
 from config import DefaultConfig
-from dialogs import MainDialog, BookingDialog
-from bots import DialogAndWelcomeBot
-
-from adapter_with_error_handler import AdapterWithErrorHandler
-from flight_booking_recognizer import FlightBookingRecognizer
+from worker_pool import WorkerPool
 
 CONFIG = DefaultConfig()
 
-# Create adapter.
-# See https://aka.ms/about-bot-adapter to learn more about how bots work.
-SETTINGS = BotFrameworkAdapterSettings(CONFIG.APP_ID, CONFIG.APP_PASSWORD)
 
-# Create MemoryStorage, UserState and ConversationState
-MEMORY = MemoryStorage()
-USER_STATE = UserState(MEMORY)
-CONVERSATION_STATE = ConversationState(MEMORY)
+def create_storage(config: DefaultConfig):
+    """Storage for UserState and ConversationState."""
+    # pylint: disable=import-outside-toplevel
+    from bounded_memory_storage import BoundedMemoryStorage
+    from helpers.state_codec import StateCodec
+    from sqlite_storage import SqliteStorage
 
-# Create adapter.
-# See https://aka.ms/about-bot-adapter to learn more about how bots work.
-ADAPTER = AdapterWithErrorHandler(SETTINGS, CONVERSATION_STATE)
+    codec = StateCodec(config.STATE_COMPRESSION)
+    if config.STATE_STORAGE == "memory":
+        spill = None
+        if config.MEMORY_STORAGE_SPILL_PATH:
+            spill = SqliteStorage(config.MEMORY_STORAGE_SPILL_PATH, read_cache_size=0, codec=codec)
+        return BoundedMemoryStorage(
+            max_items=config.MEMORY_STORAGE_MAX_ITEMS,
+            max_bytes=config.MEMORY_STORAGE_MAX_BYTES,
+            ttl_seconds=config.MEMORY_STORAGE_TTL_SECONDS,
+            spill=spill,
+            codec=codec,
+        )
+    return SqliteStorage(
+        config.SQLITE_STORAGE_PATH,
+        read_cache_size=config.SQLITE_READ_CACHE_SIZE if config.WORKERS == 1 else 0,
+        codec=codec,
+    )
 
-# Create telemetry client.
-# Note the small 'client_queue_size'.  This is for demonstration purposes.  Larger queue sizes
-# result in fewer calls to ApplicationInsights, improving bot performance at the expense of
-# less frequent updates.
-INSTRUMENTATION_KEY = CONFIG.APPINSIGHTS_INSTRUMENTATION_KEY
-TELEMETRY_CLIENT = ApplicationInsightsTelemetryClient(
-    INSTRUMENTATION_KEY, telemetry_processor=AiohttpTelemetryProcessor(), client_queue_size=100
-)
 
+def create_telemetry_client(config: DefaultConfig):
+    """
+    Telemetry is handed to a background thread that flushes in batches, so sending to
+    Application Insights never happens on the event loop.  Without an instrumentation key
+    (e.g. local runs and benchmarks) telemetry is discarded.
+    """
+    # pylint: disable=import-outside-toplevel
+    from botbuilder.core import NullTelemetryClient
 
-# Code for enabling activity and personal information logging.
-TELEMETRY_LOGGER_MIDDLEWARE = TelemetryLoggerMiddleware(telemetry_client=TELEMETRY_CLIENT, log_personal_information=True)
-ADAPTER.use(TELEMETRY_LOGGER_MIDDLEWARE)
+    if not config.APPINSIGHTS_INSTRUMENTATION_KEY:
+        return NullTelemetryClient()
 
+    from botbuilder.applicationinsights import ApplicationInsightsTelemetryClient
+    from botbuilder.integration.applicationinsights.aiohttp import AiohttpTelemetryProcessor
+    from background_telemetry_client import AiohttpRequestContext, BackgroundTelemetryClient
 
-# Create dialogs and Bot
-RECOGNIZER = FlightBookingRecognizer(CONFIG)
-BOOKING_DIALOG = BookingDialog()
-DIALOG = MainDialog(RECOGNIZER, BOOKING_DIALOG, telemetry_client=TELEMETRY_CLIENT)
-BOT = DialogAndWelcomeBot(CONVERSATION_STATE, USER_STATE, DIALOG, TELEMETRY_CLIENT)
+    # Note the small 'client_queue_size'.  This is for demonstration purposes.  Larger queue sizes
+    # result in fewer calls to ApplicationInsights, improving bot performance at the expense of
+    # less frequent updates.
+    return BackgroundTelemetryClient(
+        ApplicationInsightsTelemetryClient(
+            config.APPINSIGHTS_INSTRUMENTATION_KEY,
+            telemetry_processor=AiohttpTelemetryProcessor(),
+            client_queue_size=100,
+        ),
+        max_queue_size=config.TELEMETRY_QUEUE_SIZE,
+        batch_size=config.TELEMETRY_BATCH_SIZE,
+        flush_interval_seconds=config.TELEMETRY_FLUSH_INTERVAL_SECONDS,
+        request_context=AiohttpRequestContext(),
+    )
 
 
 # Listen for incoming requests on /api/messages.
 async def messages(req: Request) -> Response:
     # Main bot message handler.
     if "application/json" in req.headers["Content-Type"]:
-        body = await req.json()
+        body = await req.read()
     else:
         return Response(status=HTTPStatus.UNSUPPORTED_MEDIA_TYPE)
 
-    activity = Activity().deserialize(body)
+    started = time.perf_counter()
+    activity = req.app["activity_parser"].parse(body)
+    req.app["metrics"].parse.observe(time.perf_counter() - started)
     auth_header = req.headers["Authorization"] if "Authorization" in req.headers else ""
 
-    response = await ADAPTER.process_activity(activity, auth_header, BOT.on_turn)
+    async def process_activity():
+        admission = req.app["admission"]
+        if admission is None:
+            return await req.app["adapter"].process_activity(
+                activity, auth_header, req.app["bot"].on_turn
+            )
+        async with admission.admit(activity.channel_id):
+            return await req.app["adapter"].process_activity(
+                activity, auth_header, req.app["bot"].on_turn
+            )
+
+    turn_scheduler = req.app["turn_scheduler"]
+    try:
+        if turn_scheduler is None:
+            response = await process_activity()
+        else:
+            # Turns of one conversation run in arrival order; see turn_scheduler.py.
+            conversation_id = activity.conversation.id if activity.conversation else None
+            response = await turn_scheduler.run(conversation_id, process_activity)
+    except Overloaded as overloaded:
+        # The channel retries after Retry-After instead of the turn queueing up.
+        return Response(
+            status=overloaded.status,
+            text=overloaded.reason,
+            headers={"Retry-After": str(overloaded.retry_after_seconds)},
+        )
     if response:
         return json_response(data=response.body, status=response.status)
     return Response(status=HTTPStatus.OK)
 
+# Serve the turn latency histograms and component counters to Prometheus.
+async def metrics(req: Request) -> Response:
+    return Response(
+        text=req.app["metrics"].render(),
+        content_type="text/plain",
+        headers={"X-Content-Type-Options": "nosniff"},
+    )
+
+async def close_telemetry(app: web.Application):
+    # Send whatever telemetry is still queued before the process exits.
+    from background_telemetry_client import BackgroundTelemetryClient  # pylint: disable=import-outside-toplevel
+
+    telemetry_client = app["telemetry_client"]
+    if isinstance(telemetry_client, BackgroundTelemetryClient):
+        await asyncio.get_running_loop().run_in_executor(None, telemetry_client.close)
+
+async def close_storage(app: web.Application):
+    # Commit queued state writes before the process exits.
+    # pylint: disable=import-outside-toplevel
+    from bounded_memory_storage import BoundedMemoryStorage
+    from sqlite_storage import SqliteStorage
+
+    if isinstance(app["storage"], (SqliteStorage, BoundedMemoryStorage)):
+        await app["storage"].close()
+
+async def close_connector_pool(app: web.Application):
+    # Close the keep-alive connections to the channels.
+    if app["adapter"].connector_pool is not None:
+        await app["adapter"].connector_pool.close()
+
+async def close_signing_keys(app: web.Application):
+    # Stop refreshing the token issuers' keys.
+    if app["signing_keys"] is not None:
+        app["signing_keys"].close()
+
 def init_func(argv):
-    APP = web.Application(middlewares=[bot_telemetry_middleware, aiohttp_error_middleware])
+    # pylint: disable=import-outside-toplevel
+    from botbuilder.core import (
+        BotFrameworkAdapterSettings,
+        ConversationState,
+        UserState,
+        TelemetryLoggerMiddleware,
+    )
+    from botbuilder.core.integration import aiohttp_error_middleware
+
+    from adapter_with_error_handler import AdapterWithErrorHandler
+    from bots import DialogAndWelcomeBot
+    from dialogs import MainDialog, BookingDialog
+    from flight_booking_recognizer import FlightBookingRecognizer
+    from helpers.activity_parser import ActivityParser
+    from helpers.timex_cache import TIMEX_CACHE
+    from turn_metrics import MetricsMiddleware, TurnMetrics
+    from warm_up import WarmUp
+
+    # Create the storage, UserState and ConversationState
+    storage = create_storage(CONFIG)
+    user_state = UserState(storage)
+    conversation_state = ConversationState(storage)
+
+    # Latency of every stage of a turn, served on /metrics; see turn_metrics.py.
+    turn_metrics = TurnMetrics()
+
+    # Create adapter.
+    # See https://aka.ms/about-bot-adapter to learn more about how bots work.
+    settings = BotFrameworkAdapterSettings(CONFIG.APP_ID, CONFIG.APP_PASSWORD)
+    connector_pool = None
+    if CONFIG.CONNECTOR_POOL_ENABLED:
+        from botbuilder.core.bot_framework_adapter import USER_AGENT
+        from connector_pool import ConnectorClientPool
+
+        connector_pool = ConnectorClientPool(
+            max_connections_per_host=CONFIG.CONNECTOR_MAX_CONNECTIONS_PER_HOST,
+            keepalive_seconds=CONFIG.CONNECTOR_KEEPALIVE_SECONDS,
+            user_agent=USER_AGENT,
+        )
+    token_validation_cache = signing_keys = None
+    if CONFIG.TOKEN_VALIDATION_CACHE_SIZE > 0:
+        from token_validation import SigningKeyCache, TokenValidationCache
+
+        token_validation_cache = TokenValidationCache(CONFIG.TOKEN_VALIDATION_CACHE_SIZE)
+        signing_keys = SigningKeyCache()
+        signing_keys.install()
+    adapter = AdapterWithErrorHandler(
+        settings,
+        conversation_state,
+        coalesce_replies=CONFIG.COALESCE_REPLIES,
+        metrics=turn_metrics,
+        connector_pool=connector_pool,
+        token_validation_cache=token_validation_cache,
+    )
+    adapter.use(MetricsMiddleware(turn_metrics))
+
+    # Create telemetry client.
+    telemetry_client = create_telemetry_client(CONFIG)
+
+    # Code for enabling activity and personal information logging.
+    telemetry_logger_middleware = TelemetryLoggerMiddleware(
+        telemetry_client=telemetry_client, log_personal_information=True
+    )
+    adapter.use(telemetry_logger_middleware)
+
+    # Create dialogs and Bot
+    recognizer = FlightBookingRecognizer(CONFIG, metrics=turn_metrics)
+    booking_dialog = BookingDialog(metrics=turn_metrics)
+    dialog = MainDialog(
+        recognizer, booking_dialog, telemetry_client=telemetry_client, metrics=turn_metrics
+    )
+    bot = DialogAndWelcomeBot(
+        conversation_state, user_state, dialog, telemetry_client, metrics=turn_metrics
+    )
+
+    admission = None
+    if CONFIG.MAX_CONCURRENT_TURNS > 0:
+        from admission_control import AdmissionController
+
+        admission = AdmissionController(
+            max_concurrent=CONFIG.MAX_CONCURRENT_TURNS,
+            max_concurrent_per_channel=CONFIG.MAX_CONCURRENT_TURNS_PER_CHANNEL,
+            max_queued=CONFIG.TURN_QUEUE_SIZE,
+            queue_timeout_seconds=CONFIG.TURN_QUEUE_TIMEOUT_SECONDS,
+        )
+        turn_metrics.add_stats("admission_channel", lambda: admission.channel_stats, label="channel")
+
+    turn_scheduler = None
+    if CONFIG.SERIALIZE_CONVERSATION_TURNS:
+        from turn_scheduler import TurnScheduler
+
+        turn_scheduler = TurnScheduler(
+            max_queued_per_key=CONFIG.CONVERSATION_QUEUE_SIZE,
+            queue_timeout_seconds=CONFIG.CONVERSATION_QUEUE_TIMEOUT_SECONDS,
+        )
+
+    turn_metrics.add_stats("state", lambda: bot.bot_states.stats, label="scope")
+    turn_metrics.add_stats("timex_cache", lambda: TIMEX_CACHE.stats)
+    for prefix, component in (
+        ("storage", storage),
+        ("admission", admission),
+        ("turn_scheduler", turn_scheduler),
+        ("outbound", adapter),
+        ("connector", connector_pool),
+        ("token_validation", token_validation_cache),
+        ("telemetry", telemetry_client),
+        ("recognition_cache", recognizer.cache),
+    ):
+        if hasattr(component, "stats"):
+            turn_metrics.add_stats(prefix, partial(getattr, component, "stats"))
+
+    middlewares = [aiohttp_error_middleware]
+    if CONFIG.APPINSIGHTS_INSTRUMENTATION_KEY:
+        from botbuilder.integration.applicationinsights.aiohttp import bot_telemetry_middleware
+
+        middlewares.insert(0, bot_telemetry_middleware)
+
+    APP = web.Application(middlewares=middlewares)
+    APP["storage"] = storage
+    APP["adapter"] = adapter
+    APP["telemetry_client"] = telemetry_client
+    APP["recognizer"] = recognizer
+    APP["bot"] = bot
+    # Builds activities from request bodies; see helpers/activity_parser.py.
+    APP["activity_parser"] = ActivityParser()
+    APP["metrics"] = turn_metrics
+    APP["signing_keys"] = signing_keys
+    # Concurrency limits of /api/messages; see admission_control.py.
+    APP["admission"] = admission
+    # Per-conversation turn ordering; see turn_scheduler.py.
+    APP["turn_scheduler"] = turn_scheduler
     APP.router.add_post("/api/messages", messages)
+    APP.router.add_get("/metrics", metrics)
+    if CONFIG.ADMIN_TOKEN:
+        from sampling_profiler import ProfilerRoute
+
+        ProfilerRoute(CONFIG.ADMIN_TOKEN, CONFIG.PROFILER_MAX_SECONDS).install(APP)
+    if CONFIG.WARM_UP_ENABLED:
+        # Runs on startup, before the app accepts requests; see warm_up.py.
+        warm_up = WarmUp(recognizer, telemetry_client=telemetry_client)
+        APP.on_startup.append(warm_up.on_startup)
+        turn_metrics.add_stats("warm_up", partial(getattr, warm_up, "phase_stats"), label="phase")
+    APP.on_cleanup.append(close_telemetry)
+    APP.on_cleanup.append(close_storage)
+    APP.on_cleanup.append(close_connector_pool)
+    APP.on_cleanup.append(close_signing_keys)
     return APP
 
 if __name__ == "__main__":
-    APP = init_func(None)
     try:
-        web.run_app(APP, host="localhost", port=CONFIG.PORT)
+        if CONFIG.WORKERS > 1:
+            if CONFIG.STATE_STORAGE == "memory":
+                raise ValueError("Workers > 1 requires StateStorage=sqlite.")
+            WorkerPool(
+                partial(init_func, None),
+                "localhost",
+                CONFIG.PORT,
+                CONFIG.WORKERS,
+                shutdown_timeout_seconds=CONFIG.WORKER_SHUTDOWN_TIMEOUT_SECONDS,
+            ).run()
+        else:
+            APP = init_func(None)
+            web.run_app(APP, host="localhost", port=CONFIG.PORT)
     except Exception as error:
         raise error
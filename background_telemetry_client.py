@@ -0,0 +1,277 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Telemetry client that hands items to a background thread for batched sending."""
+
+import queue
+import sys
+import threading
+import time
+from threading import current_thread
+from typing import Dict
+
+from botbuilder.core import BotTelemetryClient, Severity
+from botbuilder.core.bot_telemetry_client import TelemetryDataPointType
+
+_FLUSH = object()
+_STOP = object()
+
+
+class AiohttpRequestContext:
+    """
+    Carries the request body that `AiohttpTelemetryProcessor` correlates telemetry
+    with from the event loop thread over to the sending thread.
+    """
+
+    @staticmethod
+    def _bodies() -> dict:
+        """
+        The SDK middleware's private map of thread id to request body, which
+        `retrieve_aiohttp_body` reads. Should an SDK release move it, an empty
+        map is returned and telemetry is sent without the request body.
+        """
+        try:
+            from botbuilder.integration.applicationinsights.aiohttp import (  # pylint: disable=import-outside-toplevel
+                aiohttp_telemetry_middleware,
+            )
+        except ImportError:
+            return {}
+
+        bodies = getattr(aiohttp_telemetry_middleware, "_REQUEST_BODIES", None)
+        return bodies if isinstance(bodies, dict) else {}
+
+    def capture(self) -> object:
+        return self._bodies().get(current_thread().ident)
+
+    def restore(self, body: object):
+        # An item tracked outside a request must not carry the body of the item before it.
+        if body is None:
+            self._bodies().pop(current_thread().ident, None)
+        else:
+            self._bodies()[current_thread().ident] = body
+
+
+class BackgroundTelemetryClient(BotTelemetryClient):
+    """
+    Queues telemetry and forwards it to `telemetry_client` from a background thread.
+
+    Tracking never blocks the caller: items go into a bounded queue and are dropped
+    (and counted) when it is full. The sending thread flushes the wrapped client once
+    `batch_size` items were forwarded or `flush_interval_seconds` elapsed, so the
+    network send to the telemetry backend stays off the event loop.
+    """
+
+    def __init__(
+        self,
+        telemetry_client: BotTelemetryClient,
+        max_queue_size: int = 10000,
+        batch_size: int = 100,
+        flush_interval_seconds: float = 5.0,
+        request_context: AiohttpRequestContext = None,
+    ):
+        self.telemetry_client = telemetry_client
+        self.batch_size = batch_size
+        self.flush_interval_seconds = flush_interval_seconds
+        self._request_context = request_context
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self.forwarded = 0
+        self.dropped = 0
+        self.flushes = 0
+        self.errors = 0
+        self._thread = threading.Thread(
+            target=self._run, name="telemetry-sender", daemon=True
+        )
+        self._thread.start()
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return {
+            "queue_depth": self.queue_depth,
+            "forwarded": self.forwarded,
+            "dropped": self.dropped,
+            "flushes": self.flushes,
+            "errors": self.errors,
+        }
+
+    def track_pageview(
+        self,
+        name: str,
+        url,
+        duration: int = 0,
+        properties: Dict[str, object] = None,
+        measurements: Dict[str, object] = None,
+    ) -> None:
+        self._enqueue("track_pageview", name, url, duration, properties, measurements)
+
+    def track_exception(
+        self,
+        exception_type: type = None,
+        value: Exception = None,
+        trace: object = None,
+        properties: Dict[str, object] = None,
+        measurements: Dict[str, object] = None,
+    ) -> None:
+        # Default to the exception being handled, which is gone by the time the sender runs.
+        if exception_type is None and value is None and trace is None:
+            exception_type, value, trace = sys.exc_info()
+        self._enqueue(
+            "track_exception", exception_type, value, trace, properties, measurements
+        )
+
+    def track_event(
+        self,
+        name: str,
+        properties: Dict[str, object] = None,
+        measurements: Dict[str, object] = None,
+    ) -> None:
+        self._enqueue("track_event", name, properties, measurements)
+
+    def track_metric(
+        self,
+        name: str,
+        value: float,
+        tel_type: TelemetryDataPointType = None,
+        count: int = None,
+        min_val: float = None,
+        max_val: float = None,
+        std_dev: float = None,
+        properties: Dict[str, object] = None,
+    ) -> None:
+        self._enqueue(
+            "track_metric",
+            name,
+            value,
+            tel_type,
+            count,
+            min_val,
+            max_val,
+            std_dev,
+            properties,
+        )
+
+    def track_trace(self, name, properties=None, severity: Severity = None):
+        self._enqueue("track_trace", name, properties, severity)
+
+    def track_request(
+        self,
+        name: str,
+        url: str,
+        success: bool,
+        start_time: str = None,
+        duration: int = None,
+        response_code: str = None,
+        http_method: str = None,
+        properties: Dict[str, object] = None,
+        measurements: Dict[str, object] = None,
+        request_id: str = None,
+    ):
+        self._enqueue(
+            "track_request",
+            name,
+            url,
+            success,
+            start_time,
+            duration,
+            response_code,
+            http_method,
+            properties,
+            measurements,
+            request_id,
+        )
+
+    def track_dependency(
+        self,
+        name: str,
+        data: str,
+        type_name: str = None,
+        target: str = None,
+        duration: int = None,
+        success: bool = None,
+        result_code: str = None,
+        properties: Dict[str, object] = None,
+        measurements: Dict[str, object] = None,
+        dependency_id: str = None,
+    ):
+        self._enqueue(
+            "track_dependency",
+            name,
+            data,
+            type_name,
+            target,
+            duration,
+            success,
+            result_code,
+            properties,
+            measurements,
+            dependency_id,
+        )
+
+    def flush(self):
+        """Asks the sending thread to flush soon; does not wait for it."""
+        try:
+            self._queue.put_nowait(_FLUSH)
+        except queue.Full:
+            pass
+
+    def close(self, timeout: float = 10.0):
+        """Sends everything still queued and stops the sending thread."""
+        if not self._thread.is_alive():
+            return
+        self._queue.put(_STOP, timeout=timeout)
+        self._thread.join(timeout)
+
+    def _enqueue(self, method: str, *args):
+        context = self._request_context.capture() if self._request_context else None
+        try:
+            self._queue.put_nowait((method, args, context))
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        pending = 0
+        last_flush = time.monotonic()
+        while True:
+            timeout = None
+            if pending:
+                timeout = max(0.0, last_flush + self.flush_interval_seconds - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if item is not None and item is not _FLUSH and item is not _STOP:
+                method, args, context = item
+                if self._request_context:
+                    self._request_context.restore(context)
+                try:
+                    getattr(self.telemetry_client, method)(*args)
+                    self.forwarded += 1
+                    pending += 1
+                except Exception:  # pylint: disable=broad-except
+                    self.errors += 1
+
+            if pending and (
+                item is _FLUSH
+                or item is _STOP
+                or pending >= self.batch_size
+                or time.monotonic() - last_flush >= self.flush_interval_seconds
+            ):
+                self._flush_target()
+                pending = 0
+                last_flush = time.monotonic()
+
+            if item is _STOP:
+                return
+
+    def _flush_target(self):
+        flush = getattr(self.telemetry_client, "flush", None)
+        if flush is None:
+            return
+        try:
+            flush()
+            self.flushes += 1
+        except Exception:  # pylint: disable=broad-except
+            self.errors += 1
@@ -0,0 +1,85 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""
+Per-payload cost of turning a request body into an `Activity`.
+
+Compares the `messages` handler's former path (`json.loads` followed by
+`Activity().deserialize`) with `ActivityParser.parse` over the channel
+payloads in `benchmarks/payloads`. Run it with:
+    python -m benchmarks.activity_parsing --iterations 2000
+"""
+
+import argparse
+import glob
+import json
+import os
+import timeit
+from typing import Dict, List
+
+from botbuilder.schema import Activity
+
+from helpers.activity_parser import ActivityParser
+
+PAYLOADS = os.path.join(os.path.dirname(__file__), "payloads")
+
+
+def load_corpus(directory: str = PAYLOADS) -> Dict[str, bytes]:
+    corpus = {}
+    for path in sorted(glob.glob(os.path.join(directory, "*.json"))):
+        with open(path, "rb") as payload:
+            corpus[os.path.splitext(os.path.basename(path))[0]] = payload.read()
+    return corpus
+
+
+def measure(corpus: Dict[str, bytes], iterations: int) -> List[dict]:
+    parser = ActivityParser()
+    results = []
+    for name, body in corpus.items():
+        msrest = min(
+            timeit.repeat(
+                lambda body=body: Activity().deserialize(json.loads(body)),
+                number=iterations,
+                repeat=3,
+            )
+        )
+        fast = min(
+            timeit.repeat(lambda body=body: parser.parse(body), number=iterations, repeat=3)
+        )
+        results.append(
+            {
+                "payload": name,
+                "bytes": len(body),
+                "msrest_us": msrest / iterations * 1e6,
+                "fast_us": fast / iterations * 1e6,
+            }
+        )
+    return results
+
+
+def print_report(results: List[dict]):
+    print(f"{'payload':<32}{'bytes':>7}{'msrest us':>12}{'fast us':>10}{'speedup':>9}")
+    for row in results:
+        print(
+            f"{row['payload']:<32}{row['bytes']:>7}{row['msrest_us']:>12.1f}"
+            f"{row['fast_us']:>10.1f}{row['msrest_us'] / row['fast_us']:>8.1f}x"
+        )
+    msrest = sum(row["msrest_us"] for row in results)
+    fast = sum(row["fast_us"] for row in results)
+    print(f"{'total':<39}{msrest:>12.1f}{fast:>10.1f}{msrest / fast:>8.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n", 1)[0])
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--json", help="Write the results to this file.")
+    args = parser.parse_args()
+
+    results = measure(load_corpus(), args.iterations)
+    print_report(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as result_file:
+            json.dump(results, result_file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
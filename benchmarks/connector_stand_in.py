@@ -0,0 +1,44 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""
+Local Bot Connector stand-in that accepts the bot's outbound activities.
+
+Activities posted by the adapter are counted per conversation and dropped,
+and the TCP connections they arrived on are counted. Use it as the
+`serviceUrl` of inbound activities so replies stay local.
+"""
+
+import asyncio
+import uuid
+
+from aiohttp import web
+
+
+def create_app(latency_ms: float = 0.0) -> web.Application:
+    """Builds the stand-in application, answering every post after `latency_ms`."""
+    stats = {"activities": 0, "conversations": {}, "connections": 0}
+    # Client address and port of every connection seen so far.
+    peers = set()
+
+    async def post_activity(req: web.Request) -> web.Response:
+        conversation_id = req.match_info["conversation_id"]
+        peer = req.transport.get_extra_info("peername") if req.transport else None
+        if peer not in peers:
+            peers.add(peer)
+            stats["connections"] += 1
+        await req.read()
+        if latency_ms:
+            await asyncio.sleep(latency_ms / 1000)
+        stats["activities"] += 1
+        stats["conversations"][conversation_id] = (
+            stats["conversations"].get(conversation_id, 0) + 1
+        )
+        return web.json_response({"id": str(uuid.uuid4())})
+
+    app = web.Application()
+    app["stats"] = stats
+    app.router.add_post("/v3/conversations/{conversation_id}/activities", post_activity)
+    app.router.add_post(
+        "/v3/conversations/{conversation_id}/activities/{activity_id}", post_activity
+    )
+    return app
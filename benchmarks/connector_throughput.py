@@ -0,0 +1,110 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""
+Replies per second posted to the local connector stand-in, and the TCP
+connections they take, with the SDK's `ConnectorClient` and with the
+clients of `connector_pool.py`.
+
+The SDK client sends each request with `requests` on an executor thread;
+the pooled client sends it on the event loop through a keep-alive aiohttp
+session. Run it with:
+    python -m benchmarks.connector_throughput --replies 2000 --concurrency 50 --latency-ms 20
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from typing import List
+
+from botbuilder.schema import Activity, ActivityTypes, ChannelAccount
+from botframework.connector.aio import ConnectorClient
+from botframework.connector.auth import MicrosoftAppCredentials
+
+from benchmarks import connector_stand_in
+from benchmarks.background_server import BackgroundServer
+from benchmarks.load_test import percentile
+from connector_pool import ConnectorClientPool
+
+
+def reply(index: int) -> Activity:
+    return Activity(
+        type=ActivityTypes.message,
+        text=f"Reply {index}",
+        from_property=ChannelAccount(id="bot"),
+        recipient=ChannelAccount(id="user"),
+    )
+
+
+async def post_replies(client: ConnectorClient, replies: int, concurrency: int) -> List[float]:
+    samples: List[float] = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def post(index: int):
+        async with semaphore:
+            started = time.perf_counter()
+            await client.conversations.send_to_conversation(f"conversation-{index % concurrency}", reply(index))
+            samples.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(post(index) for index in range(replies)))
+    return samples
+
+
+async def measure(name: str, service_url: str, stats: dict, args) -> dict:
+    pool = None
+    if name == "pooled":
+        pool = ConnectorClientPool(max_connections_per_host=args.max_connections)
+        client = pool.client(service_url, MicrosoftAppCredentials.empty())
+    else:
+        client = ConnectorClient(MicrosoftAppCredentials.empty(), base_url=service_url)
+
+    # One reply first, so both clients start with their session set up.
+    await post_replies(client, 1, 1)
+    stats["connections"] = 0
+    try:
+        started = time.perf_counter()
+        samples = await post_replies(client, args.replies, args.concurrency)
+        elapsed = time.perf_counter() - started
+    finally:
+        if pool is not None:
+            await pool.close()
+    return {
+        "client": name,
+        "replies_per_sec": args.replies / elapsed,
+        "p50_ms": percentile(samples, 50) * 1000,
+        "p95_ms": percentile(samples, 95) * 1000,
+        "connections": stats["connections"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n", 1)[0])
+    parser.add_argument("--replies", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--max-connections", type=int, default=100)
+    parser.add_argument("--json", help="Write the results to this file.")
+    args = parser.parse_args()
+
+    connector = BackgroundServer(connector_stand_in.create_app(latency_ms=args.latency_ms))
+    service_url = connector.start()
+    stats = connector.app["stats"]
+    try:
+        results = [asyncio.run(measure(name, service_url, stats, args)) for name in ("sdk", "pooled")]
+    finally:
+        connector.stop()
+
+    print(f"{args.replies} replies, {args.concurrency} concurrent, connector latency {args.latency_ms:g} ms")
+    print(f"{'client':8} {'replies/s':>10} {'p50 ms':>8} {'p95 ms':>8} {'connections':>12}")
+    for row in results:
+        print(
+            f"{row['client']:8} {row['replies_per_sec']:10.1f} {row['p50_ms']:8.2f} "
+            f"{row['p95_ms']:8.2f} {row['connections']:12d}"
+        )
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as result_file:
+            json.dump(results, result_file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
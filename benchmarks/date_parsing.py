@@ -0,0 +1,86 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""
+Correctness and per-call cost of `TravelDateParser` against the previous
+`date_extraction` (dateutil's fuzzy parser) on `benchmarks/date_corpus.json`.
+
+The corpus pins "today", so both are resolved against the same day. Run it with:
+    python -m benchmarks.date_parsing --iterations 200
+"""
+
+import argparse
+import json
+import os
+import timeit
+from datetime import date, datetime
+
+from dateutil.parser import parse
+
+from helpers.travel_dates import TravelDateParser
+
+CORPUS = os.path.join(os.path.dirname(__file__), "date_corpus.json")
+
+
+def legacy_date_extraction(text: str, today: date):
+    """`date_extraction` before the grammar, with its frozen `today` made explicit."""
+    if text:
+        try:
+            parsed = parse(text, fuzzy=True, default=datetime(today.year, today.month, today.day))
+            travel_date = today if str(text).lower() == "asap" else parsed
+        except:  # pylint: disable=bare-except
+            travel_date = None
+    else:
+        travel_date = None
+    return travel_date
+
+
+def formatted(value) -> str:
+    return value.strftime("%Y-%m-%d") if value else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n", 1)[0])
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    with open(CORPUS, encoding="utf-8") as corpus_file:
+        corpus = json.load(corpus_file)
+    today = date.fromisoformat(corpus["today"])
+    texts = [case["text"] for case in corpus["cases"]]
+    travel_dates = TravelDateParser(clock=lambda: today)
+
+    print(f"{'text':<42}{'expected':>12}{'dateutil':>12}{'grammar':>12}")
+    legacy_correct = grammar_correct = 0
+    for case in corpus["cases"]:
+        legacy = formatted(legacy_date_extraction(case["text"], today))
+        grammar = formatted(travel_dates.parse(case["text"]))
+        legacy_correct += legacy == case["expected"]
+        grammar_correct += grammar == case["expected"]
+        print(f"{case['text']!r:<42}{str(case['expected']):>12}{str(legacy):>12}{str(grammar):>12}")
+
+    def run_legacy():
+        for text in texts:
+            legacy_date_extraction(text, today)
+
+    def run_cold():
+        travel_dates.cache_clear()
+        for text in texts:
+            travel_dates.parse(text)
+
+    def run_warm():
+        for text in texts:
+            travel_dates.parse(text)
+
+    calls = args.iterations * len(texts)
+    legacy = min(timeit.repeat(run_legacy, number=args.iterations, repeat=3)) / calls
+    cold = min(timeit.repeat(run_cold, number=args.iterations, repeat=3)) / calls
+    warm = min(timeit.repeat(run_warm, number=args.iterations, repeat=3)) / calls
+    print()
+    print(f"correct: dateutil {legacy_correct}/{len(texts)}, grammar {grammar_correct}/{len(texts)}")
+    print(f"dateutil:              {legacy * 1e6:8.1f} us/call")
+    print(f"grammar, cold cache:   {cold * 1e6:8.1f} us/call ({legacy / cold:.1f}x)")
+    print(f"grammar, cached:       {warm * 1e6:8.1f} us/call ({legacy / warm:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
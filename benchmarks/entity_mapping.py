@@ -0,0 +1,158 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""
+Per-call cost of mapping a booking `RecognizerResult` onto `BookingDetails`.
+
+Compares the entity→slot table in `LuisHelper.booking_details` with the
+previous chain of `$instance` lookups (kept below as `legacy_booking_details`)
+over the results recorded in `benchmarks/recognizer_results.json`. Run it with:
+    python -m benchmarks.entity_mapping --iterations 2000
+Pass `--record` to re-record the results from the offline recognizer.
+"""
+
+import argparse
+import json
+import os
+import timeit
+from datetime import timedelta
+from typing import List
+
+from botbuilder.core import IntentScore, RecognizerResult
+
+from booking_details import BookingDetails
+from helpers.luis_helper import (
+    TRAVEL_DATES,
+    LuisHelper,
+    city_name,
+    date_extraction,
+    int_extraction,
+    number_of,
+)
+
+RECORDED = os.path.join(os.path.dirname(__file__), "recognizer_results.json")
+
+UTTERANCES = [
+    "book a flight from paris to berlin on march 3 2031 for 2 adults and 1 child with a budget of 500",
+    "i want to go from new york to paris on june 12 2031 for two adults",
+    "fly to london for 5 days from june 2 2031",
+    "book me a trip from berlin to london leaving april 1 2031 and returning april 9 2031",
+    "flight to paris on may 20 2031 for 3 adults and 2 children with a budget of 1200",
+    "from london to new york on january 5 2031 for one adult",
+    "i need a flight to berlin",
+    "book a flight from paris",
+    "book a flight from new york to london on february 14 2031 with a budget of 800",
+    "we are 4 adults flying from berlin to paris on march 30 2031",
+    "get me to london from paris on july 4 2031 back on july 18 2031 for 2 adults",
+    "book a flight to paris on august 1 2031 for 10 days with a budget of 2000",
+]
+
+
+def record(path: str = RECORDED):
+    # Imported here so the benchmark itself does not compile the model.
+    from offline_recognizer import OfflineRecognizer  # pylint: disable=import-outside-toplevel
+
+    recognizer = OfflineRecognizer()
+    recorded = []
+    for text in UTTERANCES:
+        result = recognizer.recognize_text(text)
+        recorded.append(
+            {
+                "text": text,
+                "intents": {name: score.score for name, score in result.intents.items()},
+                "entities": result.entities,
+            }
+        )
+    with open(path, "w", encoding="utf-8") as recorded_file:
+        json.dump(recorded, recorded_file, indent=1)
+
+
+def load(path: str = RECORDED) -> List[RecognizerResult]:
+    with open(path, encoding="utf-8") as recorded_file:
+        return [
+            RecognizerResult(
+                text=item["text"],
+                intents={name: IntentScore(score) for name, score in item["intents"].items()},
+                entities=item["entities"],
+            )
+            for item in json.load(recorded_file)
+        ]
+
+
+def legacy_booking_details(recognizer_result: RecognizerResult) -> BookingDetails:
+    """The mapping `LuisHelper.execute_luis_query` used before the slot table."""
+    result = BookingDetails()
+    to_entities = recognizer_result.entities.get("$instance", {}).get("dst_city", [])
+    if to_entities: result.destination = to_entities[0]["text"].capitalize()
+    from_entities = recognizer_result.entities.get("$instance", {}).get("or_city", [])
+    if from_entities: result.origin = from_entities[0]["text"].capitalize()
+    start_entities = recognizer_result.entities.get("$instance", {}).get("str_date", [])
+    if start_entities:
+        travel_start_date = date_extraction(start_entities[0]["text"])
+        result.travel_start_date = travel_start_date.strftime("%Y-%m-%d")
+    duration_entities = recognizer_result.entities.get("$instance", {}).get("max_duration", [])
+    duration = int_extraction(duration_entities[0]["text"]) if duration_entities else None
+    end_entities = recognizer_result.entities.get("$instance", {}).get("end_date", [])
+    if end_entities:
+        result.travel_end_date = date_extraction(end_entities[0]["text"]).strftime("%Y-%m-%d")
+    elif from_entities and duration:
+        travel_end_date = travel_start_date + timedelta(days=int(duration))
+        result.travel_end_date = travel_end_date.strftime("%Y-%m-%d")
+    adult_entities = recognizer_result.entities.get("$instance", {}).get("n_adults", [])
+    n_adults = (int_extraction(adult_entities[0]["text"]) if adult_entities else 0)
+    child_entities = recognizer_result.entities.get("$instance", {}).get("n_children", [])
+    n_children = (int_extraction(child_entities[0]["text"]) if child_entities else 0)
+    if adult_entities or child_entities : result.n_passengers = n_adults + n_children
+    budget_entities = recognizer_result.entities.get("$instance", {}).get("budget", [])
+    if budget_entities: result.budget = budget_entities[0]["text"]
+    return result
+
+
+def legacy_or_error(recognizer_result: RecognizerResult):
+    try:
+        return legacy_booking_details(recognizer_result)
+    except Exception as exception:  # pylint: disable=broad-except
+        return exception
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n", 1)[0])
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--record", action="store_true")
+    args = parser.parse_args()
+
+    if args.record:
+        record()
+    results = load()
+
+    differences = 0
+    for result in results:
+        legacy = legacy_or_error(result)
+        current = vars(LuisHelper.booking_details(result))
+        if isinstance(legacy, Exception) or vars(legacy) != current:
+            differences += 1
+            print(f"{result.text!r}:\n  legacy:  {legacy if isinstance(legacy, Exception) else vars(legacy)}\n  table:   {current}")
+
+    def run(mapping):
+        for result in results:
+            mapping(result)
+
+    legacy = min(timeit.repeat(lambda: run(legacy_or_error), number=args.iterations, repeat=3))
+    table = min(
+        timeit.repeat(lambda: run(LuisHelper.booking_details), number=args.iterations, repeat=3)
+    )
+
+    def run_cold():
+        for converter in (city_name, number_of, TRAVEL_DATES):
+            converter.cache_clear()
+        run(LuisHelper.booking_details)
+
+    cold = min(timeit.repeat(run_cold, number=args.iterations, repeat=3))
+    calls = args.iterations * len(results)
+    print(f"{len(results)} recorded results, {differences} mapped differently")
+    print(f"legacy:              {legacy / calls * 1e6:8.1f} us/call")
+    print(f"table, cold caches:  {cold / calls * 1e6:8.1f} us/call ({legacy / cold:.1f}x)")
+    print(f"table:               {table / calls * 1e6:8.1f} us/call ({legacy / table:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""
+End-to-end load benchmark for the /api/messages handler.
+
+Starts the LUIS and Bot Connector stand-ins, builds the bot with
+`app.init_func` (authentication disabled) and drives scripted multi-turn
+booking conversations through `messages`. Reports turns/sec and the
+p50/p95/p99 latency of whole turns and of every waterfall step.
+
+    python -m benchmarks.load_test --conversations 200 --concurrency 1 --luis-latency-ms 120
+
+Use `--json` to keep a result file to compare later runs against.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import tempfile
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, List
+
+import aiohttp
+from aiohttp.test_utils import TestServer
+
+from benchmarks import connector_stand_in, luis_stand_in
+from benchmarks.background_server import BackgroundServer
+
+CITIES = ["paris", "london", "berlin", "new york"]
+MONTHS = ["january", "february", "march", "april", "may", "june"]
+
+
+def booking_script(index: int) -> List[str]:
+    """Utterances of one complete booking, varied by conversation index."""
+    origin, destination = list(itertools.permutations(CITIES, 2))[index % 12]
+    month = MONTHS[index % len(MONTHS)]
+    day = 1 + index % 20
+    return [
+        "hi",
+        f"book a flight from {origin} to {destination} on {month} {day} 2031 "
+        f"for {1 + index % 4} adults with a budget of {300 + index % 700}",
+        "yes",
+        f"{month} {day + 7} 2031",
+        "yes",
+        "no",
+    ]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of `values`."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+def instrument_waterfall_steps(samples: Dict[str, List[float]]):
+    """Records the inclusive duration of every waterfall step into `samples`."""
+    from botbuilder.dialogs import WaterfallDialog
+
+    original_on_step = WaterfallDialog.on_step
+
+    async def on_step(self, step_context):
+        start = time.perf_counter()
+        try:
+            return await original_on_step(self, step_context)
+        finally:
+            samples[self.get_step_name(step_context.index)].append(
+                time.perf_counter() - start
+            )
+
+    WaterfallDialog.on_step = on_step
+
+
+class LoadTest:
+    """Drives conversations against a running `messages` endpoint."""
+
+    def __init__(self, url: str, service_url: str, expect_replies: bool = False):
+        self.url = url
+        self.service_url = service_url
+        self.expect_replies = expect_replies
+        self.turn_samples: List[float] = []
+        self.errors = 0
+
+    def activity(self, conversation_id: str, user_id: str, **fields) -> dict:
+        activity = {
+            "id": str(uuid.uuid4()),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "serviceUrl": self.service_url,
+            "channelId": "webchat",
+            "from": {"id": user_id, "name": "Load test"},
+            "recipient": {"id": "bot", "name": "Bot"},
+            "conversation": {"id": conversation_id},
+            "locale": "en-US",
+        }
+        if self.expect_replies:
+            activity["deliveryMode"] = "expectReplies"
+        activity.update(fields)
+        return activity
+
+    async def post(self, session: aiohttp.ClientSession, activity: dict):
+        start = time.perf_counter()
+        async with session.post(self.url, json=activity) as response:
+            await response.read()
+            if response.status >= 400:
+                self.errors += 1
+        self.turn_samples.append(time.perf_counter() - start)
+
+    async def conversation(self, session: aiohttp.ClientSession, index: int):
+        conversation_id = f"load-{index}-{uuid.uuid4()}"
+        user_id = f"user-{index}"
+        await self.post(
+            session,
+            self.activity(
+                conversation_id,
+                user_id,
+                type="conversationUpdate",
+                membersAdded=[{"id": user_id}, {"id": "bot"}],
+            ),
+        )
+        for text in booking_script(index):
+            await self.post(
+                session, self.activity(conversation_id, user_id, type="message", text=text)
+            )
+
+    async def run(self, conversations: int, concurrency: int):
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def bounded(session, index):
+            async with semaphore:
+                await self.conversation(session, index)
+
+        async with aiohttp.ClientSession() as session:
+            await asyncio.gather(*(bounded(session, i) for i in range(conversations)))
+
+
+def configure_environment(
+    luis_url: str,
+    offline_recognizer: bool = True,
+    storage: str = "sqlite",
+    coalesce_replies: bool = False,
+):
+    """Points the bot at the LUIS stand-in with authentication disabled."""
+    os.environ["OfflineRecognizerEnabled"] = "true" if offline_recognizer else "false"
+    os.environ["CoalesceReplies"] = "true" if coalesce_replies else "false"
+    os.environ["StateStorage"] = storage
+    os.environ["SqliteStoragePath"] = os.path.join(tempfile.mkdtemp(), "bot_state.db")
+    os.environ["MicrosoftAppId"] = ""
+    os.environ["MicrosoftAppPassword"] = ""
+    os.environ["LuisAppId"] = str(uuid.uuid4())
+    os.environ["LuisAPIKey"] = str(uuid.uuid4())
+    os.environ["LuisAPIHostName"] = luis_url
+    os.environ.setdefault("AppInsightsInstrumentationKey", "")
+
+
+def report(load_test: LoadTest, steps: Dict[str, List[float]], elapsed: float) -> dict:
+    def summary(samples):
+        return {
+            "count": len(samples),
+            "p50_ms": percentile(samples, 50) * 1000,
+            "p95_ms": percentile(samples, 95) * 1000,
+            "p99_ms": percentile(samples, 99) * 1000,
+        }
+
+    turns = len(load_test.turn_samples)
+    return {
+        "turns": turns,
+        "errors": load_test.errors,
+        "elapsed_s": elapsed,
+        "turns_per_sec": turns / elapsed if elapsed else 0.0,
+        "turn": summary(load_test.turn_samples),
+        "steps": {name: summary(samples) for name, samples in sorted(steps.items())},
+    }
+
+
+def print_report(result: dict):
+    print(
+        f"turns: {result['turns']} in {result['elapsed_s']:.2f}s "
+        f"({result['turns_per_sec']:.1f} turns/sec), errors: {result['errors']}"
+    )
+    print(f"{'':40} {'count':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    rows = [("turn", result["turn"])] + list(result["steps"].items())
+    for name, row in rows:
+        print(
+            f"{name:40} {row['count']:7d} {row['p50_ms']:9.2f} "
+            f"{row['p95_ms']:9.2f} {row['p99_ms']:9.2f}"
+        )
+
+
+async def run_benchmark(args) -> dict:
+    # Imported here so the environment is configured before config.py is read.
+    import app as bot_app  # pylint: disable=import-outside-toplevel
+
+    steps: Dict[str, List[float]] = defaultdict(list)
+    instrument_waterfall_steps(steps)
+
+    application = bot_app.init_func(None)
+    server = TestServer(application)
+    await server.start_server()
+    load_test = LoadTest(
+        str(server.make_url("/api/messages")), args.service_url, args.expect_replies
+    )
+
+    # Failed turns are answered by on_turn_error with a 200, so count them there.
+    adapter = application["adapter"]
+    on_turn_error = adapter.on_turn_error
+
+    async def count_turn_error(context, error):
+        load_test.errors += 1
+        await on_turn_error(context, error)
+
+    adapter.on_turn_error = count_turn_error
+    try:
+        start = time.perf_counter()
+        await load_test.run(args.conversations, args.concurrency)
+        elapsed = time.perf_counter() - start
+    finally:
+        await server.close()
+
+    return report(load_test, steps, elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n", 1)[0])
+    parser.add_argument("--conversations", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--luis-latency-ms", type=float, default=0.0)
+    parser.add_argument("--luis-jitter-ms", type=float, default=0.0)
+    parser.add_argument("--luis-error-rate", type=float, default=0.0)
+    parser.add_argument("--connector-latency-ms", type=float, default=0.0)
+    parser.add_argument(
+        "--expect-replies",
+        action="store_true",
+        help="Return replies in the HTTP response instead of posting them to the connector.",
+    )
+    parser.add_argument(
+        "--coalesce-replies",
+        action="store_true",
+        help="Merge a turn's replies and post them when it ends instead of as they are sent.",
+    )
+    parser.add_argument(
+        "--no-offline-recognizer",
+        action="store_true",
+        help="Send every utterance to LUIS instead of answering confident ones in process.",
+    )
+    parser.add_argument(
+        "--storage",
+        choices=["sqlite", "memory"],
+        default="sqlite",
+        help="Bot state storage; sqlite uses a fresh database in a temporary directory.",
+    )
+    parser.add_argument("--json", help="Write the results to this file.")
+    args = parser.parse_args()
+
+    luis = BackgroundServer(
+        luis_stand_in.create_app(
+            latency_ms=args.luis_latency_ms,
+            jitter_ms=args.luis_jitter_ms,
+            error_rate=args.luis_error_rate,
+            seed=0,
+        )
+    )
+    connector = BackgroundServer(
+        connector_stand_in.create_app(latency_ms=args.connector_latency_ms)
+    )
+    configure_environment(
+        luis.start(), not args.no_offline_recognizer, args.storage, args.coalesce_replies
+    )
+    args.service_url = connector.start()
+    try:
+        result = asyncio.run(run_benchmark(args))
+    finally:
+        luis.stop()
+        connector.stop()
+
+    result["luis_requests"] = luis.app["stats"]["requests"]
+    result["connector_activities"] = connector.app["stats"]["activities"]
+    result["connector_calls_per_turn"] = (
+        result["connector_activities"] / result["turns"] if result["turns"] else 0.0
+    )
+    print_report(result)
+    print(
+        f"LUIS requests: {result['luis_requests']}, "
+        f"connector activities: {result['connector_activities']} "
+        f"({result['connector_calls_per_turn']:.2f} per turn)"
+    )
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as result_file:
+            json.dump(result, result_file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
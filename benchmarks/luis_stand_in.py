@@ -0,0 +1,164 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""
+Local LUIS stand-in serving v2 and v3 prediction responses.
+
+Predictions come from the `FlightBookingModel` compiled from
+`cognitiveModels/FlightBooking.json` (see `offline_recognizer.py`), so
+entities are reported under the names the published app uses and that
+`LuisHelper.execute_luis_query` reads (`dst_city`, `or_city`, `str_date`, ...).
+
+Run it standalone with:
+    python -m benchmarks.luis_stand_in --port 5050 --latency-ms 120 --error-rate 0.01
+then point `LuisAPIHostName` at `http://localhost:5050`.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+
+from aiohttp import web
+
+from offline_recognizer import FlightBookingModel
+
+
+def v2_response(model: FlightBookingModel, query: str) -> dict:
+    scores, entities, _ = model.predict(query)
+    intents = [
+        {"intent": name, "score": score}
+        for name, score in sorted(scores.items(), key=lambda item: -item[1])
+    ]
+    return {
+        "query": query,
+        "topScoringIntent": intents[0],
+        "intents": intents,
+        "entities": [
+            {
+                "entity": entity["text"],
+                "type": entity["type"],
+                "startIndex": entity["start"],
+                "endIndex": entity["end"] - 1,
+                "score": entity["score"],
+            }
+            for entity in entities
+        ],
+        "compositeEntities": [],
+    }
+
+
+def v3_response(model: FlightBookingModel, query: str) -> dict:
+    scores, entities, _ = model.predict(query)
+    values = {}
+    instance = {}
+    for entity in entities:
+        values.setdefault(entity["type"], []).append(entity["text"])
+        instance.setdefault(entity["type"], []).append(
+            {
+                "type": entity["type"],
+                "text": entity["text"],
+                "startIndex": entity["start"],
+                "length": entity["end"] - entity["start"],
+                "score": entity["score"],
+                "modelTypeId": 1,
+                "modelType": "Entity Extractor",
+            }
+        )
+    values["$instance"] = instance
+    return {
+        "query": query,
+        "prediction": {
+            "topIntent": max(scores, key=scores.get),
+            "intents": {name: {"score": score} for name, score in scores.items()},
+            "entities": values,
+        },
+    }
+
+
+def create_app(
+    model: FlightBookingModel = None,
+    latency_ms: float = 0.0,
+    jitter_ms: float = 0.0,
+    error_rate: float = 0.0,
+    error_status: int = 503,
+    seed: int = None,
+) -> web.Application:
+    """Builds the stand-in application.
+
+    Every prediction waits `latency_ms` plus a uniform `jitter_ms`, and fails
+    with `error_status` for a fraction `error_rate` of the requests.
+    """
+    model = model or FlightBookingModel.from_file()
+    rng = random.Random(seed)
+    stats = {"requests": 0, "errors": 0}
+
+    async def delay_or_fail():
+        stats["requests"] += 1
+        delay = latency_ms + (rng.uniform(0, jitter_ms) if jitter_ms else 0.0)
+        if delay:
+            await asyncio.sleep(delay / 1000)
+        if error_rate and rng.random() < error_rate:
+            stats["errors"] += 1
+            return web.Response(status=error_status, text="Injected failure")
+        return None
+
+    async def predict_v2(req: web.Request) -> web.Response:
+        failure = await delay_or_fail()
+        if failure is not None:
+            return failure
+        if req.method == "GET":
+            query = req.query.get("q", "")
+        else:
+            query = json.loads(await req.text() or '""')
+        return web.json_response(v2_response(model, query))
+
+    async def predict_v3(req: web.Request) -> web.Response:
+        failure = await delay_or_fail()
+        if failure is not None:
+            return failure
+        if req.method == "GET":
+            query = req.query.get("query", "")
+        else:
+            query = (await req.json()).get("query", "")
+        return web.json_response(v3_response(model, query))
+
+    async def get_stats(req: web.Request) -> web.Response:  # pylint: disable=unused-argument
+        return web.json_response(stats)
+
+    app = web.Application()
+    app["stats"] = stats
+    app.router.add_route("*", "/luis/v2.0/apps/{app_id}", predict_v2)
+    app.router.add_route(
+        "*", "/luis/prediction/v3.0/apps/{app_id}/slots/{slot}/predict", predict_v3
+    )
+    app.router.add_route(
+        "*", "/luis/prediction/v3.0/apps/{app_id}/versions/{version}/predict", predict_v3
+    )
+    app.router.add_get("/stats", get_stats)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n", 1)[0])
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=5050)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503)
+    args = parser.parse_args()
+
+    web.run_app(
+        create_app(
+            latency_ms=args.latency_ms,
+            jitter_ms=args.jitter_ms,
+            error_rate=args.error_rate,
+            error_status=args.error_status,
+        ),
+        host=args.host,
+        port=args.port,
+    )
+
+
+if __name__ == "__main__":
+    main()
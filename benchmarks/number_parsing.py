@@ -0,0 +1,86 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""
+Correctness and per-call cost of `NumberTokenizer` against the previous
+`int_extraction` (one `word_to_num` call per token) on
+`benchmarks/number_corpus.json`. Run it with:
+    python -m benchmarks.number_parsing --iterations 500
+"""
+
+import argparse
+import json
+import os
+import timeit
+
+from word2number.w2n import word_to_num
+
+from helpers.number_tokenizer import NumberTokenizer
+
+CORPUS = os.path.join(os.path.dirname(__file__), "number_corpus.json")
+
+
+def legacy_int_extraction(text):
+    """`int_extraction` before the tokenizer."""
+    number = []
+    for s in text.split():
+        if s == "me":
+            number.append(1)
+        else:
+            try:
+                number.append(word_to_num(s))
+            except Exception:  # pylint: disable=broad-except
+                pass
+    return sum(number)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n", 1)[0])
+    parser.add_argument("--iterations", type=int, default=500)
+    args = parser.parse_args()
+
+    with open(CORPUS, encoding="utf-8") as corpus_file:
+        corpus = json.load(corpus_file)
+    texts = [case["text"] for case in corpus]
+    numbers = NumberTokenizer()
+
+    print(f"{'text':<36}{'expected':>10}{'legacy':>10}{'tokenizer':>11}  spans")
+    legacy_correct = tokenizer_correct = 0
+    for case in corpus:
+        legacy = legacy_int_extraction(case["text"])
+        matches = numbers.tokenize(case["text"])
+        value = sum(match.value for match in matches)
+        legacy_correct += legacy == case["expected"]
+        tokenizer_correct += value == case["expected"]
+        spans = ", ".join(f"{match.text!r}={match.value}" for match in matches)
+        print(f"{case['text']!r:<36}{case['expected']:>10}{legacy:>10}{value:>11}  {spans}")
+
+    def run_legacy():
+        for text in texts:
+            legacy_int_extraction(text)
+
+    def run_total():
+        for text in texts:
+            numbers.total(text)
+
+    def run_spans():
+        for text in texts:
+            numbers.tokenize(text)
+
+    def run_batch():
+        numbers.tokenize_many(texts)
+
+    calls = args.iterations * len(texts)
+    legacy = min(timeit.repeat(run_legacy, number=args.iterations, repeat=3)) / calls
+    total = min(timeit.repeat(run_total, number=args.iterations, repeat=3)) / calls
+    spans = min(timeit.repeat(run_spans, number=args.iterations, repeat=3)) / calls
+    batch = min(timeit.repeat(run_batch, number=args.iterations, repeat=3)) / calls
+    print()
+    print(f"correct: legacy {legacy_correct}/{len(texts)}, tokenizer {tokenizer_correct}/{len(texts)}")
+    print(f"legacy:            {legacy * 1e6:8.1f} us/call")
+    print(f"tokenizer, total:  {total * 1e6:8.1f} us/call ({legacy / total:.1f}x)")
+    print(f"tokenizer, spans:  {spans * 1e6:8.1f} us/call ({legacy / spans:.1f}x)")
+    print(f"tokenizer, batch:  {batch * 1e6:8.1f} us/call ({legacy / batch:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
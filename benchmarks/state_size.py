@@ -0,0 +1,126 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""
+Bytes of conversation state written per booking conversation, and the time to
+encode and decode one state document, with jsonpickle (what `SqliteStorage`
+stored before) and with `helpers/state_codec.py` uncompressed and compressed.
+
+The documents are the ones `ConversationState` saves after every turn of
+`WARM_UP_SCRIPT`, run through the bot with the offline recognizer. The memory
+taken by `BookingDetails` with `__slots__` is compared with the former class
+with an instance `__dict__`. Run it with:
+    python -m benchmarks.state_size --repeat 200
+"""
+
+import argparse
+import asyncio
+import time
+import tracemalloc
+
+import jsonpickle
+from botbuilder.core import ConversationState, MemoryStorage, UserState
+from botbuilder.core.adapters import TestAdapter
+
+from booking_details import BookingDetails
+from bots import DialogAndWelcomeBot
+from config import DefaultConfig
+from dialogs import BookingDialog, MainDialog
+from flight_booking_recognizer import FlightBookingRecognizer
+from helpers.state_codec import StateCodec
+from warm_up import WARM_UP_SCRIPT
+
+
+class LegacyBookingDetails:
+    """`BookingDetails` before `__slots__`."""
+
+    def __init__(self, destination=None, origin=None, travel_start_date=None, travel_end_date=None,
+                 n_passengers=None, budget=None, unsupported_airports=None):
+        self.destination = destination
+        self.origin = origin
+        self.travel_start_date = travel_start_date
+        self.travel_end_date = travel_end_date
+        self.n_passengers = n_passengers
+        self.budget = budget
+        self.unsupported_airports = unsupported_airports or []
+
+
+class JsonPickleCodec:
+    def encode(self, item):
+        return jsonpickle.encode(item, keys=True).encode()
+
+    def decode(self, document):
+        return jsonpickle.decode(document.decode(), keys=True)
+
+
+async def conversation_documents() -> list:
+    """The conversation state saved after each turn of one booking."""
+    storage = MemoryStorage()
+    dialog = MainDialog(FlightBookingRecognizer(DefaultConfig()), BookingDialog())
+    bot = DialogAndWelcomeBot(ConversationState(storage), UserState(MemoryStorage()), dialog, None)
+    adapter = TestAdapter(bot.on_turn)
+    documents = []
+    for text in WARM_UP_SCRIPT:
+        await adapter.receive_activity(text)
+        documents.extend(storage.memory.values())
+    return documents
+
+
+def codecs() -> dict:
+    candidates = {
+        "jsonpickle": JsonPickleCodec(),
+        "compact": StateCodec("none"),
+        "compact+zlib": StateCodec("zlib"),
+    }
+    try:
+        import zstandard  # pylint: disable=import-outside-toplevel,unused-import
+
+        candidates["compact+zstd"] = StateCodec("zstd", level=3)
+    except ImportError:
+        pass
+    return candidates
+
+
+def per_item_bytes(kind, count: int = 10000) -> float:
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    items = [kind("Paris", "London", "2031-03-03", "2031-03-10", 2, "500") for _ in range(count)]
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del items
+    return used / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n", 1)[0])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    documents = asyncio.run(conversation_documents())
+    print(f"{len(documents)} documents per conversation")
+    print(f"{'':14}{'bytes/conversation':>20}{'encode':>12}{'decode':>12}")
+    for name, codec in codecs().items():
+        encoded = [codec.encode(document) for document in documents]
+
+        started = time.perf_counter()
+        for _ in range(args.repeat):
+            for document in documents:
+                codec.encode(document)
+        encode = (time.perf_counter() - started) / (args.repeat * len(documents))
+
+        started = time.perf_counter()
+        for _ in range(args.repeat):
+            for document in encoded:
+                codec.decode(document)
+        decode = (time.perf_counter() - started) / (args.repeat * len(documents))
+
+        size = sum(map(len, encoded))
+        print(f"{name:14}{size:20}{encode * 1e6:9.1f} us{decode * 1e6:9.1f} us")
+
+    print(
+        f"\nBookingDetails in memory: {per_item_bytes(LegacyBookingDetails):.0f} bytes with __dict__,"
+        f" {per_item_bytes(BookingDetails):.0f} with __slots__"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""
+Reads and writes per second of `MemoryStorage`, `BoundedMemoryStorage` and
+`SqliteStorage`, and the memory the in-memory storages hold once filled.
+
+Each storage is filled with N conversation states shaped like the ones
+`ConversationState` saves mid-booking, then random keys are read and written
+by concurrent tasks, the way overlapping turns call `load` and
+`save_changes`. Run it with:
+    python -m benchmarks.storage_benchmark --sizes 10000,100000,1000000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+import tracemalloc
+from typing import Dict, List
+
+from botbuilder.core import MemoryStorage, Storage
+from botbuilder.dialogs import DialogInstance, DialogState
+
+from booking_details import BookingDetails
+from bounded_memory_storage import BoundedMemoryStorage
+from sqlite_storage import SqliteStorage
+
+FILL_BATCH = 1000
+
+
+def conversation_state(index: int) -> dict:
+    """A conversation state waiting in BookingDialog for the travel date."""
+    details = BookingDetails(
+        destination="Paris",
+        origin="London",
+        n_passengers=str(1 + index % 4),
+        budget=str(300 + index % 700),
+    )
+    stack = [
+        DialogInstance(id="WaterfallDialog", state={"options": details, "values": {}, "stepIndex": 3}),
+        DialogInstance(id="BookingDialog", state={"dialogs": DialogState()}),
+        DialogInstance(id="WaterfallDialog", state={"options": None, "values": {}, "stepIndex": 1}),
+        DialogInstance(id="MainDialog", state={"dialogs": DialogState()}),
+    ]
+    return {"DialogState": DialogState(stack)}
+
+
+def key(index: int) -> str:
+    return f"emulator/conversations/conversation-{index}/"
+
+
+async def fill(storage: Storage, size: int):
+    for start in range(0, size, FILL_BATCH):
+        await storage.write(
+            {key(index): conversation_state(index) for index in range(start, min(size, start + FILL_BATCH))}
+        )
+
+
+async def timed(operation, keys: List[int], concurrency: int) -> float:
+    """Operations per second of `operation` over `keys` run by `concurrency` tasks."""
+    queue = iter(keys)
+
+    async def worker():
+        for index in queue:
+            await operation(index)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return len(keys) / (time.perf_counter() - start)
+
+
+async def measure(storage: Storage, size: int, operations: int, concurrency: int) -> Dict[str, float]:
+    rng = random.Random(size)
+    started = time.perf_counter()
+    await fill(storage, size)
+    fill_seconds = time.perf_counter() - started
+    filled = dict(getattr(storage, "stats", {}))
+
+    async def read(index):
+        await storage.read([key(index)])
+
+    async def write(index):
+        await storage.write({key(index): conversation_state(index)})
+
+    reads = await timed(read, [rng.randrange(size) for _ in range(operations)], concurrency)
+    writes = await timed(write, [rng.randrange(size) for _ in range(operations)], concurrency)
+    result = {"fill_s": fill_seconds, "reads_per_sec": reads, "writes_per_sec": writes}
+    if isinstance(storage, BoundedMemoryStorage):
+        stats = storage.stats
+        result["cache_hit_rate"] = stats["hits"] / (stats["hits"] + stats["misses"])
+    elif filled:
+        stats = storage.stats
+        result["cache_hit_rate"] = stats["cache_hits"] / stats["reads"]
+        result["writes_per_transaction"] = (stats["writes"] - filled["writes"]) / (
+            stats["transactions"] - filled["transactions"]
+        )
+    return result
+
+
+async def held_megabytes(storage: Storage, size: int) -> float:
+    """Memory allocated by filling `storage` that is still in use afterwards."""
+    tracemalloc.start()
+    await fill(storage, size)
+    held = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return held / 1024 / 1024
+
+
+async def run_benchmark(args) -> List[dict]:
+    results = []
+    for size in args.sizes:
+        memory = await measure(MemoryStorage(), size, args.operations, args.concurrency)
+        memory["held_mb"] = await held_megabytes(MemoryStorage(), size)
+        results.append({"storage": "memory", "conversations": size, **memory})
+
+        bounded = await measure(
+            BoundedMemoryStorage(max_items=args.memory_max_items), size, args.operations, args.concurrency
+        )
+        bounded["held_mb"] = await held_megabytes(BoundedMemoryStorage(max_items=args.memory_max_items), size)
+        results.append({"storage": "bounded", "conversations": size, **bounded})
+
+        directory = tempfile.mkdtemp()
+        try:
+            storage = SqliteStorage(
+                os.path.join(directory, "bot_state.db"), read_cache_size=args.read_cache_size
+            )
+            sqlite = await measure(storage, size, args.operations, args.concurrency)
+            await storage.close()
+        finally:
+            shutil.rmtree(directory)
+        results.append({"storage": "sqlite", "conversations": size, **sqlite})
+    return results
+
+
+def print_report(results: List[dict]):
+    print(
+        f"{'storage':<8}{'conversations':>15}{'fill s':>10}{'reads/s':>12}{'writes/s':>12}"
+        f"{'cache hits':>12}{'writes/txn':>12}{'held MB':>10}"
+    )
+    for row in results:
+        held = f"{row['held_mb']:>10.1f}" if "held_mb" in row else f"{'-':>10}"
+        print(
+            f"{row['storage']:<8}{row['conversations']:>15}{row['fill_s']:>10.1f}"
+            f"{row['reads_per_sec']:>12.0f}{row['writes_per_sec']:>12.0f}"
+            f"{row.get('cache_hit_rate', 1.0):>12.1%}{row.get('writes_per_transaction', 1.0):>12.1f}{held}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n", 1)[0])
+    parser.add_argument(
+        "--sizes",
+        type=lambda value: [int(size) for size in value.split(",")],
+        default=[10000, 100000, 1000000],
+        help="Comma separated numbers of stored conversations.",
+    )
+    parser.add_argument("--operations", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--read-cache-size", type=int, default=10000)
+    parser.add_argument("--memory-max-items", type=int, default=100000)
+    parser.add_argument("--json", help="Write the results to this file.")
+    args = parser.parse_args()
+
+    results = asyncio.run(run_benchmark(args))
+    print_report(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as result_file:
+            json.dump(results, result_file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
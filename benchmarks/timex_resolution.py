@@ -0,0 +1,96 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""
+Per-turn cost of the timex checks a date-resolution turn makes, parsing a
+`Timex` at every call site as before against the shared `TIMEX_CACHE`.
+
+A turn runs `BookingDialog.is_ambiguous`, `DateResolverDialog.initial_step`
+and `DateResolverDialog.datetime_prompt_validator` on the same timex. Run it with:
+    python -m benchmarks.timex_resolution --turns 20000
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from types import SimpleNamespace
+
+from datatypes_date_time.timex import Timex
+
+from dialogs import BookingDialog
+from dialogs.date_resolver_dialog import DateResolverDialog
+from helpers.timex_cache import TIMEX_CACHE
+
+# What LUIS and the DateTimePrompt return for the dates users type.
+TIMEXES = [
+    "2031-03-03", "XXXX-03-03", "2031-06-12", "XXXX-06-12", "2031-04-01",
+    "2031-04-09", "XXXX-WXX-1", "XXXX-WXX-5", "2031-03", "2031-01-05T10",
+    "2031-07-04", "2031-07-18", "XXXX-12-24", "2031-02-14", "2031-08-01",
+]
+
+
+async def _prompt(*_):
+    return "prompt"
+
+
+async def _next(*_):
+    return "next"
+
+
+def _contexts(timex: str):
+    step = SimpleNamespace(options=timex, prompt=_prompt, next=_next)
+    prompt = SimpleNamespace(
+        recognized=SimpleNamespace(succeeded=True, value=[SimpleNamespace(timex=timex)])
+    )
+    return step, prompt
+
+
+async def legacy_turn(timex: str, step, prompt):
+    """The three checks as they were, each parsing its own `Timex`."""
+    ambiguous = "definite" not in Timex(timex).types
+    reprompt = "definite" in Timex(step.options).types
+    valid = "definite" in Timex(prompt.recognized.value[0].timex.split("T")[0]).types
+    return ambiguous, reprompt, valid
+
+
+async def cached_turn(booking: BookingDialog, resolver: DateResolverDialog, timex: str, step, prompt):
+    booking.is_ambiguous(timex)
+    await resolver.initial_step(step)
+    await DateResolverDialog.datetime_prompt_validator(prompt)
+
+
+async def run(turns: int):
+    booking = BookingDialog()
+    resolver = DateResolverDialog(DateResolverDialog.__name__)
+    rng = random.Random(7)
+    sequence = [rng.choice(TIMEXES) for _ in range(turns)]
+    contexts = {timex: _contexts(timex) for timex in TIMEXES}
+
+    start = time.perf_counter()
+    for timex in sequence:
+        await legacy_turn(timex, *contexts[timex])
+    legacy = (time.perf_counter() - start) / turns
+
+    TIMEX_CACHE.clear()
+    hits, misses = TIMEX_CACHE.hits, TIMEX_CACHE.misses
+    start = time.perf_counter()
+    for timex in sequence:
+        await cached_turn(booking, resolver, timex, *contexts[timex])
+    cached = (time.perf_counter() - start) / turns
+
+    print(f"{turns} turns over {len(TIMEXES)} timex values")
+    print(f"Timex per call:  {legacy * 1e6:8.1f} us/turn")
+    print(f"TIMEX_CACHE:     {cached * 1e6:8.1f} us/turn ({legacy / cached:.1f}x)")
+    hits, misses = TIMEX_CACHE.hits - hits, TIMEX_CACHE.misses - misses
+    print(f"cache: {hits} hits, {misses} misses ({hits / (hits + misses):.2%} hit rate), {len(TIMEX_CACHE)} entries")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n", 1)[0])
+    parser.add_argument("--turns", type=int, default=20000)
+    args = parser.parse_args()
+    asyncio.run(run(args.turns))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""
+Turns per second, and conversation state updates lost, when a burst of turns
+spread over a number of conversations runs with and without `TurnScheduler`.
+
+Each turn reads its conversation's state from `MemoryStorage`, waits
+`--latency-ms` (a LUIS call), and writes the state back with its counter
+incremented, as a dialog turn does. Run it with:
+    python -m benchmarks.turn_scheduling --turns 2000 --conversations 1,10,100,1000 --latency-ms 20
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+from botbuilder.core import MemoryStorage
+
+from turn_scheduler import TurnScheduler
+
+
+async def measure(conversations: int, scheduled: bool, args) -> dict:
+    storage = MemoryStorage()
+    # Queued without bound: the benchmark measures the ordering, not the refusals.
+    scheduler = TurnScheduler(max_queued_per_key=args.turns, queue_timeout_seconds=3600) if scheduled else None
+
+    async def turn(key: str):
+        state = (await storage.read([key])).get(key, {"turns": 0})
+        await asyncio.sleep(args.latency_ms / 1000)
+        await storage.write({key: {"turns": state["turns"] + 1}})
+
+    async def deliver(index: int):
+        key = f"conversation-{index % conversations}"
+        if scheduler is None:
+            await turn(key)
+        else:
+            await scheduler.run(key, lambda: turn(key))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(deliver(index) for index in range(args.turns)))
+    elapsed = time.perf_counter() - started
+
+    keys = [f"conversation-{index}" for index in range(conversations)]
+    counted = sum(item["turns"] for item in (await storage.read(keys)).values())
+    return {
+        "conversations": conversations,
+        "scheduler": scheduled,
+        "turns_per_sec": args.turns / elapsed,
+        "lost_updates": args.turns - counted,
+        "conversations_left": scheduler.stats["conversations"] if scheduler else 0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n", 1)[0])
+    parser.add_argument("--turns", type=int, default=2000)
+    parser.add_argument("--conversations", default="1,10,100,1000")
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--json", help="Write the results to this file.")
+    args = parser.parse_args()
+
+    results = [
+        asyncio.run(measure(int(conversations), scheduled, args))
+        for conversations in args.conversations.split(",")
+        for scheduled in (False, True)
+    ]
+
+    print(f"{args.turns} turns at once, {args.latency_ms:g} ms per turn")
+    print(f"{'conversations':>13} {'scheduler':>9} {'turns/s':>10} {'lost updates':>13}")
+    for row in results:
+        print(
+            f"{row['conversations']:13d} {'on' if row['scheduler'] else 'off':>9} "
+            f"{row['turns_per_sec']:10.1f} {row['lost_updates']:13d}"
+        )
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as result_file:
+            json.dump(results, result_file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,18 @@
 
 
 class BookingDetails:
+    # No instance __dict__: the details live in every stored dialog stack
+    # (see helpers/state_codec.py, which writes them in this order).
+    __slots__ = (
+        "destination",
+        "origin",
+        "travel_start_date",
+        "travel_end_date",
+        "n_passengers",
+        "budget",
+        "unsupported_airports",
+    )
+
     def __init__(
         self,
         destination: str = None,
@@ -22,3 +34,17 @@ class BookingDetails:
         self.n_passengers = n_passengers
         self.budget = budget
         self.unsupported_airports = unsupported_airports
+
+    # Compared by value but mutable (the dialogs fill it in), so not hashable.
+    __hash__ = None
+
+    def __eq__(self, other):
+        if not isinstance(other, BookingDetails):
+            return NotImplemented
+        return all(
+            getattr(self, name) == getattr(other, name) for name in self.__slots__
+        )
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"BookingDetails({fields})"
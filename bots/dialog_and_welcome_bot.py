@@ -14,6 +14,7 @@ from botbuilder.core import (
 )
 from botbuilder.schema import Activity, Attachment, ChannelAccount
 from helpers.activity_helper import create_activity_reply
+from turn_metrics import TurnMetrics
 from .dialog_bot import DialogBot
 
 
@@ -26,9 +27,10 @@ class DialogAndWelcomeBot(DialogBot):
         user_state: UserState,
         dialog: Dialog,
         telemetry_client: BotTelemetryClient,
+        metrics: TurnMetrics = None,
     ):
         super(DialogAndWelcomeBot, self).__init__(
-            conversation_state, user_state, dialog, telemetry_client
+            conversation_state, user_state, dialog, telemetry_client, metrics
         )
         self.telemetry_client = telemetry_client
 
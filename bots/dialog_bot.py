@@ -1,6 +1,7 @@
 # Copyright (c) Microsoft Corporation. All rights reserved.
 # Licensed under the MIT License.
 """Implements bot Activity handler."""
+import time
 
 from botbuilder.core import (
     ActivityHandler,
@@ -11,7 +12,8 @@ from botbuilder.core import (
     NullTelemetryClient,
 )
 from botbuilder.dialogs import Dialog, DialogExtensions
-from helpers.dialog_helper import DialogHelper
+from helpers.state_helper import ConcurrentBotStateSet
+from turn_metrics import TurnMetrics
 
 
 class DialogBot(ActivityHandler):
@@ -23,6 +25,7 @@ class DialogBot(ActivityHandler):
         user_state: UserState,
         dialog: Dialog,
         telemetry_client: BotTelemetryClient,
+        metrics: TurnMetrics = None,
     ):
         if conversation_state is None:
             raise Exception(
@@ -35,20 +38,36 @@ class DialogBot(ActivityHandler):
 
         self.conversation_state = conversation_state
         self.user_state = user_state
+        self.bot_states = ConcurrentBotStateSet([conversation_state, user_state])
         self.dialog = dialog
         self.telemetry_client = telemetry_client
+        self.metrics = metrics
 
     async def on_message_activity(self, turn_context: TurnContext):
+        if self.metrics is None:
+            await self._run_dialog(turn_context)
+            # Save any state changes that might have occured during the turn.
+            await self.bot_states.save_all_changes(turn_context, False)
+            return
+
+        # Loaded up front, so the dialogs find it cached and the load is timed on its own.
+        started = time.perf_counter()
+        await self.conversation_state.load(turn_context)
+        self.metrics.state_load.observe(time.perf_counter() - started)
+
+        await self._run_dialog(turn_context)
+
+        started = time.perf_counter()
+        await self.bot_states.save_all_changes(turn_context, False)
+        self.metrics.state_save.observe(time.perf_counter() - started)
+
+    async def _run_dialog(self, turn_context: TurnContext):
         await DialogExtensions.run_dialog(
             self.dialog,
             turn_context,
             self.conversation_state.create_property("DialogState"),
         )
 
-        # Save any state changes that might have occured during the turn.
-        await self.conversation_state.save_changes(turn_context, False)
-        await self.user_state.save_changes(turn_context, False)
-
     @property
     def telemetry_client(self) -> BotTelemetryClient:
         """
@@ -0,0 +1,274 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""In-memory bot state storage bounded by idle time, item count and size."""
+
+import sys
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Tuple
+
+from botbuilder.core import Storage, StoreItem
+
+from helpers.state_codec import StateCodec
+from helpers.store_items import get_e_tag, set_e_tag
+
+
+class BoundedMemoryStorage(Storage):
+    """
+    Drop-in replacement for `MemoryStorage` that does not keep every
+    conversation until the process exits.
+
+    Items are kept encoded by `codec` (see helpers/state_codec.py), so a read
+    returns an independent copy and the size of every item is known. An item
+    not read or written for `ttl_seconds` expires. Past `max_items` items or
+    `max_bytes` bytes, the least recently used items are evicted; with a
+    `spill` storage (e.g. a `SqliteStorage` on local disk) they are moved
+    there and brought back by the next read, otherwise they are dropped.
+    Only keys this instance evicted are looked up in `spill`, so rows left
+    by an earlier process are never read.
+
+    Etags work like `SqliteStorage`: every write stamps a new one on the item,
+    and writing an item whose `e_tag` is neither empty nor "*" and no longer
+    matches the stored one raises `KeyError`. `stats` holds the live gauges.
+    """
+
+    def __init__(
+        self,
+        max_items: int = 100000,
+        max_bytes: int = 256 * 1024 * 1024,
+        ttl_seconds: float = 24 * 60 * 60,
+        spill: Storage = None,
+        codec: StateCodec = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        super(BoundedMemoryStorage, self).__init__()
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.spill = spill
+        self.codec = codec or StateCodec()
+        self._clock = clock
+        self._e_tag = 0
+        # key -> (e_tag, document, last access), least recently used first.
+        self._items: "OrderedDict[str, Tuple[str, bytes, float]]" = OrderedDict()
+        self.bytes = 0
+        # Keys moved to `spill` -> (e_tag, last access), oldest first; evicted
+        # items whose spill write has not finished are also in `_spilling`.
+        self._spilled: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._spilling: Dict[str, Tuple[str, bytes, float]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.restored = 0
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return {
+            "items": len(self._items),
+            "bytes": self.bytes,
+            "max_items": self.max_items,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "spilled": len(self._spilled),
+            "restored": self.restored,
+        }
+
+    async def read(self, keys: List[str]):
+        data = {}
+        if not keys:
+            return data
+        now = self._clock()
+        await self._expire(now)
+
+        spilled = []
+        for key in keys:
+            entry = self._items.get(key)
+            if entry is None:
+                if key in self._spilled:
+                    spilled.append(key)
+                else:
+                    self.misses += 1
+                continue
+            self.hits += 1
+            self._touch(key, entry, now)
+            data[key] = self._item(entry)
+
+        if spilled:
+            for key, entry in (await self._restore(spilled, now)).items():
+                data[key] = self._item(entry)
+        return data
+
+    async def write(self, changes: Dict[str, StoreItem]):
+        if changes is None:
+            raise Exception("Changes are required when writing")
+        if not changes:
+            return
+        now = self._clock()
+        await self._expire(now)
+
+        # Every change is checked before any is applied, as one write is one transaction.
+        for key, change in changes.items():
+            new_value_etag = get_e_tag(change)
+            if new_value_etag == "":
+                raise Exception("bounded_memory_storage.write(): etag missing")
+            old_state_etag = self._current_e_tag(key)
+            if (
+                old_state_etag is not None
+                and new_value_etag is not None
+                and new_value_etag != "*"
+                and new_value_etag != old_state_etag
+            ):
+                raise KeyError(
+                    "Etag conflict.\nOriginal: %s\r\nCurrent: %s"
+                    % (new_value_etag, old_state_etag)
+                )
+
+        superseded = []
+        for key, change in changes.items():
+            self._e_tag += 1
+            e_tag = str(self._e_tag)
+            self._remove(key)
+            if self._spilled.pop(key, None) is not None:
+                superseded.append(key)
+            self._add(key, (e_tag, self.codec.encode(change), now))
+            set_e_tag(change, e_tag)
+
+        evicted = self._evict()
+        if superseded:
+            await self.spill.delete(superseded)
+        await self._spill(evicted)
+
+    async def delete(self, keys: List[str]):
+        spilled = []
+        for key in keys:
+            self._remove(key)
+            if self._spilled.pop(key, None) is not None:
+                spilled.append(key)
+        if spilled:
+            await self.spill.delete(spilled)
+
+    async def close(self):
+        """Closes the spill storage, if it needs closing."""
+        if self.spill is not None and hasattr(self.spill, "close"):
+            await self.spill.close()
+
+    def _item(self, entry: Tuple[str, bytes, float]) -> StoreItem:
+        item = self.codec.decode(entry[1])
+        set_e_tag(item, entry[0])
+        return item
+
+    def _current_e_tag(self, key: str) -> str:
+        entry = self._items.get(key)
+        if entry is not None:
+            return entry[0]
+        spilled = self._spilled.get(key)
+        return spilled[0] if spilled is not None else None
+
+    def _touch(self, key: str, entry: Tuple[str, bytes, float], now: float):
+        self._items[key] = (entry[0], entry[1], now)
+        self._items.move_to_end(key)
+
+    def _add(self, key: str, entry: Tuple[str, bytes, float]):
+        self._items[key] = entry
+        self.bytes += self._size(key, entry)
+
+    def _remove(self, key: str) -> Tuple[str, bytes, float]:
+        entry = self._items.pop(key, None)
+        if entry is not None:
+            self.bytes -= self._size(key, entry)
+        return entry
+
+    @staticmethod
+    def _size(key: str, entry: Tuple[str, bytes, float]) -> int:
+        # What the key, etag and document take; dict and tuple overhead is left out.
+        return sys.getsizeof(key) + sys.getsizeof(entry[0]) + sys.getsizeof(entry[1])
+
+    async def _expire(self, now: float):
+        deadline = now - self.ttl_seconds
+        # Least recently used first, so the expired entries are at the front.
+        while self._items:
+            key, entry = next(iter(self._items.items()))
+            if entry[2] > deadline:
+                break
+            self._remove(key)
+            self.expirations += 1
+
+        expired = []
+        while self._spilled:
+            key, (_, touched) = next(iter(self._spilled.items()))
+            if touched > deadline:
+                break
+            del self._spilled[key]
+            expired.append(key)
+            self.expirations += 1
+        if expired:
+            await self.spill.delete(expired)
+
+    def _evict(self) -> List[Tuple[str, Tuple[str, bytes, float]]]:
+        evicted = []
+        # The most recently written item stays, even when it alone is over max_bytes.
+        while len(self._items) > 1 and (
+            len(self._items) > self.max_items or self.bytes > self.max_bytes
+        ):
+            key = next(iter(self._items))
+            evicted.append((key, self._remove(key)))
+            self.evictions += 1
+        return evicted
+
+    async def _spill(self, evicted: List[Tuple[str, Tuple[str, bytes, float]]]):
+        if self.spill is None or not evicted:
+            return
+        changes = {}
+        for key, entry in evicted:
+            self._spilled[key] = (entry[0], entry[2])
+            self._spilling[key] = entry
+            changes[key] = {"item": self.codec.decode(entry[1]), "e_tag": "*"}
+        try:
+            await self.spill.write(changes)
+        finally:
+            for key, entry in evicted:
+                if self._spilling.get(key) is entry:
+                    del self._spilling[key]
+        # Restored, written or deleted while the write ran: the row just
+        # written is stale, and a later eviction must not bring it back.
+        stale = [key for key, _ in evicted if key not in self._spilled]
+        if stale:
+            await self.spill.delete(stale)
+
+    async def _restore(self, keys: List[str], now: float) -> Dict[str, Tuple[str, bytes, float]]:
+        restored = {}
+        pending = [key for key in keys if key not in self._spilling]
+        rows = await self.spill.read(pending) if pending else {}
+        for key in keys:
+            spilled = self._spilled.get(key)
+            if key in self._items or spilled is None:
+                # Written, deleted or restored while the spill was read.
+                entry = self._items.get(key)
+                if entry is not None:
+                    restored[key] = entry
+                continue
+            if key in self._spilling:
+                document = self._spilling[key][1]
+            elif key in rows:
+                document = self.codec.encode(rows[key]["item"])
+            else:
+                continue
+            del self._spilled[key]
+            entry = (spilled[0], document, now)
+            self._add(key, entry)
+            restored[key] = entry
+            self.restored += 1
+        for key in keys:
+            if key not in restored:
+                self.misses += 1
+        self.hits += len(restored)
+
+        fetched = [key for key in restored if key in rows]
+        if fetched:
+            await self.spill.delete(fetched)
+        await self._spill(self._evict())
+        return restored
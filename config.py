@@ -10,12 +10,97 @@ class DefaultConfig:
     """Configuration for the bot."""
 
     PORT = 3978
+    # Processes serving PORT together (SO_REUSEPORT); more than one requires
+    # StateStorage=sqlite so every worker sees every conversation.
+    WORKERS = int(os.environ.get("Workers", 1))
+    # Time a stopping worker is given to finish the requests in flight.
+    WORKER_SHUTDOWN_TIMEOUT_SECONDS = float(
+        os.environ.get("WorkerShutdownTimeoutSeconds", 30)
+    )
     APP_ID = os.environ.get("MicrosoftAppId", "")
     APP_PASSWORD = os.environ.get("MicrosoftAppPassword", "")
     LUIS_APP_ID = os.environ.get("LuisAppId", "")
     LUIS_API_KEY = os.environ.get("LuisAPIKey", "")
     # LUIS endpoint host name, ie "westus.api.cognitive.microsoft.com"
+    # (or a full URL such as "http://localhost:5050" for the local stand-in)
     LUIS_API_HOST_NAME = os.environ.get("LuisAPIHostName", "")
+    # In-process recognizer compiled from cognitiveModels/FlightBooking.json; LUIS is
+    # skipped when its result explains at least this share of the utterance.
+    OFFLINE_RECOGNIZER_ENABLED = (
+        os.environ.get("OfflineRecognizerEnabled", "true").lower() == "true"
+    )
+    OFFLINE_RECOGNIZER_THRESHOLD = float(
+        os.environ.get("OfflineRecognizerThreshold", 0.85)
+    )
+    # Cache of LUIS results for repeated utterances; a size of 0 disables it.
+    RECOGNITION_CACHE_SIZE = int(os.environ.get("RecognitionCacheSize", 1024))
+    RECOGNITION_CACHE_TTL_SECONDS = float(
+        os.environ.get("RecognitionCacheTtlSeconds", 300)
+    )
+    # Bot state storage: "sqlite" (durable, see sqlite_storage.py) or "memory"
+    # (bounded, see bounded_memory_storage.py).
+    STATE_STORAGE = os.environ.get("StateStorage", "sqlite").lower()
+    SQLITE_STORAGE_PATH = os.environ.get("SqliteStoragePath", "bot_state.db")
+    # Recently used state documents kept in process; 0 disables the cache.
+    # It is always disabled with several workers, as others write the same rows.
+    SQLITE_READ_CACHE_SIZE = int(os.environ.get("SqliteReadCacheSize", 10000))
+    # In-memory storage: items idle for longer than the TTL expire, and the least
+    # recently used are evicted past the item or byte cap. With a spill path,
+    # evicted items are moved to a SQLite database there instead of dropped.
+    MEMORY_STORAGE_MAX_ITEMS = int(os.environ.get("MemoryStorageMaxItems", 100000))
+    MEMORY_STORAGE_MAX_BYTES = int(
+        os.environ.get("MemoryStorageMaxBytes", 256 * 1024 * 1024)
+    )
+    MEMORY_STORAGE_TTL_SECONDS = float(
+        os.environ.get("MemoryStorageTtlSeconds", 24 * 60 * 60)
+    )
+    MEMORY_STORAGE_SPILL_PATH = os.environ.get("MemoryStorageSpillPath", "")
+    # Compression of stored state documents: "zlib", "zstd" (needs zstandard) or "none".
+    STATE_COMPRESSION = os.environ.get("StateCompression", "zlib").lower()
+    # Prime recognizers, LUIS and the dialogs before accepting requests (see warm_up.py).
+    WARM_UP_ENABLED = os.environ.get("WarmUpEnabled", "true").lower() == "true"
+    # Deliver a turn's replies when it ends, merging consecutive text messages
+    # (see adapter_with_error_handler.py).
+    COALESCE_REPLIES = os.environ.get("CoalesceReplies", "false").lower() == "true"
+    # Replies are posted through one keep-alive aiohttp session per service URL,
+    # with service tokens cached and refreshed ahead of expiry (see connector_pool.py).
+    CONNECTOR_POOL_ENABLED = os.environ.get("ConnectorPoolEnabled", "true").lower() == "true"
+    CONNECTOR_MAX_CONNECTIONS_PER_HOST = int(os.environ.get("ConnectorMaxConnectionsPerHost", 100))
+    CONNECTOR_KEEPALIVE_SECONDS = float(os.environ.get("ConnectorKeepaliveSeconds", 30))
+    # Validated Authorization headers kept until their token expires, and the
+    # issuers' signing keys refreshed in the background (see token_validation.py);
+    # 0 validates every request with the SDK alone.
+    TOKEN_VALIDATION_CACHE_SIZE = int(os.environ.get("TokenValidationCacheSize", 10000))
+    # At most this many turns run at once, and at most the per-channel number from
+    # one channel (0: no channel limit); the rest wait in a queue of TurnQueueSize
+    # for TurnQueueTimeoutSeconds, then get 429/503 with Retry-After
+    # (see admission_control.py). 0 admits every request.
+    MAX_CONCURRENT_TURNS = int(os.environ.get("MaxConcurrentTurns", 128))
+    MAX_CONCURRENT_TURNS_PER_CHANNEL = int(os.environ.get("MaxConcurrentTurnsPerChannel", 0))
+    TURN_QUEUE_SIZE = int(os.environ.get("TurnQueueSize", 512))
+    TURN_QUEUE_TIMEOUT_SECONDS = float(os.environ.get("TurnQueueTimeoutSeconds", 5))
+    # Run the turns of one conversation one at a time, in arrival order, so
+    # concurrent activities do not overwrite each other's dialog state
+    # (see turn_scheduler.py).
+    SERIALIZE_CONVERSATION_TURNS = (
+        os.environ.get("SerializeConversationTurns", "true").lower() == "true"
+    )
+    # At most this many turns of one conversation wait behind the running one, for
+    # at most the timeout; the rest get 429 with Retry-After.
+    CONVERSATION_QUEUE_SIZE = int(os.environ.get("ConversationQueueSize", 8))
+    CONVERSATION_QUEUE_TIMEOUT_SECONDS = float(
+        os.environ.get("ConversationQueueTimeoutSeconds", 5)
+    )
+    # Bearer token of the admin routes (POST /admin/profile, see sampling_profiler.py);
+    # they are not served without one.
+    ADMIN_TOKEN = os.environ.get("AdminToken", "")
+    PROFILER_MAX_SECONDS = float(os.environ.get("ProfilerMaxSeconds", 60))
     APPINSIGHTS_INSTRUMENTATION_KEY = os.environ.get(
         "AppInsightsInstrumentationKey", ""
     )
+    # Telemetry is queued and sent from a background thread in batches.
+    TELEMETRY_QUEUE_SIZE = int(os.environ.get("TelemetryQueueSize", 10000))
+    TELEMETRY_BATCH_SIZE = int(os.environ.get("TelemetryBatchSize", 100))
+    TELEMETRY_FLUSH_INTERVAL_SECONDS = float(
+        os.environ.get("TelemetryFlushIntervalSeconds", 5)
+    )
@@ -0,0 +1,330 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Connector clients sharing pooled aiohttp sessions and cached service tokens."""
+
+import asyncio
+import base64
+import json
+import time
+from functools import partial
+from typing import AsyncIterator, Callable, Dict, Optional, Tuple
+
+import aiohttp
+from botframework.connector.aio import ConnectorClient
+from botframework.connector.auth import AppCredentials
+from msrest.pipeline import AsyncHTTPPolicy, AsyncHTTPSender, AsyncPipeline, Request, Response
+from msrest.pipeline.universal import RawDeserializer
+from msrest.universal_http import AsyncClientResponse, ClientRequest
+from multidict import CIMultiDict
+
+# The chunk size msrest streams downloads with.
+CONTENT_CHUNK_SIZE = 10 * 1024
+
+
+class ServiceTokenCache:
+    """
+    Access tokens of `AppCredentials`, one per app id and OAuth scope.
+
+    `get_access_token` goes to Azure AD through msal's blocking HTTP client,
+    so it only ever runs on an executor thread, and concurrent turns needing
+    the same token wait for one call. A token is refreshed in the background
+    once it is within `refresh_margin_seconds` of its expiry, while turns
+    keep using it. The expiry is read from the token's "exp" claim; tokens
+    without one are kept for `default_lifetime_seconds`.
+    """
+
+    def __init__(
+        self,
+        refresh_margin_seconds: float = 300.0,
+        default_lifetime_seconds: float = 600.0,
+        retry_seconds: float = 30.0,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.refresh_margin_seconds = refresh_margin_seconds
+        self.default_lifetime_seconds = default_lifetime_seconds
+        self.retry_seconds = retry_seconds
+        self._clock = clock
+        # (app id, scope) -> (token, expires at)
+        self._tokens: Dict[Tuple[str, str], Tuple[str, float]] = {}
+        self._fetching: Dict[Tuple[str, str], asyncio.Future] = {}
+        # (app id, scope) -> when a background refresh last started.
+        self._refreshed: Dict[Tuple[str, str], float] = {}
+        self.hits = 0
+        self.fetches = 0
+        self.refreshes = 0
+        self.errors = 0
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return {
+            "tokens": len(self._tokens),
+            "hits": self.hits,
+            "fetches": self.fetches,
+            "refreshes": self.refreshes,
+            "errors": self.errors,
+        }
+
+    async def token(self, credentials: AppCredentials) -> str:
+        key = (credentials.microsoft_app_id, credentials.oauth_scope)
+        cached = self._tokens.get(key)
+        now = self._clock()
+        if cached is None or now >= cached[1]:
+            return await self._fetch(key, credentials)
+
+        self.hits += 1
+        if (
+            now >= cached[1] - self.refresh_margin_seconds
+            and key not in self._fetching
+            and now >= self._refreshed.get(key, 0.0) + self.retry_seconds
+        ):
+            self._refreshed[key] = now
+            self.refreshes += 1
+            asyncio.ensure_future(self._refresh(key, credentials))
+        return cached[0]
+
+    def invalidate(self, credentials: AppCredentials):
+        """Forgets the token of `credentials`, e.g. after the connector refused it."""
+        self._tokens.pop((credentials.microsoft_app_id, credentials.oauth_scope), None)
+
+    async def _refresh(self, key: Tuple[str, str], credentials: AppCredentials):
+        try:
+            await self._fetch(key, credentials)
+        except Exception:  # pylint: disable=broad-except
+            # Counted in `errors`; the current token stays in use until it expires.
+            pass
+
+    async def _fetch(self, key: Tuple[str, str], credentials: AppCredentials) -> str:
+        fetching = self._fetching.get(key)
+        if fetching is None:
+            fetching = self._fetching[key] = asyncio.ensure_future(self._get_access_token(key, credentials))
+        return await asyncio.shield(fetching)
+
+    async def _get_access_token(self, key: Tuple[str, str], credentials: AppCredentials) -> str:
+        self.fetches += 1
+        try:
+            token = await asyncio.get_event_loop().run_in_executor(None, credentials.get_access_token, True)
+        except Exception:
+            self.errors += 1
+            raise
+        finally:
+            del self._fetching[key]
+        expires_at = _expiry(token) or self._clock() + self.default_lifetime_seconds
+        self._tokens[key] = (token, expires_at)
+        return token
+
+
+class ConnectorClientPool:
+    """
+    `ConnectorClient`s whose requests go through one keep-alive aiohttp
+    session per service URL, instead of the `requests` sessions
+    `BotFrameworkAdapter` runs on executor threads, and whose bearer tokens
+    come from a `ServiceTokenCache` instead of being fetched on the event
+    loop. A request the connector answers with 401 is retried once with a
+    new token.
+
+    A session keeps up to `max_connections_per_host` connections, each
+    closed once idle for `keepalive_seconds`. `stats` counts the
+    connections opened and reused; `close` closes the sessions.
+    """
+
+    def __init__(
+        self,
+        token_cache: ServiceTokenCache = None,
+        max_connections_per_host: int = 100,
+        keepalive_seconds: float = 30.0,
+        timeout_seconds: float = 100.0,
+        user_agent: str = None,
+    ):
+        self.token_cache = token_cache or ServiceTokenCache()
+        self.max_connections_per_host = max_connections_per_host
+        self.keepalive_seconds = keepalive_seconds
+        self.timeout_seconds = timeout_seconds
+        self.user_agent = user_agent
+        self._sessions: Dict[str, aiohttp.ClientSession] = {}
+        self._clients: Dict[Tuple[str, str, str], ConnectorClient] = {}
+        self.requests = 0
+        self.connections_opened = 0
+        self.connections_reused = 0
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return {
+            "sessions": len(self._sessions),
+            "clients": len(self._clients),
+            "requests": self.requests,
+            "connections_opened": self.connections_opened,
+            "connections_reused": self.connections_reused,
+            **{f"token_{name}": value for name, value in self.token_cache.stats.items()},
+        }
+
+    def client(self, service_url: str, credentials: AppCredentials) -> ConnectorClient:
+        key = (service_url, credentials.microsoft_app_id, credentials.oauth_scope)
+        client = self._clients.get(key)
+        if client is None:
+            pipeline = partial(_PooledPipeline, self._session(service_url), self, credentials)
+            client = ConnectorClient(credentials, base_url=service_url, pipeline_type=pipeline)
+            if self.user_agent:
+                client.config.add_user_agent(self.user_agent)
+            self._clients[key] = client
+        return client
+
+    async def close(self):
+        sessions = list(self._sessions.values())
+        self._sessions.clear()
+        self._clients.clear()
+        for session in sessions:
+            await session.close()
+
+    def _session(self, service_url: str) -> aiohttp.ClientSession:
+        session = self._sessions.get(service_url)
+        if session is None or session.closed:
+            trace_config = aiohttp.TraceConfig()
+            trace_config.on_connection_create_end.append(self._on_connection_created)
+            trace_config.on_connection_reuseconn.append(self._on_connection_reused)
+            session = self._sessions[service_url] = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=0,
+                    limit_per_host=self.max_connections_per_host,
+                    keepalive_timeout=self.keepalive_seconds,
+                ),
+                timeout=aiohttp.ClientTimeout(total=self.timeout_seconds),
+                trace_configs=[trace_config],
+                # Honour HTTP(S)_PROXY and NO_PROXY, as the `requests` sessions did.
+                trust_env=True,
+            )
+        return session
+
+    async def _on_connection_created(self, *_):
+        self.connections_opened += 1
+
+    async def _on_connection_reused(self, *_):
+        self.connections_reused += 1
+
+
+class _PooledPipeline(AsyncPipeline):
+    def __init__(self, session: aiohttp.ClientSession, pool: ConnectorClientPool, credentials: AppCredentials, config):
+        super(_PooledPipeline, self).__init__(
+            [
+                config.user_agent_policy,
+                _BearerTokenPolicy(pool.token_cache, credentials),
+                RawDeserializer(),
+                config.http_logger_policy,
+            ],
+            _SessionSender(session, pool),
+        )
+
+
+class _BearerTokenPolicy(AsyncHTTPPolicy):
+    def __init__(self, token_cache: ServiceTokenCache, credentials: AppCredentials):
+        super(_BearerTokenPolicy, self).__init__()
+        self.token_cache = token_cache
+        self.credentials = credentials
+
+    async def send(self, request: Request, **kwargs) -> Response:
+        # Unauthenticated bots (no app id) send no token, like AppCredentials.signed_session.
+        if not self.credentials._should_set_token(None):  # pylint: disable=protected-access
+            return await self.next.send(request, **kwargs)
+
+        await self._authorize(request)
+        response = await self.next.send(request, **kwargs)
+        if response.http_response.status_code == 401:
+            self.token_cache.invalidate(self.credentials)
+            await self._authorize(request)
+            response = await self.next.send(request, **kwargs)
+        return response
+
+    async def _authorize(self, request: Request):
+        token = await self.token_cache.token(self.credentials)
+        request.http_request.headers["Authorization"] = f"Bearer {token}"
+
+
+class _SessionSender(AsyncHTTPSender):
+    def __init__(self, session: aiohttp.ClientSession, pool: ConnectorClientPool):
+        self.session = session
+        self.pool = pool
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_details):  # pylint: disable=arguments-differ
+        # The session belongs to the pool, which closes it.
+        pass
+
+    async def send(self, request: Request, **config) -> Response:
+        http_request = request.http_request
+        data = _form_data(http_request.files) if http_request.files else http_request.data
+        self.pool.requests += 1
+        response = await self.session.request(
+            http_request.method, http_request.url, headers=http_request.headers, data=data
+        )
+        # A streamed download (`attachments.get_attachment`) is read by
+        # `stream_download`; other bodies, and errors, are read here.
+        if config.get("stream", False) and response.status < 400:
+            return Response(request, _SessionResponse(http_request, response, None))
+        try:
+            body = await response.read()
+        finally:
+            response.release()
+        return Response(request, _SessionResponse(http_request, response, body))
+
+
+class _SessionResponse(AsyncClientResponse):
+    def __init__(self, request: ClientRequest, response: aiohttp.ClientResponse, body: Optional[bytes]):
+        super(_SessionResponse, self).__init__(request, response)
+        self.status_code = response.status
+        self.headers = CIMultiDict(response.headers)
+        self.reason = response.reason
+        self._body = body
+
+    def body(self) -> bytes:
+        if self._body is None:
+            raise ValueError("The body of a streamed response is read with stream_download.")
+        return self._body
+
+    def raise_for_status(self):
+        self.internal_response.raise_for_status()
+
+    def stream_download(self, chunk_size: int = None, callback: Callable = None) -> AsyncIterator[bytes]:
+        return _stream(self.internal_response, self._body, chunk_size or CONTENT_CHUNK_SIZE, callback)
+
+
+async def _stream(
+    response: aiohttp.ClientResponse, body: Optional[bytes], chunk_size: int, callback: Optional[Callable]
+) -> AsyncIterator[bytes]:
+    try:
+        if body is None:
+            chunks = response.content.iter_chunked(chunk_size)
+        else:
+            chunks = _chunks(body, chunk_size)
+        async for chunk in chunks:
+            if callback:
+                callback(chunk, response)
+            yield chunk
+    finally:
+        response.release()
+
+
+async def _chunks(body: bytes, chunk_size: int) -> AsyncIterator[bytes]:
+    for start in range(0, len(body), chunk_size):
+        yield body[start : start + chunk_size]
+
+
+def _form_data(files: dict) -> aiohttp.FormData:
+    """The multipart body of `ClientRequest.add_formdata`: (None, text) fields and (name, file, type) files."""
+    form = aiohttp.FormData()
+    for name, field in files.items():
+        if len(field) == 3:
+            form.add_field(name, field[1], filename=field[0], content_type=field[2])
+        else:
+            form.add_field(name, field[1])
+    return form
+
+
+def _expiry(token: str) -> Optional[float]:
+    """The "exp" claim of a JWT, read without validating it."""
+    try:
+        payload = token.split(".")[1]
+        claims = json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+        return float(claims["exp"])
+    except (IndexError, KeyError, TypeError, ValueError):
+        return None
@@ -2,11 +2,11 @@
 # Licensed under the MIT License.
 """Flight booking dialog."""
 
-from datatypes_date_time.timex import Timex
-
 from botbuilder.dialogs import WaterfallDialog, WaterfallStepContext, DialogTurnResult
 from botbuilder.dialogs.prompts import ConfirmPrompt, TextPrompt, PromptOptions, NumberPrompt,PromptValidatorContext
 from botbuilder.core import MessageFactory, BotTelemetryClient, NullTelemetryClient
+from helpers.timex_cache import TIMEX_CACHE
+from turn_metrics import TimedWaterfallDialog, TurnMetrics
 from .cancel_and_help_dialog import CancelAndHelpDialog
 from .date_resolver_dialog import DateResolverDialog
 
@@ -17,6 +17,7 @@ class BookingDialog(CancelAndHelpDialog):
         self,
         dialog_id: str = None,
         telemetry_client: BotTelemetryClient = NullTelemetryClient(),
+        metrics: TurnMetrics = None,
     ):
         super(BookingDialog, self).__init__(
             dialog_id or BookingDialog.__name__, telemetry_client
@@ -31,7 +32,11 @@ class BookingDialog(CancelAndHelpDialog):
         BudgetPrompt = NumberPrompt("BudgetPrompt", BookingDialog.budget_prompt_validator)
 
 
-        waterfall_dialog = WaterfallDialog(
+        if metrics is not None:
+            for prompt in (text_prompt, confirm_prompt, PassengerNumberPrompt, BudgetPrompt):
+                metrics.instrument_prompt(prompt)
+
+        waterfall_dialog = TimedWaterfallDialog(
             WaterfallDialog.__name__,
             [
                 self.destination_step,
@@ -43,6 +48,7 @@ class BookingDialog(CancelAndHelpDialog):
                 self.confirm_step,
                 self.final_step,
             ],
+            metrics,
         )
         waterfall_dialog.telemetry_client = telemetry_client
 
@@ -53,10 +59,10 @@ class BookingDialog(CancelAndHelpDialog):
         end_date_msg = "On what date would you trip back?"
 
         self.add_dialog(
-            DateResolverDialog("StartDateResolverDialog",start_date_msg, self.telemetry_client)
+            DateResolverDialog("StartDateResolverDialog",start_date_msg, self.telemetry_client, metrics)
         )
         self.add_dialog(
-            DateResolverDialog("EndDateResolverDialog",end_date_msg, self.telemetry_client)
+            DateResolverDialog("EndDateResolverDialog",end_date_msg, self.telemetry_client, metrics)
         )
         self.add_dialog(PassengerNumberPrompt)
         self.add_dialog(BudgetPrompt)
@@ -204,14 +210,12 @@ class BookingDialog(CancelAndHelpDialog):
 
         #telemetry
         self.telemetry_client.track_trace("user_message", { 'confirm_step': True if step_context.result else False})
-        self.telemetry_client.flush()
 
         return await step_context.end_dialog()
 
     def is_ambiguous(self, timex: str) -> bool:
         """Ensure time is correct."""
-        timex_property = Timex(timex)
-        return "definite" not in timex_property.types
+        return not TIMEX_CACHE.is_definite(timex)
 
     async def passenger_prompt_validator(prompt_context: PromptValidatorContext) -> bool:
         # This condition is our validation rule. You can also change the value at this point.
@@ -2,8 +2,6 @@
 # Licensed under the MIT License.
 """Handle date/time resolution for booking dialog."""
 
-from datatypes_date_time.timex import Timex
-
 from botbuilder.core import MessageFactory, BotTelemetryClient, NullTelemetryClient
 from botbuilder.dialogs import WaterfallDialog, DialogTurnResult, WaterfallStepContext
 from botbuilder.dialogs.prompts import (
@@ -13,6 +11,8 @@ from botbuilder.dialogs.prompts import (
     DateTimeResolution,
 )
 
+from helpers.timex_cache import TIMEX_CACHE
+from turn_metrics import TimedWaterfallDialog, TurnMetrics
 from .cancel_and_help_dialog import CancelAndHelpDialog
 
 class DateResolverDialog(CancelAndHelpDialog):
@@ -23,6 +23,7 @@ class DateResolverDialog(CancelAndHelpDialog):
         dialog_id: str = None,
         prompt_msg: str = "",
         telemetry_client: BotTelemetryClient = NullTelemetryClient(),
+        metrics: TurnMetrics = None,
     ):
         super(DateResolverDialog, self).__init__(
             dialog_id or DateResolverDialog.__name__,telemetry_client
@@ -34,9 +35,11 @@ class DateResolverDialog(CancelAndHelpDialog):
             DateTimePrompt.__name__, DateResolverDialog.datetime_prompt_validator
         )
         date_time_prompt.telemetry_client = telemetry_client
+        if metrics is not None:
+            metrics.instrument_prompt(date_time_prompt)
 
-        waterfall_dialog = WaterfallDialog(
-            WaterfallDialog.__name__ + "2", [self.initial_step, self.final_step]
+        waterfall_dialog = TimedWaterfallDialog(
+            WaterfallDialog.__name__ + "2", [self.initial_step, self.final_step], metrics
         )
         waterfall_dialog.telemetry_client = telemetry_client
 
@@ -68,7 +71,7 @@ class DateResolverDialog(CancelAndHelpDialog):
             )
 
         # We have a Date we just need to check it is unambiguous.
-        if "definite" in Timex(timex).types:
+        if TIMEX_CACHE.is_definite(timex):
             # This is essentially a "reprompt" of the data we were given up front.
             return await step_context.prompt(
                 DateTimePrompt.__name__, PromptOptions(prompt=reprompt_msg)
@@ -87,7 +90,6 @@ class DateResolverDialog(CancelAndHelpDialog):
         if prompt_context.recognized.succeeded:
             timex = prompt_context.recognized.value[0].timex.split("T")[0]
 
-            # TODO: Needs TimexProperty
-            return "definite" in Timex(timex).types
+            return TIMEX_CACHE.is_definite(timex)
 
         return False
\ No newline at end of file
@@ -3,7 +3,6 @@
 
 from botbuilder.dialogs import (
     ComponentDialog,
-    WaterfallDialog,
     WaterfallStepContext,
     DialogTurnResult,
 )
@@ -19,6 +18,7 @@ from botbuilder.schema import InputHints
 from booking_details import BookingDetails
 from flight_booking_recognizer import FlightBookingRecognizer
 from helpers.luis_helper import LuisHelper, Intent
+from turn_metrics import TimedWaterfallDialog, TurnMetrics
 from .booking_dialog import BookingDialog
 
 class MainDialog(ComponentDialog):
@@ -27,6 +27,7 @@ class MainDialog(ComponentDialog):
         luis_recognizer: FlightBookingRecognizer,
         booking_dialog: BookingDialog,
         telemetry_client: BotTelemetryClient = None,
+        metrics: TurnMetrics = None,
     ):
         super(MainDialog, self).__init__(MainDialog.__name__)
         self.telemetry_client = telemetry_client or NullTelemetryClient()
@@ -37,21 +38,24 @@ class MainDialog(ComponentDialog):
 
         booking_dialog.telemetry_client = self.telemetry_client
 
-        wf_dialog = WaterfallDialog(
-            "WFDialog", [self.intro_step, self.luis_step, self.act_step, self.summary_step, self.final_step]
+        wf_dialog = TimedWaterfallDialog(
+            "WFDialog", [self.intro_step, self.luis_step, self.act_step, self.summary_step, self.final_step], metrics
         )
         wf_dialog.telemetry_client = self.telemetry_client
 
+        # The dialog instance is shared by every conversation, so what LUIS returned is
+        # kept in the waterfall's step values (persisted with each conversation's dialog state).
         self._luis_recognizer = luis_recognizer
-        self._luis_text = None
-        self._luis_top_intent = False
-        self._luis_entities_recongized = False        
-        self._luis_result = BookingDetails()
         self._booking_dialog_id = booking_dialog.id
 
+        confirm_prompt = ConfirmPrompt(ConfirmPrompt.__name__)
+        if metrics is not None:
+            metrics.instrument_prompt(text_prompt)
+            metrics.instrument_prompt(confirm_prompt)
+
         self.add_dialog(text_prompt)
         self.add_dialog(booking_dialog)
-        self.add_dialog(ConfirmPrompt(ConfirmPrompt.__name__))
+        self.add_dialog(confirm_prompt)
         self.add_dialog(wf_dialog)
 
         self.initial_dialog_id = "WFDialog"
@@ -65,7 +69,8 @@ class MainDialog(ComponentDialog):
                     input_hint=InputHints.ignoring_input,
                 )
             )
-            await step_context.next(None)
+            if not self._luis_recognizer.can_recognize:
+                await step_context.next(None)
       
         message_text = (
             str(step_context.options)
@@ -80,8 +85,8 @@ class MainDialog(ComponentDialog):
             )
         
     async def luis_step(self, step_context: WaterfallStepContext) -> DialogTurnResult:
-        if not self._luis_recognizer.is_configured:
-            # LUIS is not configured, we just run the BookingDialog path with an empty BookingDetailsInstance.
+        if not self._luis_recognizer.can_recognize:
+            # Neither LUIS nor the offline recognizer is configured, we just run the BookingDialog path with an empty BookingDetailsInstance.
             return await step_context.begin_dialog(
                 self._booking_dialog_id, BookingDetails()
             )
@@ -89,10 +94,13 @@ class MainDialog(ComponentDialog):
         intent, luis_result = await LuisHelper.execute_luis_query(
             self._luis_recognizer, step_context.context
         )
-        self._luis_text = step_context.result
+        step_context.values["luis_text"] = step_context.result
+        step_context.values["luis_top_intent"] = False
+        step_context.values["luis_entities_recognized"] = False
+        step_context.values["luis_result"] = BookingDetails()
 
         if intent == Intent.BOOK_FLIGHT.value and luis_result:
-            self._luis_top_intent = intent
+            step_context.values["luis_top_intent"] = intent
 
             origin = f" from {luis_result.origin}" if luis_result.origin else ""
             destination = f" to {luis_result.destination}" if luis_result.destination else ""
@@ -103,16 +111,14 @@ class MainDialog(ComponentDialog):
             luis_entities =  f"{origin}{destination}{travel_start_date}{travel_end_date}{n_passengers}{budget}"
 
             if len(luis_entities)>0:
-                self._luis_result = luis_result
-                self._luis_entities_recongized = True
+                step_context.values["luis_result"] = luis_result
+                step_context.values["luis_entities_recognized"] = True
                 #summary message
                 summary_text = ( f"Got you, a flight {luis_entities}. Do you want to proceed?" )
             else:
                 summary_text = ( f"Ok, you'd like to book a flight. Do you want to proceed?")
 
         else:
-            self._luis_result = BookingDetails()
-            self._luis_entities_recongized = False
             summary_text = (
                 "Sorry, I didn't get that. Would you like to book a flight?"
             )
@@ -123,24 +129,26 @@ class MainDialog(ComponentDialog):
             )               
 
     async def act_step(self, step_context: WaterfallStepContext) -> DialogTurnResult:
+        luis_result = step_context.values["luis_result"]
+        luis_entities_recognized = step_context.values["luis_entities_recognized"]
+
         #send the luis result to application insights
-        self.telemetry_client.track_trace("luis_sucess_result" if (step_context.result and self._luis_entities_recongized) else "luis_failed_result", 
-                            {'user_message' : self._luis_text,
-                            'luis_top_intent' : self._luis_top_intent,
-                            'luis_entitites' :  self._luis_entities_recongized,
-                            'dst_city' : self._luis_result.origin,
-                            'or_city' : self._luis_result.destination,
-                            'start_date' : self._luis_result.travel_start_date,
-                            'end_date' : self._luis_result.travel_end_date,
-                            'n_passengers' : self._luis_result.n_passengers,
-                            'budgdet': self._luis_result.budget,
+        self.telemetry_client.track_trace("luis_sucess_result" if (step_context.result and luis_entities_recognized) else "luis_failed_result", 
+                            {'user_message' : step_context.values["luis_text"],
+                            'luis_top_intent' : step_context.values["luis_top_intent"],
+                            'luis_entitites' :  luis_entities_recognized,
+                            'dst_city' : luis_result.origin,
+                            'or_city' : luis_result.destination,
+                            'start_date' : luis_result.travel_start_date,
+                            'end_date' : luis_result.travel_end_date,
+                            'n_passengers' : luis_result.n_passengers,
+                            'budgdet': luis_result.budget,
                             })
-        self.telemetry_client.flush()
         
         if step_context.result: 
             #user wants to proceed the booking process
             # Run the BookingDialog giving it whatever details we have from the LUIS call.
-            return await step_context.begin_dialog(self._booking_dialog_id, self._luis_result )
+            return await step_context.begin_dialog(self._booking_dialog_id, luis_result)
         else:
              return await step_context.end_dialog()
 
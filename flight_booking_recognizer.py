@@ -1,8 +1,10 @@
 # Copyright (c) Microsoft Corporation. All rights reserved.
 # Licensed under the MIT License.
 
-from pydoc import text
-from botbuilder.ai.luis import LuisApplication, LuisRecognizer, LuisPredictionOptions
+import sys
+import time
+from copy import copy
+
 from botbuilder.core import (
     Recognizer,
     RecognizerResult,
@@ -12,13 +14,37 @@ from botbuilder.core import (
 )
 
 from config import DefaultConfig
+from helpers.recognition_cache import RecognitionCache
+from offline_recognizer import OfflineRecognizer
+from turn_metrics import TurnMetrics
 
 
 class FlightBookingRecognizer(Recognizer):
     def __init__(
-        self, configuration: DefaultConfig, telemetry_client: BotTelemetryClient = None
+        self,
+        configuration: DefaultConfig,
+        telemetry_client: BotTelemetryClient = None,
+        cache: RecognitionCache = None,
+        offline_recognizer: OfflineRecognizer = None,
+        metrics: TurnMetrics = None,
     ):
         self._recognizer = None
+        self.metrics = metrics
+
+        # First stage: answered in process when confident, and the fallback when LUIS fails.
+        self.offline_recognizer = offline_recognizer
+        if self.offline_recognizer is None and configuration.OFFLINE_RECOGNIZER_ENABLED:
+            self.offline_recognizer = OfflineRecognizer(
+                threshold=configuration.OFFLINE_RECOGNIZER_THRESHOLD
+            )
+
+        # Short replies ("yes", "paris") repeat across conversations, so LUIS results are cached.
+        self.cache = cache
+        if self.cache is None and configuration.RECOGNITION_CACHE_SIZE > 0:
+            self.cache = RecognitionCache(
+                configuration.RECOGNITION_CACHE_SIZE,
+                configuration.RECOGNITION_CACHE_TTL_SECONDS,
+            )
 
         luis_is_configured = (
             configuration.LUIS_APP_ID
@@ -26,12 +52,23 @@ class FlightBookingRecognizer(Recognizer):
             and configuration.LUIS_API_HOST_NAME
         )
         if luis_is_configured:
+            # Imported here: without LUIS the bot never loads its client.
+            from botbuilder.ai.luis import (  # pylint: disable=import-outside-toplevel
+                LuisApplication,
+                LuisPredictionOptions,
+                LuisRecognizer,
+            )
+
             # Set the recognizer options depending on which endpoint version you want to use e.g v2 or v3.
             # More details can be found in https://docs.microsoft.com/azure/cognitive-services/luis/luis-migration-api-v3
+            # A host name with a scheme (e.g. a local stand-in) is used as is.
+            endpoint = configuration.LUIS_API_HOST_NAME
+            if not endpoint.startswith(("http://", "https://")):
+                endpoint = "https://" + endpoint
             luis_application = LuisApplication(
                 configuration.LUIS_APP_ID,
                 configuration.LUIS_API_KEY,
-                "https://" + configuration.LUIS_API_HOST_NAME,
+                endpoint,
             )
 
             options = LuisPredictionOptions(include_all_intents=True,include_instance_data=True)
@@ -46,5 +83,69 @@ class FlightBookingRecognizer(Recognizer):
         # Returns true if luis is configured in the config.py and initialized.
         return self._recognizer is not None
 
-    async def recognize(self, turn_context: TurnContext) -> RecognizerResult:
-        return await self._recognizer.recognize(turn_context)
\ No newline at end of file
+    @property
+    def can_recognize(self) -> bool:
+        # Returns true if LUIS or the offline recognizer can recognize utterances.
+        return self._recognizer is not None or self.offline_recognizer is not None
+
+    def offline_copy(self) -> "FlightBookingRecognizer":
+        # This recognizer without LUIS, the cache and the metrics, for
+        # synthetic turns (warm-up) that must not reach LUIS or the stats.
+        recognizer = copy(self)
+        recognizer._recognizer = None
+        recognizer.cache = None
+        recognizer.metrics = None
+        return recognizer
+
+    async def recognize(
+        self, turn_context: TurnContext, bypass_cache: bool = False
+    ) -> RecognizerResult:
+        offline_result = None
+        if self.offline_recognizer is not None:
+            started = time.perf_counter()
+            offline_result = await self.offline_recognizer.recognize(turn_context)
+            if self.metrics is not None:
+                self.metrics.recognizer.observe(time.perf_counter() - started, "offline")
+            if self._recognizer is None or self.offline_recognizer.is_confident(
+                offline_result
+            ):
+                return offline_result
+
+        started = time.perf_counter()
+        try:
+            return await self._recognize_with_luis(turn_context, bypass_cache)
+        except Exception as error:
+            if offline_result is None:
+                raise
+            print(
+                f"LUIS is unavailable, using the offline recognizer: {error}",
+                file=sys.stderr,
+            )
+            return offline_result
+        finally:
+            if self.metrics is not None:
+                self.metrics.recognizer.observe(time.perf_counter() - started, "luis")
+
+    async def warm_up(self, turn_context: TurnContext):
+        # One query that skips the offline recognizer and the cache, so the
+        # connection to LUIS is open before the first user needs it.
+        if self._recognizer is not None:
+            await self._recognize_with_luis(turn_context, bypass_cache=True)
+
+    async def _recognize_with_luis(
+        self, turn_context: TurnContext, bypass_cache: bool
+    ) -> RecognizerResult:
+        if self.cache is None or bypass_cache:
+            return await self._recognizer.recognize(turn_context)
+
+        activity = turn_context.activity
+        result = self.cache.get(activity.text, activity.locale)
+        if result is None:
+            result = await self._recognizer.recognize(turn_context)
+            self.cache.put(activity.text, activity.locale, result)
+        else:
+            # The LuisResult event LUIS would have logged, marked as a cache hit.
+            self._recognizer.on_recognizer_result(
+                result, turn_context, {"cacheHit": "true"}
+            )
+        return result
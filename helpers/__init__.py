@@ -2,6 +2,26 @@
 # Licensed under the MIT License.
 """Helpers module."""
 
-from . import activity_helper, luis_helper, dialog_helper
+from . import (
+    activity_helper,
+    activity_parser,
+    luis_helper,
+    dialog_helper,
+    reply_coalescing,
+    state_codec,
+    state_helper,
+    store_items,
+    timex_cache,
+)
 
-__all__ = ["activity_helper", "dialog_helper", "luis_helper"]
+__all__ = [
+    "activity_helper",
+    "activity_parser",
+    "dialog_helper",
+    "luis_helper",
+    "reply_coalescing",
+    "state_codec",
+    "state_helper",
+    "store_items",
+    "timex_cache",
+]
@@ -0,0 +1,192 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Builds `Activity` objects from request bodies without msrest's generic deserializer."""
+
+import json
+from typing import Callable, Dict, Tuple, Type
+
+from botbuilder.schema import Activity
+from msrest.serialization import Deserializer, Model
+
+try:
+    import orjson
+
+    _loads = orjson.loads
+except ImportError:  # pragma: no cover - orjson is optional
+    _loads = json.loads
+
+
+class _Unsupported(Exception):
+    """A value the compiled field map does not handle; msrest deserializes the body instead."""
+
+
+_DESERIALIZER = Deserializer(Activity._infer_class_models())  # pylint: disable=protected-access
+_MODELS: Dict[str, Type[Model]] = _DESERIALIZER.dependencies
+
+
+def _str(value):
+    if type(value) is not str:  # pylint: disable=unidiomatic-typecheck
+        raise _Unsupported()
+    return value
+
+
+def _bool(value):
+    if type(value) is not bool:  # pylint: disable=unidiomatic-typecheck
+        raise _Unsupported()
+    return value
+
+
+def _int(value):
+    if type(value) is not int:  # pylint: disable=unidiomatic-typecheck
+        raise _Unsupported()
+    return value
+
+
+def _float(value):
+    if type(value) not in (int, float):  # pylint: disable=unidiomatic-typecheck
+        raise _Unsupported()
+    return float(value)
+
+
+def _iso_8601(value):
+    if type(value) is not str:  # pylint: disable=unidiomatic-typecheck
+        raise _Unsupported()
+    return Deserializer.deserialize_iso(value)
+
+
+def _json_object(value):
+    # Parsed JSON already holds only the types msrest's deserialize_object returns.
+    return value
+
+
+def _json_dict(value):
+    if type(value) is not dict:  # pylint: disable=unidiomatic-typecheck
+        raise _Unsupported()
+    return value
+
+
+_BASIC_CONVERTERS = {
+    "str": _str,
+    "bool": _bool,
+    "int": _int,
+    "float": _float,
+    "iso-8601": _iso_8601,
+    "object": _json_object,
+    "{object}": _json_dict,
+}
+
+
+class ActivityParser:
+    """
+    Parses `/api/messages` request bodies into `Activity` objects.
+
+    Bodies are parsed with orjson when it is installed. Every model reachable
+    from `Activity` is compiled once into a map from JSON key to attribute name
+    and converter, which builds the same objects as `Activity().deserialize`,
+    including `additional_properties` for unknown keys. Values the map does not
+    expect (e.g. a number where a string is declared) make the whole body go
+    through `Activity().deserialize`, so its coercions and errors are kept.
+    """
+
+    def __init__(self):
+        self._compiled: Dict[str, Callable[[dict], Model]] = {}
+        self._build_activity = self._model_converter("Activity")
+        self.fast = 0
+        self.fallbacks = 0
+
+    def parse(self, body: bytes) -> Activity:
+        return self.from_dict(_loads(body))
+
+    def from_dict(self, data: dict) -> Activity:
+        if type(data) is dict:  # pylint: disable=unidiomatic-typecheck
+            try:
+                activity = self._build_activity(data)
+                self.fast += 1
+                return activity
+            except _Unsupported:
+                pass
+        self.fallbacks += 1
+        return Activity().deserialize(data)
+
+    def _converter(self, data_type: str) -> Callable[[object], object]:
+        converter = _BASIC_CONVERTERS.get(data_type)
+        if converter is not None:
+            return converter
+        if data_type.startswith("[") and data_type.endswith("]"):
+            return self._list_converter(self._converter(data_type[1:-1]))
+        if data_type.startswith("{") and data_type.endswith("}"):
+            return self._dict_converter(self._converter(data_type[1:-1]))
+        if data_type in _MODELS:
+            return self._model_converter(data_type)
+        return lambda value: _DESERIALIZER.deserialize_data(value, data_type)
+
+    @staticmethod
+    def _list_converter(item_converter):
+        def convert(value):
+            if type(value) is not list:  # pylint: disable=unidiomatic-typecheck
+                raise _Unsupported()
+            return [None if item is None else item_converter(item) for item in value]
+
+        return convert
+
+    @staticmethod
+    def _dict_converter(item_converter):
+        def convert(value):
+            if type(value) is not dict:  # pylint: disable=unidiomatic-typecheck
+                raise _Unsupported()
+            return {
+                key: None if item is None else item_converter(item)
+                for key, item in value.items()
+            }
+
+        return convert
+
+    def _model_converter(self, name: str) -> Callable[[dict], Model]:
+        if name in self._compiled:
+            return self._compiled[name]
+
+        model = _MODELS[name]
+        attribute_map = model._attribute_map  # pylint: disable=protected-access
+        if (
+            getattr(model, "_subtype_map", None)
+            or any(
+                rule.get("readonly") or rule.get("constant")
+                for rule in getattr(model, "_validation", {}).values()
+            )
+            or any("." in desc["key"] or not desc["key"] for desc in attribute_map.values())
+        ):
+            # Polymorphic, read-only or flattened models keep msrest's handling.
+            def delegate(value):
+                return _DESERIALIZER.deserialize_data(value, name)
+
+            self._compiled[name] = delegate
+            return delegate
+
+        fields: Dict[str, Tuple[str, Callable]] = {}
+        # Resolve lazily: models may refer to each other (Activity -> ConversationReference).
+        def build(data: dict) -> Model:
+            if type(data) is not dict:  # pylint: disable=unidiomatic-typecheck
+                raise _Unsupported()
+            values = dict(defaults)
+            additional_properties = None
+            for key, value in data.items():
+                field = fields.get(key)
+                if field is None:
+                    if additional_properties is None:
+                        additional_properties = {}
+                    additional_properties[key] = value
+                elif value is not None:
+                    values[field[0]] = field[1](value)
+            instance = model.__new__(model)
+            instance.__dict__ = values
+            if additional_properties:
+                values["additional_properties"] = additional_properties
+            else:
+                values["additional_properties"] = {}
+            return instance
+
+        self._compiled[name] = build
+        defaults = vars(model(**{attribute: None for attribute in attribute_map}))
+        for attribute, desc in attribute_map.items():
+            fields[desc["key"]] = (attribute, self._converter(desc["type"]))
+        return build
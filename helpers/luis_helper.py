@@ -1,41 +1,26 @@
 # Copyright (c) Microsoft Corporation. All rights reserved.
 # Licensed under the MIT License.
+import sys
 from enum import Enum
-from typing import Dict
-from botbuilder.ai.luis import LuisRecognizer
-from botbuilder.core import IntentScore, TopIntent, TurnContext
+from functools import lru_cache
+from typing import Callable, Dict, NamedTuple
+from botbuilder.core import IntentScore, Recognizer, RecognizerResult, TopIntent, TurnContext
 
 from booking_details import BookingDetails
 
-from word2number.w2n import word_to_num
+from helpers.number_tokenizer import NumberTokenizer
+
+NUMBERS = NumberTokenizer()
 def int_extraction(text):
-    number =[]
-    for s in text.split():
-        if s=="me":
-            number.append(1)
-        else:
-            try:
-                number.append(word_to_num(s))
-            except Exception:
-                pass
-            
-    return sum(number)
-
-from datetime import date
-today = date.today()
-from datetime import timedelta
-from dateutil.parser import parse
-def date_extraction(text):
-    if text:
-        try:
-            date = parse(text, fuzzy=True)
-            travel_date = today if str(text).lower() =="asap" else date
-        except:
-            travel_date = None
-    else:
-        travel_date = None
+    return NUMBERS.total(text)
+
+from datetime import datetime, timedelta
+from helpers.travel_dates import TravelDateParser
 
-    return travel_date
+# Resolves relative dates against the current day and caches the results.
+TRAVEL_DATES = TravelDateParser()
+def date_extraction(text):
+    return TRAVEL_DATES.parse(text)
 
 
 class Intent(Enum):
@@ -44,10 +29,66 @@ class Intent(Enum):
     GET_WEATHER = "None"
     NONE_INTENT = "None"
 
+
+def city_name(text: str) -> str:
+    return text.capitalize()
+
+
+def travel_date(text: str) -> str:
+    parsed = date_extraction(text)
+    return parsed.strftime("%Y-%m-%d") if parsed else None
+
+
+@lru_cache(maxsize=1024)
+def number_of(text: str) -> int:
+    return int_extraction(text)
+
+
+class EntitySlot(NamedTuple):
+    """Fills `slot` with `convert(text)` of the first `entity` LUIS returned."""
+
+    entity: str
+    slot: str
+    convert: Callable[[str], object]
+
+
+# Slots named after a BookingDetails attribute are copied onto it; the others
+# are only read by DERIVED_SLOTS.
+ENTITY_SLOTS = (
+    EntitySlot("dst_city", "destination", city_name),
+    EntitySlot("or_city", "origin", city_name),
+    EntitySlot("str_date", "travel_start_date", travel_date),
+    EntitySlot("end_date", "travel_end_date", travel_date),
+    EntitySlot("max_duration", "duration", number_of),
+    EntitySlot("n_adults", "n_adults", number_of),
+    EntitySlot("n_children", "n_children", number_of),
+    EntitySlot("budget", "budget", str),
+)
+
+
+def return_date_from_duration(slots: Dict[str, object], details: BookingDetails):
+    """Without an explicit return date, the trip lasts `duration` days."""
+    if details.travel_end_date is None and details.travel_start_date and slots.get("duration"):
+        start = datetime.strptime(details.travel_start_date, "%Y-%m-%d")
+        details.travel_end_date = (start + timedelta(days=int(slots["duration"]))).strftime("%Y-%m-%d")
+
+
+def passengers(slots: Dict[str, object], details: BookingDetails):
+    """passengers = n_adults + n_children"""
+    if "n_adults" in slots or "n_children" in slots:
+        details.n_passengers = (slots.get("n_adults") or 0) + (slots.get("n_children") or 0)
+
+
+DERIVED_SLOTS = (return_date_from_duration, passengers)
+
+_SLOTS_BY_ENTITY = {entity_slot.entity: entity_slot for entity_slot in ENTITY_SLOTS}
+_DETAIL_ATTRIBUTES = frozenset(BookingDetails.__slots__)
+
+
 class LuisHelper:
     @staticmethod
     async def execute_luis_query(
-        luis_recognizer: LuisRecognizer, turn_context: TurnContext
+        luis_recognizer: Recognizer, turn_context: TurnContext
     ) -> (Intent, object):
         """
         Returns an object with preformatted LUIS results for the bot's dialogs to consume.
@@ -58,68 +99,46 @@ class LuisHelper:
         try:
             recognizer_result = await luis_recognizer.recognize(turn_context)
             intent = (
-                LuisRecognizer.top_intent(recognizer_result)
+                recognizer_result.get_top_scoring_intent().intent
                 if recognizer_result.intents
                 else None
             )
 
             if intent == Intent.BOOK_FLIGHT.value:
-                result = BookingDetails()
-
-                # We need to get the result from the LUIS JSON which at every level returns an array.
-                #destination city
-                to_entities = recognizer_result.entities.get("$instance", {}).get(
-                    "dst_city", []
-                )
-                if to_entities: result.destination = to_entities[0]["text"].capitalize()
-                
-                #departure city
-                from_entities = recognizer_result.entities.get("$instance", {}).get(
-                    "or_city", []
-                )
-                if from_entities: result.origin = from_entities[0]["text"].capitalize()
-
-                # Date extractions will be convert to a timex format. 
-                start_entities = recognizer_result.entities.get("$instance", {}).get(
-                    "str_date", []
-                )
-                if start_entities: 
-                    travel_start_date = date_extraction(start_entities[0]["text"])
-                    result.travel_start_date = travel_start_date.strftime("%Y-%m-%d")
-
-                #get directly the return date or calculate from the duration
-                duration_entities = recognizer_result.entities.get("$instance", {}).get(
-                    "max_duration", []
-                )
-                duration = int_extraction(duration_entities[0]["text"]) if duration_entities else None
-
-                end_entities = recognizer_result.entities.get("$instance", {}).get(
-                    "end_date", []
-                )
-                if end_entities: 
-                    result.travel_end_date = date_extraction(end_entities[0]["text"]).strftime("%Y-%m-%d")
-                elif from_entities and duration:
-                    travel_end_date = travel_start_date + timedelta(days=int(duration))
-                    result.travel_end_date = travel_end_date.strftime("%Y-%m-%d")
-
-                #passengers = n_adults + n_children
-                adult_entities = recognizer_result.entities.get("$instance", {}).get(
-                    "n_adults", []
-                )
-                n_adults = (int_extraction(adult_entities[0]["text"]) if adult_entities else 0)
-                child_entities = recognizer_result.entities.get("$instance", {}).get(
-                    "n_children", []
-                )
-                n_children = (int_extraction(child_entities[0]["text"]) if child_entities else 0)
-                if adult_entities or child_entities : result.n_passengers = n_adults + n_children
-
-                budget_entities = recognizer_result.entities.get("$instance", {}).get(
-                    "budget", []
-                )
-                if budget_entities: result.budget = budget_entities[0]["text"]
+                result = LuisHelper.booking_details(recognizer_result)
 
         except Exception as exception:
             print(exception)
 
         return intent, result
 
+    @staticmethod
+    def booking_details(recognizer_result: RecognizerResult) -> BookingDetails:
+        """
+        Maps the entities of a booking utterance onto `BookingDetails` in one pass
+        over `$instance`, using ENTITY_SLOTS and then DERIVED_SLOTS.
+        """
+        slots = {}
+        # LUIS returns an array for every entity; the first match wins.
+        for entity, matches in recognizer_result.entities.get("$instance", {}).items():
+            entity_slot = _SLOTS_BY_ENTITY.get(entity)
+            if entity_slot is None or not matches:
+                continue
+            try:
+                value = entity_slot.convert(matches[0]["text"])
+            except Exception as exception:  # pylint: disable=broad-except
+                print(
+                    f"Could not read {entity} {matches[0]['text']!r}: {exception!r}",
+                    file=sys.stderr,
+                )
+                continue
+            if value is not None:
+                slots[entity_slot.slot] = value
+
+        result = BookingDetails()
+        for slot, value in slots.items():
+            if slot in _DETAIL_ATTRIBUTES:
+                setattr(result, slot, value)
+        for derive in DERIVED_SLOTS:
+            derive(slots, result)
+        return result
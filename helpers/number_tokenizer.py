@@ -0,0 +1,179 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Single-pass tokenizer for the counts in passenger and duration phrases."""
+
+from typing import Dict, Iterable, List, NamedTuple, Tuple
+
+UNITS = {
+    "zero": 0, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6,
+    "seven": 7, "eight": 8, "nine": 9, "ten": 10, "eleven": 11, "twelve": 12,
+    "thirteen": 13, "fourteen": 14, "fifteen": 15, "sixteen": 16,
+    "seventeen": 17, "eighteen": 18, "nineteen": 19,
+}
+TENS = {
+    "twenty": 20, "thirty": 30, "forty": 40, "fourty": 40, "fifty": 50,
+    "sixty": 60, "seventy": 70, "eighty": 80, "ninety": 90,
+}
+SCALES = {"hundred": 100, "thousand": 1000, "million": 1000000}
+# Words that stand for a count on their own.
+QUANTITIES = {
+    "me": 1, "myself": 1, "single": 1, "solo": 1, "alone": 1,
+    "both": 2, "couple": 2, "pair": 2, "twins": 2, "dozen": 12,
+}
+# "my wife", "my son": one person each; "my kids" without a number is not a count.
+RELATIVES = frozenset(
+    [
+        "wife", "husband", "partner", "spouse", "fiance", "fiancee", "girlfriend",
+        "boyfriend", "son", "daughter", "kid", "child", "baby", "toddler",
+        "mother", "mom", "mum", "father", "dad", "brother", "sister",
+        "friend", "colleague", "boss", "grandmother", "grandfather", "grandma", "grandpa",
+    ]
+)
+
+_UNIT, _TENS, _SCALE, _DIGITS, _QUANTITY, _ARTICLE, _MY, _AND, _RELATIVE = range(9)
+
+
+def _lexicon() -> Dict[str, Tuple[int, int]]:
+    lexicon = {}
+    lexicon.update({word: (_UNIT, value) for word, value in UNITS.items()})
+    lexicon.update({word: (_TENS, value) for word, value in TENS.items()})
+    lexicon.update({word: (_SCALE, value) for word, value in SCALES.items()})
+    lexicon.update({word: (_QUANTITY, value) for word, value in QUANTITIES.items()})
+    lexicon.update({word: (_RELATIVE, 1) for word in RELATIVES})
+    lexicon.update({"a": (_ARTICLE, 1), "an": (_ARTICLE, 1), "my": (_MY, 1), "and": (_AND, 0)})
+    return lexicon
+
+
+LEXICON = _lexicon()
+_PUNCTUATION = ".,;:!?()\"'"
+
+
+def _continues(last: int, kind: int, value: int, current: int) -> bool:
+    """Whether a number word of `kind` and `value` extends the compound whose last word was `last`."""
+    if last == _UNIT or last == _DIGITS:
+        # "five hundred", "3 thousand"
+        return kind == _SCALE
+    if last == _TENS:
+        # "twenty five", "forty thousand"
+        return kind == _SCALE or (kind == _UNIT and value < 10)
+    # After a scale word: "hundred five", "thousand twenty", "hundred thousand".
+    return kind == _UNIT or kind == _TENS or (kind == _SCALE and value > current)
+
+
+class NumberMatch(NamedTuple):
+    value: int
+    start: int
+    end: int
+    text: str
+
+
+class NumberTokenizer:
+    """
+    Finds the counts in a phrase in one pass over its tokens.
+
+    Digits, number words and their compounds ("twenty two", "one hundred and
+    five", "2 thousand") are one match each. "a"/"an" count as one before a
+    scale or quantity word ("a hundred", "a couple"), quantity words like
+    "couple" or "dozen" stand on their own, and "me" or "my" followed by a
+    relative ("my wife") count one person. Any other word ends the number
+    before it.
+    """
+
+    def __init__(self, lexicon: Dict[str, Tuple[int, int]] = None):
+        self.lexicon = LEXICON if lexicon is None else lexicon
+
+    def tokenize(self, text: str) -> List[NumberMatch]:
+        return [NumberMatch(value, start, end, text[start:end]) for value, start, end in self._scan(text)]
+
+    def tokenize_many(self, texts: Iterable[str]) -> List[List[NumberMatch]]:
+        """`tokenize` for each text; repeated texts in the batch are read once."""
+        seen = {}
+        results = []
+        for text in texts:
+            matches = seen.get(text)
+            if matches is None:
+                matches = seen[text] = self.tokenize(text)
+            results.append(matches)
+        return results
+
+    def total(self, text: str) -> int:
+        """Sum of the counts in `text`, e.g. 3 for "me and my two kids"."""
+        return sum([value for value, _, _ in self._scan(text)])
+
+    def _scan(self, text: str) -> List[Tuple[int, int, int]]:
+        # Hyphens become spaces so "twenty-two" is two words; offsets are unchanged.
+        lowered = text.lower().replace("-", " ")
+        lexicon = self.lexicon
+        matches = []
+        # The compound being read: its first offset, total above the current
+        # hundreds, current hundreds and the kind of its last word.
+        begin = end = total = current = 0
+        last = None
+        # An "a"/"my" waiting for the word it applies to, and its offset.
+        pending = pending_start = None
+        position = 0
+        for word in lowered.split():
+            start = lowered.find(word, position)
+            position = start + len(word)
+            stripped = word.strip(_PUNCTUATION)
+            if stripped is not word:
+                if not stripped:
+                    continue
+                start += word.index(stripped)
+                word = stripped
+            entry = lexicon.get(word)
+            if entry is not None:
+                kind, value = entry
+            elif word.isdigit() or (word[:1].isdigit() and word.replace(",", "").isdigit()):
+                kind, value = _DIGITS, int(word.replace(",", ""))
+            else:
+                if last is not None:
+                    matches.append((total + current, begin, end))
+                    last = None
+                pending = None
+                continue
+            word_end = start + len(word)
+
+            if kind <= _DIGITS:
+                if last is not None and not _continues(last, kind, value, current):
+                    matches.append((total + current, begin, end))
+                    last = None
+                if last is None:
+                    total = current = 0
+                    begin = start
+                    if kind == _SCALE and pending == _ARTICLE:
+                        # "a hundred"
+                        begin, current = pending_start, 1
+                if kind == _SCALE:
+                    if value == 100:
+                        current = max(current, 1) * value
+                    else:
+                        total += max(current, 1) * value
+                        current = 0
+                else:
+                    current += value
+                last, end, pending = kind, word_end, None
+                continue
+
+            if kind == _AND and last == _SCALE:
+                # "hundred and five" stays one number.
+                continue
+            if last is not None:
+                matches.append((total + current, begin, end))
+                last = None
+
+            if kind == _QUANTITY:
+                first = pending_start if pending == _ARTICLE else start
+                matches.append((value, first, word_end))
+                pending = None
+            elif kind == _ARTICLE or kind == _MY:
+                pending, pending_start = kind, start
+            elif kind == _RELATIVE and pending == _MY:
+                matches.append((1, pending_start, word_end))
+                pending = None
+            else:
+                pending = None
+
+        if last is not None:
+            matches.append((total + current, begin, end))
+        return matches
@@ -0,0 +1,124 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Bounded LRU cache of recognizer results with a time-to-live."""
+
+import time
+from collections import OrderedDict, namedtuple
+from types import MappingProxyType
+from typing import Callable, Mapping, Optional, Tuple
+
+from botbuilder.core import IntentScore, RecognizerResult
+
+_Entry = namedtuple(
+    "_Entry", ["altered_text", "intents", "entities", "properties", "expires_at"]
+)
+
+
+def _freeze(value):
+    if isinstance(value, Mapping):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def _thaw(value):
+    if isinstance(value, Mapping):
+        return {key: _thaw(item) for key, item in value.items()}
+    if isinstance(value, tuple):
+        return [_thaw(item) for item in value]
+    return value
+
+
+class RecognitionCache:
+    """
+    Caches recognizer results keyed by utterance text and locale.
+
+    The text is used exactly as received: a result carries the text and the
+    entity offsets of its utterance, so "Paris" and "paris " are different
+    entries. Entries are stored as read-only snapshots, intent properties
+    included, and every hit returns a new `RecognizerResult`, so callers may
+    modify what they get back freely.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 1024,
+        ttl_seconds: float = 300.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if max_size <= 0:
+            raise ValueError("RecognitionCache(): max_size must be positive.")
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries: "OrderedDict[Tuple[str, str], _Entry]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def key(text: str, locale: str = None) -> Tuple[str, str]:
+        """Key for an utterance: its exact text, and its locale in any case."""
+        return text or "", (locale or "").lower()
+
+    def get(self, text: str, locale: str = None) -> Optional[RecognizerResult]:
+        key = self.key(text, locale)
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at <= self._clock():
+            del self._entries[key]
+            self.expirations += 1
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return RecognizerResult(
+            text=text,
+            altered_text=entry.altered_text,
+            intents={
+                name: IntentScore(score, _thaw(properties))
+                for name, score, properties in entry.intents
+            },
+            entities=_thaw(entry.entities),
+            properties=_thaw(entry.properties),
+        )
+
+    def put(self, text: str, locale: str, result: RecognizerResult):
+        key = self.key(text, locale)
+        if result is None or not key[0]:
+            return
+
+        self._entries[key] = _Entry(
+            altered_text=result.altered_text,
+            intents=tuple(
+                (name, score.score, _freeze(score.properties or {}))
+                for name, score in (result.intents or {}).items()
+            ),
+            entities=_freeze(result.entities or {}),
+            properties=_freeze(result.properties or {}),
+            expires_at=self._clock() + self.ttl_seconds,
+        )
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
@@ -0,0 +1,92 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Merges the consecutive replies of a turn so they take fewer connector calls."""
+from copy import copy
+from functools import reduce
+from typing import List
+
+from botbuilder.schema import Activity, ActivityTypes
+
+# Set on a message that carries more than its text; such a message is only
+# ever merged as the second of a pair, so these fields are kept unchanged.
+_RICH_FIELDS = (
+    "attachments",
+    "attachment_layout",
+    "suggested_actions",
+    "entities",
+    "channel_data",
+    "value",
+    "name",
+    "summary",
+    "semantic_action",
+    "text_highlights",
+)
+
+
+def coalesce_replies(activities: List[Activity]) -> List[Activity]:
+    """
+    Returns `activities` with every text-only message merged into the message
+    that follows it.
+
+    The merged message is the later one with the earlier text prepended as a
+    paragraph; it keeps the later message's attachments, suggested actions
+    and input hint, so a confirmation followed by a `ConfirmPrompt` arrives
+    as one prompt. Messages are only merged when they answer the same
+    activity in the same conversation and use the same text format. The
+    order of everything else (cards, traces, typing, delays) is unchanged.
+    """
+    return [merge_replies(group) for group in group_replies(activities)]
+
+
+def group_replies(activities: List[Activity]) -> List[List[Activity]]:
+    """
+    Splits `activities`, in order, into the runs `coalesce_replies` merges
+    into one activity each.
+    """
+    groups: List[List[Activity]] = []
+    for activity in activities:
+        if groups and _can_merge(groups[-1][-1], activity):
+            groups[-1].append(activity)
+        else:
+            groups.append([activity])
+    return groups
+
+
+def merge_replies(group: List[Activity]) -> Activity:
+    """The activity a run of `group_replies` is delivered as."""
+    return reduce(_merge, group)
+
+
+def _is_message(activity: Activity) -> bool:
+    return activity.type == ActivityTypes.message
+
+
+def _is_text_only(activity: Activity) -> bool:
+    return all(not getattr(activity, field, None) for field in _RICH_FIELDS)
+
+
+def _can_merge(first: Activity, second: Activity) -> bool:
+    return (
+        _is_message(first)
+        and _is_message(second)
+        and _is_text_only(first)
+        and first.reply_to_id == second.reply_to_id
+        and getattr(first.conversation, "id", None) == getattr(second.conversation, "id", None)
+        and (first.text_format or "markdown") == (second.text_format or "markdown")
+    )
+
+
+def _merge(first: Activity, second: Activity) -> Activity:
+    merged = copy(second)
+    merged.text = _join(first.text, second.text, "\n\n")
+    if first.speak or second.speak:
+        merged.speak = _join(first.speak or first.text, second.speak or second.text, " ")
+    return merged
+
+
+def _join(first: str, second: str, separator: str) -> str:
+    if not first:
+        return second
+    if not second:
+        return first
+    return first + separator + second
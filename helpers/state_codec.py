@@ -0,0 +1,301 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Compact, versioned encoding of bot state documents for storage."""
+import datetime
+import json
+import zlib
+from decimal import Decimal
+from typing import Dict, FrozenSet, Iterable, List, Tuple
+
+import jsonpickle
+from botbuilder import schema
+from botbuilder.dialogs import DialogInstance, DialogState
+from botbuilder.dialogs.choices import Choice, FoundChoice, ListStyle
+from botbuilder.dialogs.prompts import PromptOptions
+from msrest.serialization import Model
+
+from booking_details import BookingDetails
+
+FORMAT_VERSION = 1
+
+# A document is one header byte, FORMAT_VERSION << 4 | compression, followed by
+# the (compressed) JSON tree. Dicts with string keys are JSON objects; every
+# other container or known class is a JSON array whose first element is a tag.
+(
+    _LIST,
+    _TUPLE,
+    _DICT,
+    _DECIMAL,
+    _REFERENCE,
+    _BOOKING_DETAILS,
+    _DIALOG_STATE,
+    _DIALOG_INSTANCE,
+    _PROMPT_OPTIONS,
+    _SCHEMA_MODEL,
+    _PICKLED,
+) = range(11)
+
+COMPRESSIONS = {"none": 0, "zlib": 1, "zstd": 2}
+
+# Preset zlib dictionary: state documents are small, so most of what zlib can
+# find is text shared by every conversation. Changing it requires a new
+# FORMAT_VERSION.
+_ZLIB_DICTIONARY = (
+    '"input_hint":"expectingInput"}],[9,"Activity",{"type":"message",'
+    '"input_hint":"acceptingInput","text":"'
+    '"number_of_attempts":0}]'
+    '"state":{}}],[7,"WaterfallDialog",{"options":[5,'
+    '"values":{},"instanceId":"","stepIndex":'
+    '{"DialogState":[6,[7,"MainDialog",{"dialogs":[6,[7,"BookingDialog",{"dialogs":[6,'
+    '[7,"WFDialog",{"options":null,"values":{"luis_text":"","luis_top_intent":"book",'
+    '"luis_entities_recognized":true,"luis_result":[4,0]},"instanceId":"","stepIndex":'
+    '"e_tag":"*"}'
+).encode()
+
+_OPTIONS_FIELDS = ("prompt", "retry_prompt", "choices", "style", "validations", "number_of_attempts")
+
+
+def _qualified_name(kind: type) -> str:
+    return f"{kind.__module__}.{kind.__qualname__}"
+
+
+# The only classes jsonpickle may rebuild, in the fallback and in the
+# documents of earlier versions: what the dialogs put in their state. Stored
+# documents must not be able to name any other importable class.
+PICKLED_CLASSES: FrozenSet[str] = frozenset(
+    _qualified_name(kind)
+    for kind in (
+        BookingDetails,
+        DialogState,
+        DialogInstance,
+        PromptOptions,
+        Choice,
+        FoundChoice,
+        ListStyle,
+        Decimal,
+        frozenset,
+        datetime.date,
+        datetime.datetime,
+        datetime.time,
+        datetime.timedelta,
+        *(kind for kind in vars(schema).values() if isinstance(kind, type)),
+    )
+)
+# jsonpickle tags that name a class, and tags that run code or import a module.
+_CLASS_TAGS = ("py/object", "py/type")
+_REFUSED_TAGS = ("py/function", "py/mod", "py/repr")
+
+
+class StateCodec:
+    """
+    Encodes store items (the dicts `BotState` writes) to bytes and back.
+
+    Dialog stacks, `BookingDetails`, prompt options and Bot Framework schema
+    models are written as positional arrays without class paths or empty
+    attributes; an object reached twice (the booking details are both the
+    main dialog's "luis_result" and the booking waterfall's options) is
+    written once and referenced. Any other object is flattened by jsonpickle,
+    as before, if its class is in `PICKLED_CLASSES` or `pickled_classes`;
+    jsonpickle only ever rebuilds those classes, so a stored document cannot
+    name another one. `BookingDetails` fields are positional, so new ones
+    are only ever appended to its `__slots__`.
+
+    `compression` is "none", "zlib" or "zstd" (which needs the `zstandard`
+    package). Documents are read whatever compression they were written
+    with, and `str` documents are taken as the jsonpickle text earlier
+    versions stored.
+    """
+
+    def __init__(
+        self, compression: str = "zlib", level: int = 6, pickled_classes: Iterable[type] = ()
+    ):
+        if compression not in COMPRESSIONS:
+            raise ValueError(
+                f"Unknown state compression {compression!r}; use one of {', '.join(COMPRESSIONS)}."
+            )
+        self.compression = compression
+        self.level = level
+        self.pickled_classes = PICKLED_CLASSES | {_qualified_name(kind) for kind in pickled_classes}
+        self._header = bytes([FORMAT_VERSION << 4 | COMPRESSIONS[compression]])
+        self._zstd_compressor = None
+        self._zstd_decompressor = None
+
+    def encode(self, item: object) -> bytes:
+        text = json.dumps(
+            _Encoder(self.pickled_classes).encode(item), separators=(",", ":"), ensure_ascii=False
+        ).encode()
+        return self._header + self._compress(text)
+
+    def decode(self, document) -> object:
+        if isinstance(document, str):
+            tree = json.loads(document)
+            _check_pickled(tree, self.pickled_classes)
+            return jsonpickle.unpickler.Unpickler(keys=True).restore(tree)
+        header = document[0]
+        version, compression = header >> 4, header & 0x0F
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported state document version {version}.")
+        return _Decoder(self.pickled_classes).decode(json.loads(self._decompress(compression, document[1:])))
+
+    def _compress(self, text: bytes) -> bytes:
+        if self.compression == "zlib":
+            compressor = zlib.compressobj(self.level, zdict=_ZLIB_DICTIONARY)
+            return compressor.compress(text) + compressor.flush()
+        if self.compression == "zstd":
+            if self._zstd_compressor is None:
+                import zstandard  # pylint: disable=import-outside-toplevel
+
+                self._zstd_compressor = zstandard.ZstdCompressor(level=self.level)
+            return self._zstd_compressor.compress(text)
+        return text
+
+    def _decompress(self, compression: int, payload: bytes) -> bytes:
+        if compression == COMPRESSIONS["zlib"]:
+            decompressor = zlib.decompressobj(zdict=_ZLIB_DICTIONARY)
+            return decompressor.decompress(payload) + decompressor.flush()
+        if compression == COMPRESSIONS["zstd"]:
+            if self._zstd_decompressor is None:
+                import zstandard  # pylint: disable=import-outside-toplevel
+
+                self._zstd_decompressor = zstandard.ZstdDecompressor()
+            return self._zstd_decompressor.decompress(payload)
+        if compression == COMPRESSIONS["none"]:
+            return payload
+        raise ValueError(f"Unknown state document compression {compression}.")
+
+
+class _Encoder:
+    def __init__(self, pickled_classes: FrozenSet[str]):
+        self.pickled_classes = pickled_classes
+        # id() of every object written so far -> its position in write order,
+        # and the object itself: holding it for the whole encode keeps its
+        # id() from being reused by a temporary encoded later.
+        self.references: Dict[int, Tuple[int, object]] = {}
+
+    def encode(self, value):
+        kind = type(value)
+        if value is None or kind in (str, int, float, bool):
+            return value
+        if kind is dict:
+            if all(type(key) is str for key in value):
+                return {key: self.encode(item) for key, item in value.items()}
+            node = [_DICT]
+            for key, item in value.items():
+                node.append(self.encode(key))
+                node.append(self.encode(item))
+            return node
+        if kind is list:
+            return [_LIST, *map(self.encode, value)]
+        if kind is tuple:
+            return [_TUPLE, *map(self.encode, value)]
+        if kind is Decimal:
+            return [_DECIMAL, str(value)]
+        if isinstance(value, str):
+            # str enums of the schema (ActivityTypes, InputHints...) compare equal to their value.
+            return str.__str__(value)
+
+        reference = self.references.get(id(value))
+        if reference is not None:
+            return [_REFERENCE, reference[0]]
+        node = self._encode_object(kind, value)
+        self.references[id(value)] = (len(self.references), value)
+        return node
+
+    def _encode_object(self, kind, value):
+        if kind is BookingDetails:
+            return [_BOOKING_DETAILS, *(self.encode(getattr(value, name)) for name in BookingDetails.__slots__)]
+        if kind is DialogState:
+            return [_DIALOG_STATE, *map(self.encode, value.dialog_stack)]
+        if kind is DialogInstance:
+            return [_DIALOG_INSTANCE, value.id, self.encode(value.state)]
+        if kind is PromptOptions:
+            return [_PROMPT_OPTIONS, *(self.encode(getattr(value, name)) for name in _OPTIONS_FIELDS)]
+        if _is_schema_model(kind):
+            attributes = {}
+            for name in kind._attribute_map:  # pylint: disable=protected-access
+                attribute = getattr(value, name, None)
+                if attribute is not None:
+                    attributes[name] = self.encode(attribute)
+            if getattr(value, "additional_properties", None):
+                attributes["additional_properties"] = self.encode(value.additional_properties)
+            return [_SCHEMA_MODEL, kind.__name__, attributes]
+        flattened = jsonpickle.pickler.Pickler(keys=True).flatten(value)
+        _check_pickled(flattened, self.pickled_classes, TypeError)
+        return [_PICKLED, flattened]
+
+
+class _Decoder:
+    def __init__(self, pickled_classes: FrozenSet[str]):
+        self.pickled_classes = pickled_classes
+        # Objects in the order the encoder registered them, for _REFERENCE.
+        self.objects = []
+
+    def decode(self, node):
+        kind = type(node)
+        if kind is dict:
+            return {key: self.decode(item) for key, item in node.items()}
+        if kind is not list:
+            return node
+
+        tag = node[0]
+        if tag == _LIST:
+            return [self.decode(item) for item in node[1:]]
+        if tag == _TUPLE:
+            return tuple(self.decode(item) for item in node[1:])
+        if tag == _DICT:
+            return {
+                self.decode(node[index]): self.decode(node[index + 1])
+                for index in range(1, len(node), 2)
+            }
+        if tag == _DECIMAL:
+            return Decimal(node[1])
+        if tag == _REFERENCE:
+            return self.objects[node[1]]
+
+        value = self._decode_object(tag, node)
+        self.objects.append(value)
+        return value
+
+    def _decode_object(self, tag, node):
+        if tag == _BOOKING_DETAILS:
+            return BookingDetails(*(self.decode(item) for item in node[1:]))
+        if tag == _DIALOG_STATE:
+            return DialogState([self.decode(item) for item in node[1:]])
+        if tag == _DIALOG_INSTANCE:
+            return DialogInstance(node[1], self.decode(node[2]))
+        if tag == _PROMPT_OPTIONS:
+            return PromptOptions(*(self.decode(item) for item in node[1:]))
+        if tag == _SCHEMA_MODEL:
+            kind = getattr(schema, node[1], None)
+            if not _is_schema_model(kind):
+                raise ValueError(f"Unknown schema model {node[1]!r} in state document.")
+            return kind(**{name: self.decode(item) for name, item in node[2].items()})
+        if tag == _PICKLED:
+            _check_pickled(node[1], self.pickled_classes)
+            return jsonpickle.unpickler.Unpickler(keys=True).restore(node[1])
+        raise ValueError(f"Unknown tag {tag} in state document.")
+
+
+def _check_pickled(tree, allowed: FrozenSet[str], error: type = ValueError):
+    """Raises `error` if the jsonpickle `tree` names a class outside `allowed`, or code."""
+    pending: List[object] = [tree]
+    while pending:
+        node = pending.pop()
+        if isinstance(node, dict):
+            for tag in _REFUSED_TAGS:
+                if tag in node:
+                    raise error(f"State documents cannot contain {tag!r}.")
+            for tag in _CLASS_TAGS:
+                if tag in node and (not isinstance(node[tag], str) or node[tag] not in allowed):
+                    raise error(f"Class {node[tag]!r} is not allowed in state documents.")
+            pending.extend(node.values())
+        elif isinstance(node, list):
+            pending.extend(node)
+
+
+def _is_schema_model(kind) -> bool:
+    return (
+        isinstance(kind, type)
+        and issubclass(kind, Model)
+        and getattr(schema, kind.__name__, None) is kind
+    )
@@ -0,0 +1,60 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Utility to persist several state scopes at the end of a turn."""
+import asyncio
+from collections import Counter
+from typing import Dict, List
+
+from botbuilder.core import BotState, BotStateSet, TurnContext
+
+
+class ConcurrentBotStateSet(BotStateSet):
+    """
+    `BotStateSet` that loads and saves its scopes concurrently.
+
+    As with `BotState.save_changes(force=False)`, a scope is only written
+    when it was loaded during the turn and its content changed. `writes`
+    and `skipped` count both outcomes per scope.
+    """
+
+    def __init__(self, bot_states: List[BotState]):
+        super(ConcurrentBotStateSet, self).__init__(bot_states)
+        self.writes = Counter()
+        self.skipped = Counter()
+
+    @property
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {
+            self.scope_name(bot_state): {
+                "writes": self.writes[self.scope_name(bot_state)],
+                "skipped": self.skipped[self.scope_name(bot_state)],
+            }
+            for bot_state in self.bot_states
+        }
+
+    @staticmethod
+    def scope_name(bot_state: BotState) -> str:
+        return type(bot_state).__name__
+
+    async def load_all(self, turn_context: TurnContext, force: bool = False):
+        await asyncio.gather(
+            *(bot_state.load(turn_context, force) for bot_state in self.bot_states)
+        )
+
+    async def save_all_changes(self, turn_context: TurnContext, force: bool = False):
+        await asyncio.gather(
+            *(
+                self._save_changes(bot_state, turn_context, force)
+                for bot_state in self.bot_states
+            )
+        )
+
+    async def _save_changes(
+        self, bot_state: BotState, turn_context: TurnContext, force: bool
+    ):
+        cached_state = bot_state.get_cached_state(turn_context)
+        if cached_state is None or not (force or cached_state.is_changed):
+            self.skipped[self.scope_name(bot_state)] += 1
+            return
+        await bot_state.save_changes(turn_context, True)
+        self.writes[self.scope_name(bot_state)] += 1
@@ -0,0 +1,19 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Etag access on the items `Storage` implementations read and write."""
+from botbuilder.core import StoreItem
+
+
+def get_e_tag(item: object) -> str:
+    """The `e_tag` of a store item, which is either a dict or an object."""
+    if isinstance(item, dict):
+        return item.get("e_tag", None)
+    return getattr(item, "e_tag", None)
+
+
+def set_e_tag(item: object, e_tag: str):
+    """Stamps `e_tag` on a store item; objects without an etag are left alone."""
+    if isinstance(item, dict):
+        item["e_tag"] = e_tag
+    elif isinstance(item, StoreItem) or hasattr(item, "e_tag"):
+        item.e_tag = e_tag
@@ -0,0 +1,79 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Bounded, thread-safe LRU cache of parsed timex properties."""
+
+import threading
+from collections import OrderedDict
+from typing import FrozenSet
+
+from datatypes_date_time.timex import Timex
+
+
+class TimexCache:
+    """
+    Caches the `types` of a `Timex` keyed by timex string.
+
+    The dialogs ask the same question ("is this date definite?") of the same
+    timex several times per booking; each miss parses it once with `Timex`
+    and keeps the types as a frozen set, so entries can be shared between
+    turns and threads.
+    """
+
+    def __init__(self, max_size: int = 1024):
+        if max_size <= 0:
+            raise ValueError("TimexCache(): max_size must be positive.")
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, FrozenSet[str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def types(self, timex: str) -> FrozenSet[str]:
+        with self._lock:
+            types = self._entries.get(timex)
+            if types is not None:
+                self._entries.move_to_end(timex)
+                self.hits += 1
+                return types
+            self.misses += 1
+
+        # Parsed outside the lock; two threads missing on the same timex both
+        # parse it and store equal values.
+        types = frozenset(Timex(timex).types)
+        with self._lock:
+            self._entries[timex] = types
+            self._entries.move_to_end(timex)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return types
+
+    def is_definite(self, timex: str) -> bool:
+        return "definite" in self.types(timex)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hit_rate,
+        }
+
+
+# Shared by BookingDialog and DateResolverDialog.
+TIMEX_CACHE = TimexCache()
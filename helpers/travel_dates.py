@@ -0,0 +1,152 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Compiled grammar for the travel dates users type, with a cached fallback to dateutil."""
+
+import re
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from typing import Callable, Optional
+
+MONTHS = {
+    "january": 1, "jan": 1, "february": 2, "feb": 2, "march": 3, "mar": 3,
+    "april": 4, "apr": 4, "may": 5, "june": 6, "jun": 6, "july": 7, "jul": 7,
+    "august": 8, "aug": 8, "september": 9, "sept": 9, "sep": 9,
+    "october": 10, "oct": 10, "november": 11, "nov": 11, "december": 12, "dec": 12,
+}
+WEEKDAYS = {
+    "monday": 0, "mon": 0, "tuesday": 1, "tue": 1, "tues": 1, "wednesday": 2, "wed": 2,
+    "thursday": 3, "thu": 3, "thurs": 3, "friday": 4, "fri": 4,
+    "saturday": 5, "sat": 5, "sunday": 6, "sun": 6,
+}
+COUNTS = {
+    "a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6,
+    "seven": 7, "eight": 8, "nine": 9, "ten": 10, "eleven": 11, "twelve": 12,
+    "thirteen": 13, "fourteen": 14, "fifteen": 15, "twenty": 20, "thirty": 30,
+}
+TODAY_WORDS = {"asap": 0, "as soon as possible": 0, "now": 0, "today": 0, "tonight": 0}
+DAY_OFFSETS = {"tomorrow": 1, "day after tomorrow": 2, "the day after tomorrow": 2}
+
+_MONTH = "(" + "|".join(sorted(MONTHS, key=len, reverse=True)) + r")\.?"
+_WEEKDAY = "(" + "|".join(sorted(WEEKDAYS, key=len, reverse=True)) + ")"
+_COUNT = r"(\d+|" + "|".join(sorted(COUNTS, key=len, reverse=True)) + ")"
+_DAY = r"(\d{1,2})(?:st|nd|rd|th)?"
+_YEAR = r"(?:,?\s+(\d{4}))?"
+
+ISO_DATE = re.compile(r"\b(\d{4})-(\d{1,2})-(\d{1,2})\b")
+NUMERIC_DATE = re.compile(r"\b(\d{1,2})[/.-](\d{1,2})(?:[/.-](\d{2}|\d{4}))?\b")
+MONTH_DAY = re.compile(rf"\b{_MONTH}\s+(?:the\s+)?{_DAY}\b{_YEAR}")
+DAY_MONTH = re.compile(rf"\b{_DAY}\s+(?:of\s+)?{_MONTH}\b{_YEAR}")
+RELATIVE = re.compile(rf"\b(?:in\s+{_COUNT}\s+(day|week)s?|{_COUNT}\s+(day|week)s?\s+from\s+(?:now|today))\b")
+NEXT_WEEK = re.compile(r"\bnext\s+week\b")
+WEEKDAY = re.compile(rf"\b(?:(next|this|on|coming)\s+)?{_WEEKDAY}\b")
+NAMED_DAY = re.compile(
+    r"\b(" + "|".join(sorted({**TODAY_WORDS, **DAY_OFFSETS}, key=len, reverse=True)) + r")\b"
+)
+_NOISE = re.compile(r"[^\w/.\-\s]|_")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize(text: str) -> str:
+    return _SPACES.sub(" ", _NOISE.sub(" ", text.lower())).strip()
+
+
+class TravelDateParser:
+    """
+    Resolves travel date expressions to a `datetime` at midnight.
+
+    The grammar covers absolute dates ("march 3rd 2031", "3 of march",
+    "2031-03-03", "3/4/2031", month first like dateutil), "today"/"asap",
+    "tomorrow", "in 3 days", "two weeks from now", "next week" and weekdays.
+    A bare or "this" weekday is the next such day including today, "next"
+    excludes today. Anything else goes to dateutil's fuzzy parser. Results are
+    cached per text and current day, so a long-running process follows
+    `clock` across midnight.
+    """
+
+    def __init__(self, clock: Callable[[], date] = date.today, cache_size: int = 1024):
+        self.clock = clock
+        self._cached = lru_cache(maxsize=cache_size)(self._resolve)
+        self.fallbacks = 0
+
+    def parse(self, text: str) -> Optional[datetime]:
+        if not text:
+            return None
+        return self._cached(text, self.clock())
+
+    def cache_clear(self):
+        self._cached.cache_clear()
+
+    def _resolve(self, text: str, today: date) -> Optional[datetime]:
+        text = normalize(text)
+        try:
+            resolved = self._match(text, today)
+        except ValueError:
+            # e.g. "february 30"
+            return None
+        if resolved is not None:
+            return datetime(resolved.year, resolved.month, resolved.day)
+
+        self.fallbacks += 1
+        from dateutil.parser import parse  # pylint: disable=import-outside-toplevel
+
+        try:
+            return parse(text, fuzzy=True, default=datetime(today.year, today.month, today.day))
+        except (ValueError, OverflowError):
+            return None
+
+    def _match(self, text: str, today: date) -> Optional[date]:
+        match = ISO_DATE.search(text)
+        if match:
+            return date(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+
+        match = MONTH_DAY.search(text)
+        if match:
+            return self._date(today, match.group(3), MONTHS[match.group(1)], match.group(2))
+
+        match = DAY_MONTH.search(text)
+        if match:
+            return self._date(today, match.group(3), MONTHS[match.group(2)], match.group(1))
+
+        match = NUMERIC_DATE.search(text)
+        if match:
+            month, day = int(match.group(1)), int(match.group(2))
+            if month > 12 >= day:
+                month, day = day, month
+            return self._date(today, match.group(3), month, day)
+
+        match = RELATIVE.search(text)
+        if match:
+            count = match.group(1) or match.group(3)
+            unit = match.group(2) or match.group(4)
+            count = COUNTS[count] if count in COUNTS else int(count)
+            return today + timedelta(days=count * (7 if unit == "week" else 1))
+
+        match = NAMED_DAY.search(text)
+        if match:
+            name = match.group(1)
+            return today + timedelta(days=DAY_OFFSETS.get(name, TODAY_WORDS.get(name, 0)))
+
+        if NEXT_WEEK.search(text):
+            return today + timedelta(days=7)
+
+        match = WEEKDAY.search(text)
+        if match:
+            days_ahead = (WEEKDAYS[match.group(2)] - today.weekday()) % 7
+            if days_ahead == 0 and match.group(1) == "next":
+                days_ahead = 7
+            return today + timedelta(days=days_ahead)
+        return None
+
+    @staticmethod
+    def _date(today: date, year: Optional[str], month: int, day) -> date:
+        if year is None:
+            return date(today.year, month, int(day))
+        year = int(year)
+        if year < 100:
+            # Two digit years land within 50 years of today, as in dateutil.
+            year += today.year // 100 * 100
+            if year >= today.year + 50:
+                year -= 100
+            elif year < today.year - 50:
+                year += 100
+        return date(year, month, int(day))
@@ -0,0 +1,266 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""
+Offline recognizer compiled from the exported LUIS model.
+
+`cognitiveModels/FlightBooking.json` is compiled at startup into an
+in-memory index: a token trie over the closed list synonyms, the cue words
+that introduce the labelled `From`/`To` composites, and an intent lexicon
+built from the labelled utterances. Dates, passengers and budgets are
+matched with small grammars. Results use the entity names of the published
+LUIS app (`dst_city`, `or_city`, `str_date`, ...) in the same `$instance`
+shape as `LuisRecognizer`.
+"""
+
+import json
+import os
+import re
+from typing import Dict, List, Tuple
+
+from botbuilder.core import IntentScore, Recognizer, RecognizerResult, TurnContext
+from botbuilder.schema import ActivityTypes
+
+MODEL_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "cognitiveModels", "FlightBooking.json"
+)
+
+# The published app renamed the sample model's intent and composites.
+INTENT_ALIASES = {"Book flight": "book"}
+COMPOSITE_ALIASES = {"From": "or_city", "To": "dst_city"}
+BOOKING_INTENT = "book"
+NONE_INTENT = "None"
+
+NUMBER_WORDS = {
+    "one": 1, "two": 2, "three": 3, "four": 4, "five": 5,
+    "six": 6, "seven": 7, "eight": 8, "nine": 9, "ten": 10,
+}
+_NUMBER = r"(?:\d+|" + "|".join(NUMBER_WORDS) + r")"
+_MONTH = (
+    r"(?:jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|"
+    r"aug(?:ust)?|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)"
+)
+_DAY = r"\d{1,2}(?:st|nd|rd|th)?"
+_WEEKDAY = r"(?:monday|tuesday|wednesday|thursday|friday|saturday|sunday)"
+
+DATE_PATTERN = re.compile(
+    r"\b(?:"
+    rf"{_MONTH}\.? {_DAY}(?:,? \d{{4}})?"
+    rf"|{_DAY} (?:of )?{_MONTH}(?:,? \d{{4}})?"
+    r"|\d{4}-\d{2}-\d{2}"
+    r"|\d{1,2}/\d{1,2}(?:/\d{2,4})?"
+    rf"|(?:next |this )?{_WEEKDAY}"
+    r"|today|tomorrow|asap"
+    r")\b"
+)
+RETURN_CUES = ("back", "return", "returning", "until", "till")
+ADULTS_PATTERN = re.compile(
+    rf"\b{_NUMBER} (?:adults?|people|passengers|persons|tickets)\b"
+)
+CHILDREN_PATTERN = re.compile(rf"\b{_NUMBER} (?:kids?|children|child)\b")
+BUDGET_PATTERN = re.compile(
+    r"(?:budget (?:of |is )?\$?|\$ ?)(\d[\d,]*)|(\d[\d,]*) ?(?:\$|dollars|usd|euros)"
+)
+DURATION_PATTERN = re.compile(rf"\bfor {_NUMBER} (?:days?|weeks?|nights?)\b")
+
+# Words that only connect the grammar matches above, plus common fillers.
+GRAMMAR_WORDS = frozenset(
+    "a an the and with for of on in at is i i'd id want would like please need "
+    "me my budget dollars usd euros back return returning until till".split()
+)
+_TOKEN = re.compile(r"[a-z0-9$']+")
+
+
+class FlightBookingModel:
+    """Gazetteer, cue words and intent lexicon compiled from an exported LUIS model."""
+
+    def __init__(self, model: dict):
+        self.intents = [
+            INTENT_ALIASES.get(intent["name"], intent["name"])
+            for intent in model["intents"]
+        ]
+
+        # Token trie over every closed list synonym; "$" marks a complete entry.
+        self._gazetteer: Dict[str, dict] = {}
+        for closed_list in model["closedLists"]:
+            for sub_list in closed_list["subLists"]:
+                for synonym in sub_list["list"] + [sub_list["canonicalForm"]]:
+                    node = self._gazetteer
+                    for token in _TOKEN.findall(synonym.lower()):
+                        node = node.setdefault(token, {})
+                    node["$"] = sub_list["canonicalForm"]
+
+        # The word right before a labelled composite tells which one it is, and
+        # the words outside labelled spans make up the intent lexicon.
+        self._cues: Dict[str, str] = {}
+        self._lexicon: Dict[str, set] = {intent: set() for intent in self.intents}
+        for utterance in model["utterances"]:
+            intent = INTENT_ALIASES.get(utterance["intent"], utterance["intent"])
+            text = utterance["text"].lower()
+            labelled = set()
+            for entity in utterance["entities"]:
+                labelled.update(range(entity["startPos"], entity["endPos"] + 1))
+                if entity["entity"] not in COMPOSITE_ALIASES:
+                    continue
+                words = text[: entity["startPos"]].split()
+                if words:
+                    self._cues[words[-1]] = COMPOSITE_ALIASES[entity["entity"]]
+            for match in _TOKEN.finditer(text):
+                if match.start() not in labelled:
+                    self._lexicon[intent].add(match.group())
+
+    @classmethod
+    def from_file(cls, path: str = MODEL_PATH) -> "FlightBookingModel":
+        with open(path, encoding="utf-8") as model_file:
+            return cls(json.load(model_file))
+
+    def predict(self, query: str) -> Tuple[Dict[str, float], List[dict], float]:
+        """
+        Returns the intent scores, the entities found in `query` and the share
+        of its tokens the model could account for.
+        """
+        text = (query or "").lower()
+        tokens = [(match.start(), match.end(), match.group()) for match in _TOKEN.finditer(text)]
+        entities = self._cities(text, tokens) + self._dates(text) + self._numbers(text)
+
+        covered = set()
+        for entity in entities:
+            covered.update(range(entity["start"], entity["end"]))
+        loose = [token for token in tokens if token[0] not in covered]
+
+        # Only the words around the entities tell the intent: "cancel my flight
+        # to paris" names a city, but is not a booking.
+        scores = {intent: 0.0 for intent in self.intents}
+        if loose:
+            for intent, lexicon in self._lexicon.items():
+                hits = sum(1 for _, _, token in loose if token in lexicon)
+                scores[intent] = hits / len(loose)
+        if NONE_INTENT in scores:
+            scores[NONE_INTENT] = max(0.0, 1.0 - max(scores.values()))
+
+        explained = sum(
+            1
+            for _, _, token in loose
+            if token in GRAMMAR_WORDS
+            or any(token in lexicon for lexicon in self._lexicon.values())
+        )
+        coverage = (len(tokens) - len(loose) + explained) / len(tokens) if tokens else 0.0
+        return {name: round(score, 4) for name, score in scores.items()}, entities, coverage
+
+    def _cities(self, text: str, tokens: List[Tuple[int, int, str]]) -> List[dict]:
+        found = []
+        index = 0
+        while index < len(tokens):
+            node, end, canonical = self._gazetteer, None, None
+            for ahead in range(index, len(tokens)):
+                node = node.get(tokens[ahead][2])
+                if node is None:
+                    break
+                if "$" in node:
+                    end, canonical = ahead, node["$"]
+            if canonical is None:
+                index += 1
+                continue
+            cue = self._cues.get(tokens[index - 1][2]) if index else None
+            found.append([cue, tokens[index][0], tokens[end][1]])
+            index = end + 1
+
+        # Cities without a cue word are assigned destination first, then origin.
+        taken = {cue for cue, _, _ in found if cue}
+        for item in found:
+            if item[0] is None:
+                item[0] = "dst_city" if "dst_city" not in taken else "or_city"
+                taken.add(item[0])
+
+        return [_span(slot, start, end, text) for slot, start, end in found]
+
+    def _dates(self, text: str) -> List[dict]:
+        found = []
+        for match in DATE_PATTERN.finditer(text):
+            before = text[: match.start()].split()[-3:]
+            if found or any(word in RETURN_CUES for word in before):
+                slot = "end_date"
+            else:
+                slot = "str_date"
+            found.append(_span(slot, match.start(), match.end(), text))
+        return found
+
+    def _numbers(self, text: str) -> List[dict]:
+        found = []
+        for slot, pattern in (
+            ("n_adults", ADULTS_PATTERN),
+            ("n_children", CHILDREN_PATTERN),
+            ("max_duration", DURATION_PATTERN),
+        ):
+            match = pattern.search(text)
+            if match:
+                found.append(_span(slot, match.start(), match.end(), text))
+        match = BUDGET_PATTERN.search(text)
+        if match:
+            group = 1 if match.group(1) else 2
+            found.append(_span("budget", match.start(group), match.end(group), text))
+        return found
+
+
+def _span(entity_type: str, start: int, end: int, text: str) -> dict:
+    return {
+        "type": entity_type,
+        "text": text[start:end],
+        "start": start,
+        "end": end,
+        "score": 0.95,
+    }
+
+
+class OfflineRecognizer(Recognizer):
+    """Recognizes utterances in process with a compiled `FlightBookingModel`."""
+
+    def __init__(self, model: FlightBookingModel = None, threshold: float = 0.85):
+        self.model = model or FlightBookingModel.from_file()
+        self.threshold = threshold
+
+    def recognize_text(self, text: str) -> RecognizerResult:
+        scores, entities, coverage = self.model.predict(text)
+        values: Dict[str, list] = {}
+        instance: Dict[str, list] = {}
+        for entity in entities:
+            values.setdefault(entity["type"], []).append(entity["text"])
+            instance.setdefault(entity["type"], []).append(
+                {
+                    "startIndex": entity["start"],
+                    "endIndex": entity["end"],
+                    "text": entity["text"],
+                    "type": entity["type"],
+                    "score": entity["score"],
+                }
+            )
+        values["$instance"] = instance
+
+        return RecognizerResult(
+            text=text,
+            intents={name: IntentScore(score) for name, score in scores.items()},
+            entities=values,
+            properties={"recognizer": "offline", "coverage": coverage},
+        )
+
+    async def recognize(self, turn_context: TurnContext) -> RecognizerResult:
+        if turn_context.activity.type != ActivityTypes.message:
+            return None
+        return self.recognize_text(turn_context.activity.text)
+
+    def is_confident(self, result: RecognizerResult) -> bool:
+        """
+        True when the result can be used without asking LUIS: one intent other
+        than None scored, no other intent's words appear, and the model
+        accounts for at least `threshold` of the tokens.
+        """
+        if result is None or not result.intents:
+            return False
+        scored = [
+            name
+            for name, intent in result.intents.items()
+            if name != NONE_INTENT and intent.score > 0
+        ]
+        return (
+            len(scored) == 1
+            and result.properties.get("coverage", 0.0) >= self.threshold
+        )
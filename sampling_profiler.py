@@ -0,0 +1,264 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""On-demand statistical profiler of the running bot, served on an admin route."""
+
+import asyncio
+import concurrent.futures
+import hmac
+import sys
+import threading
+import time
+import weakref
+from collections import Counter
+from typing import Callable, Dict, List
+
+from aiohttp import web
+from aiohttp.web import Request, Response, json_response
+
+
+class SamplingProfiler:
+    """
+    Samples the stacks of every thread of the process from a thread of its own.
+
+    Each sample reads `sys._current_frames()` and counts the stack of every
+    other thread as a tuple of code objects; frames are only turned into
+    names when the profile is built, so a sample costs little more than
+    walking the frames. The asyncio tasks of `loop` are listed with every
+    sample to measure how long each one was alive during the profile; as
+    asyncio is not thread-safe, they are listed on the loop itself.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, loop_thread_id: int, interval_seconds: float = 0.01):
+        self.loop = loop
+        self.loop_thread_id = loop_thread_id
+        self.interval_seconds = interval_seconds
+
+    def run(self, seconds: float) -> dict:
+        """Samples for `seconds`, blocking the calling thread, and returns the profile."""
+        own_thread = threading.get_ident()
+        stacks: Counter = Counter()
+        thread_samples: Counter = Counter()
+        # (id, name) of a task -> [name, coroutine, samples it was alive in, weak reference]
+        tasks: Dict[tuple, list] = {}
+        listed = []
+        samples = 0
+
+        deadline = time.perf_counter() + seconds
+        next_sample = time.perf_counter()
+        while next_sample < deadline:
+            for thread_id, frame in sys._current_frames().items():  # pylint: disable=protected-access
+                if thread_id == own_thread:
+                    continue
+                codes = []
+                while frame is not None:
+                    codes.append(frame.f_code)
+                    frame = frame.f_back
+                codes.reverse()
+                stacks[(thread_id, tuple(codes))] += 1
+                thread_samples[thread_id] += 1
+            try:
+                listed = self._on_loop(_list_tasks, self.interval_seconds)
+            except concurrent.futures.TimeoutError:
+                # The loop is busy with one callback, so its tasks are those it last listed.
+                pass
+            for key, coroutine, reference in listed:
+                seen = tasks.get(key)
+                if seen is None:
+                    tasks[key] = [key[1], coroutine, 1, reference]
+                else:
+                    seen[2] += 1
+            samples += 1
+            next_sample += self.interval_seconds
+            time.sleep(max(0.0, next_sample - time.perf_counter()))
+
+        names = self._thread_names()
+        return {
+            "seconds": seconds,
+            "interval_seconds": self.interval_seconds,
+            "samples": samples,
+            "threads": {names.get(thread_id, str(thread_id)): count for thread_id, count in thread_samples.items()},
+            "collapsed": self._collapse(stacks, names),
+            "tasks": self._top_tasks(tasks.values()),
+        }
+
+    def _on_loop(self, collect: Callable, timeout: float):
+        """Calls `collect(loop)` on the loop's thread and waits up to `timeout` for its result."""
+        future = concurrent.futures.Future()
+
+        def run():
+            if not future.set_running_or_notify_cancel():
+                return
+            try:
+                future.set_result(collect(self.loop))
+            except Exception as exception:  # pylint: disable=broad-except
+                future.set_exception(exception)
+
+        self.loop.call_soon_threadsafe(run)
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            # A call still queued on the loop then does nothing when it runs.
+            future.cancel()
+            raise
+
+    def _thread_names(self) -> Dict[int, str]:
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        names[self.loop_thread_id] = "event-loop"
+        return {thread_id: name.replace(";", ",").replace(" ", "_") for thread_id, name in names.items()}
+
+    @staticmethod
+    def _collapse(stacks: Counter, names: Dict[int, str]) -> str:
+        """One "thread;outer;...;inner count" line per stack, as flamegraph.pl and speedscope read."""
+        labels: Dict[object, str] = {}
+        lines = []
+        for (thread_id, codes), count in stacks.most_common():
+            frames = [names.get(thread_id, str(thread_id))]
+            for code in codes:
+                label = labels.get(code)
+                if label is None:
+                    label = labels[code] = _code_label(code)
+                frames.append(label)
+            lines.append(f"{';'.join(frames)} {count}")
+        return "\n".join(lines)
+
+    def _top_tasks(self, tasks, limit: int = 20) -> List[dict]:
+        top_tasks = sorted(tasks, key=lambda seen: seen[2], reverse=True)[:limit]
+        try:
+            # Where the tasks that are still running wait now.
+            awaiting = self._on_loop(
+                lambda _loop: [_task_awaiting(reference()) for _name, _coroutine, _count, reference in top_tasks],
+                _AWAITING_TIMEOUT_SECONDS,
+            )
+        except concurrent.futures.TimeoutError:
+            awaiting = [None] * len(top_tasks)
+        top = []
+        for (name, coroutine, count, _reference), waits in zip(top_tasks, awaiting):
+            running = waits is not None
+            top.append(
+                {
+                    "task": name,
+                    "coroutine": coroutine,
+                    "wall_seconds": round(count * self.interval_seconds, 6),
+                    "awaiting": waits or "",
+                    "done": not running,
+                }
+            )
+        return top
+
+
+class ProfilerRoute:
+    """
+    `POST /admin/profile?seconds=10&interval_ms=10` profiles the process and
+    answers with the profile as JSON, or with only the collapsed stacks when
+    `format=collapsed`.
+
+    Requests need "Authorization: Bearer <token>". One profile runs at a
+    time and for at most `max_seconds`; the sampler runs on its own thread,
+    so the event loop keeps serving turns while it is sampled.
+    """
+
+    def __init__(self, token: str, max_seconds: float = 60.0):
+        if not token:
+            raise ValueError("The profiler route requires a token.")
+        self._token = token.encode()
+        self.max_seconds = max_seconds
+        self._running = False
+
+    def install(self, app: web.Application):
+        app.router.add_post("/admin/profile", self.post_profile)
+
+    async def post_profile(self, req: Request) -> Response:
+        authorization = req.headers.get("Authorization", "")
+        if not hmac.compare_digest(authorization.encode(), b"Bearer " + self._token):
+            return Response(status=401)
+        try:
+            seconds = float(req.query.get("seconds", 10))
+            interval_seconds = float(req.query.get("interval_ms", 10)) / 1000
+        except ValueError:
+            return Response(status=400, text="seconds and interval_ms must be numbers.")
+        if not 0 < seconds <= self.max_seconds or not 0.001 <= interval_seconds <= 1:
+            return Response(
+                status=400,
+                text=f"seconds must be in (0, {self.max_seconds}] and interval_ms in [1, 1000].",
+            )
+        if self._running:
+            return Response(status=409, text="A profile is already running.")
+
+        self._running = True
+        profile = await self._profile(seconds, interval_seconds)
+        if req.query.get("format") == "collapsed":
+            return Response(text=profile["collapsed"] + "\n", content_type="text/plain")
+        return json_response(profile)
+
+    def _profile(self, seconds: float, interval_seconds: float) -> asyncio.Future:
+        loop = asyncio.get_event_loop()
+        profiler = SamplingProfiler(loop, threading.get_ident(), interval_seconds)
+        done = loop.create_future()
+
+        def finish(result, error):
+            # The next profile may start once this sampler stopped, even if
+            # the client that asked for it went away.
+            self._running = False
+            if done.done():
+                return
+            if error is None:
+                done.set_result(result)
+            else:
+                done.set_exception(error)
+
+        def sample():
+            result, error = None, None
+            try:
+                result = profiler.run(seconds)
+            except Exception as exception:  # pylint: disable=broad-except
+                error = exception
+            loop.call_soon_threadsafe(finish, result, error)
+
+        threading.Thread(target=sample, name="sampling-profiler", daemon=True).start()
+        return done
+
+
+def _code_label(code) -> str:
+    name = getattr(code, "co_qualname", code.co_name)
+    return f"{name} ({_short_path(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _short_path(path: str) -> str:
+    # Relative to the longest import path holding it, e.g. "botbuilder/dialogs/dialog_set.py".
+    for prefix in sorted((entry for entry in sys.path if entry), key=len, reverse=True):
+        if path.startswith(prefix + "/"):
+            return path[len(prefix) + 1:]
+    return path
+
+
+# How long the profile waits for a busy loop to report where its tasks wait.
+_AWAITING_TIMEOUT_SECONDS = 1.0
+
+
+def _list_tasks(loop: asyncio.AbstractEventLoop) -> List[tuple]:
+    """(id, name) key, coroutine name and weak reference of every task of `loop`, listed on it."""
+    return [
+        ((id(task), task.get_name()), _coroutine_name(task.get_coro()), weakref.ref(task))
+        for task in asyncio.all_tasks(loop)
+    ]
+
+
+def _task_awaiting(task):
+    """Where `task` waits, or None once it is done."""
+    if task is None or task.done():
+        return None
+    return _awaiting(task.get_coro())
+
+
+def _coroutine_name(coroutine) -> str:
+    return getattr(coroutine, "__qualname__", type(coroutine).__name__)
+
+
+def _awaiting(coroutine) -> str:
+    """Where the innermost coroutine the task waits on is suspended."""
+    while getattr(coroutine, "cr_await", None) is not None and hasattr(coroutine.cr_await, "cr_frame"):
+        coroutine = coroutine.cr_await
+    frame = getattr(coroutine, "cr_frame", None)
+    if frame is None:
+        return ""
+    return f"{_code_label(frame.f_code)} line {frame.f_lineno}"
@@ -0,0 +1,271 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Durable bot state storage in a local SQLite database running in WAL mode."""
+
+import asyncio
+import sqlite3
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+
+from botbuilder.core import Storage, StoreItem
+
+from helpers.state_codec import StateCodec
+from helpers.store_items import get_e_tag, set_e_tag
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS state (
+    key TEXT PRIMARY KEY,
+    e_tag TEXT NOT NULL,
+    document BLOB NOT NULL
+) WITHOUT ROWID
+"""
+
+_UPSERT = """
+INSERT INTO state (key, e_tag, document) VALUES (?, ?, ?)
+ON CONFLICT(key) DO UPDATE SET e_tag = excluded.e_tag, document = excluded.document
+"""
+
+
+class SqliteStorage(Storage):
+    """
+    Stores bot state in a SQLite database, encoded by `codec` (by default a
+    zlib-compressed `StateCodec`, see helpers/state_codec.py). Rows written as
+    jsonpickle text by earlier versions are still read.
+
+    Optimistic concurrency works like `MemoryStorage`: every write stamps a new
+    `e_tag` on the item, and writing an item whose `e_tag` is neither empty nor
+    "*" and no longer matches the stored one raises `KeyError`.
+
+    Writes issued while a transaction is running are queued and committed
+    together in the next one, so many concurrent `save_changes` calls cost a
+    single commit. Each caller still waits for the commit that holds its
+    changes and gets its own etag conflicts. Documents that were read or
+    written recently are served from an in-process LRU cache; give
+    `read_cache_size=0` when other processes write to the same database.
+    """
+
+    def __init__(
+        self,
+        path: str = "bot_state.db",
+        read_cache_size: int = 10000,
+        synchronous: str = "NORMAL",
+        busy_timeout_ms: int = 5000,
+        codec: StateCodec = None,
+    ):
+        super(SqliteStorage, self).__init__()
+        self.path = path
+        self.codec = codec or StateCodec()
+        self.read_cache_size = read_cache_size
+        self._cache: "OrderedDict[str, Tuple[str, bytes]]" = OrderedDict()
+        # Bumped on every committed write or delete; a read only fills the cache
+        # when nothing was committed while it ran.
+        self._generation = 0
+        self._pending: List[Tuple[Dict[str, Tuple[str, bytes]], asyncio.Future]] = []
+        self._flusher: asyncio.Future = None
+        self.reads = 0
+        self.cache_hits = 0
+        self.writes = 0
+        self.transactions = 0
+
+        self._write_connection = self._connect(synchronous, busy_timeout_ms)
+        self._write_connection.execute(_SCHEMA)
+        self._read_connection = self._connect(synchronous, busy_timeout_ms)
+        # One thread per connection: reads are not held up by a running commit.
+        self._writer = ThreadPoolExecutor(1, thread_name_prefix="sqlite-writer")
+        self._reader = ThreadPoolExecutor(1, thread_name_prefix="sqlite-reader")
+
+    def _connect(self, synchronous: str, busy_timeout_ms: int) -> sqlite3.Connection:
+        connection = sqlite3.connect(
+            self.path, isolation_level=None, check_same_thread=False
+        )
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute(f"PRAGMA synchronous={synchronous}")
+        connection.execute(f"PRAGMA busy_timeout={int(busy_timeout_ms)}")
+        return connection
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return {
+            "reads": self.reads,
+            "cache_hits": self.cache_hits,
+            "writes": self.writes,
+            "transactions": self.transactions,
+            "cached": len(self._cache),
+        }
+
+    async def read(self, keys: List[str]):
+        data = {}
+        if not keys:
+            return data
+
+        documents = {}
+        missing = []
+        for key in keys:
+            self.reads += 1
+            cached = self._cache.get(key)
+            if cached is None:
+                missing.append(key)
+            else:
+                self._cache.move_to_end(key)
+                self.cache_hits += 1
+                documents[key] = cached
+
+        if missing:
+            generation = self._generation
+            rows = await asyncio.get_event_loop().run_in_executor(
+                self._reader, self._select, missing
+            )
+            for key, e_tag, document in rows:
+                documents[key] = (e_tag, document)
+                if generation == self._generation:
+                    self._remember(key, e_tag, document)
+
+        for key, (e_tag, document) in documents.items():
+            item = self.codec.decode(document)
+            set_e_tag(item, e_tag)
+            data[key] = item
+        return data
+
+    async def write(self, changes: Dict[str, StoreItem]):
+        if changes is None:
+            raise Exception("Changes are required when writing")
+        if not changes:
+            return
+
+        items = {}
+        for key, change in changes.items():
+            e_tag = get_e_tag(change)
+            if e_tag == "":
+                raise Exception("sqlite_storage.write(): etag missing")
+            items[key] = (e_tag, self.codec.encode(change))
+
+        future = asyncio.get_event_loop().create_future()
+        self._pending.append((items, future))
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.ensure_future(self._flush_pending())
+        e_tags = await future
+
+        for key, e_tag in e_tags.items():
+            set_e_tag(changes[key], e_tag)
+
+    async def delete(self, keys: List[str]):
+        keys = list(keys)
+        if not keys:
+            return
+        await asyncio.get_event_loop().run_in_executor(
+            self._writer, self._delete_rows, keys
+        )
+        self._generation += 1
+        for key in keys:
+            self._cache.pop(key, None)
+
+    async def close(self):
+        """Waits for queued writes, then closes the database."""
+        if self._flusher is not None:
+            await self._flusher
+        self._writer.shutdown()
+        self._reader.shutdown()
+        self._write_connection.close()
+        self._read_connection.close()
+
+    async def _flush_pending(self):
+        loop = asyncio.get_event_loop()
+        while self._pending:
+            batch, self._pending = self._pending, []
+            try:
+                outcomes = await loop.run_in_executor(
+                    self._writer, self._commit, [items for items, _ in batch]
+                )
+            except Exception as error:  # pylint: disable=broad-except
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(error)
+                continue
+
+            self._generation += 1
+            for (items, future), outcome in zip(batch, outcomes):
+                if isinstance(outcome, Exception):
+                    # The cached etag of a conflicting key may be stale; read it again next time.
+                    for key in items:
+                        self._cache.pop(key, None)
+                    if not future.done():
+                        future.set_exception(outcome)
+                    continue
+                for key, e_tag in outcome.items():
+                    self._remember(key, e_tag, items[key][1])
+                if not future.done():
+                    future.set_result(outcome)
+
+    def _remember(self, key: str, e_tag: str, document: bytes):
+        if self.read_cache_size <= 0:
+            return
+        self._cache[key] = (e_tag, document)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.read_cache_size:
+            self._cache.popitem(last=False)
+
+    def _select(self, keys: List[str]) -> List[Tuple[str, str, bytes]]:
+        placeholders = ",".join("?" * len(keys))
+        return self._read_connection.execute(
+            f"SELECT key, e_tag, document FROM state WHERE key IN ({placeholders})",
+            keys,
+        ).fetchall()
+
+    def _commit(self, batch: List[Dict[str, Tuple[str, bytes]]]) -> list:
+        """Writes every request of the batch in one transaction.
+
+        Each request runs under its own savepoint, so an etag conflict only
+        rolls back that request's changes.
+        """
+        connection = self._write_connection
+        outcomes = []
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            for items in batch:
+                connection.execute("SAVEPOINT write_request")
+                try:
+                    outcomes.append(self._upsert(connection, items))
+                    connection.execute("RELEASE write_request")
+                except KeyError as error:
+                    connection.execute("ROLLBACK TO write_request")
+                    connection.execute("RELEASE write_request")
+                    outcomes.append(error)
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        self.transactions += 1
+        return outcomes
+
+    def _upsert(
+        self, connection: sqlite3.Connection, items: Dict[str, Tuple[str, bytes]]
+    ) -> Dict[str, str]:
+        e_tags = {}
+        for key, (new_value_etag, document) in items.items():
+            row = connection.execute(
+                "SELECT e_tag FROM state WHERE key = ?", (key,)
+            ).fetchone()
+            old_state_etag = row[0] if row else None
+            if (
+                old_state_etag is not None
+                and new_value_etag is not None
+                and new_value_etag != "*"
+                and new_value_etag != old_state_etag
+            ):
+                raise KeyError(
+                    "Etag conflict.\nOriginal: %s\r\nCurrent: %s"
+                    % (new_value_etag, old_state_etag)
+                )
+            e_tag = uuid.uuid4().hex
+            connection.execute(_UPSERT, (key, e_tag, document))
+            e_tags[key] = e_tag
+            self.writes += 1
+        return e_tags
+
+    def _delete_rows(self, keys: List[str]):
+        placeholders = ",".join("?" * len(keys))
+        self._write_connection.execute(
+            f"DELETE FROM state WHERE key IN ({placeholders})", keys
+        )
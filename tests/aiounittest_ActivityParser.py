@@ -0,0 +1,80 @@
+import glob
+import json
+import os
+
+import aiounittest   # The test framework
+
+from botbuilder.schema import Activity
+from msrest.serialization import Model
+
+from helpers.activity_parser import ActivityParser
+
+PAYLOADS = os.path.join(os.path.dirname(__file__), os.pardir, "benchmarks", "payloads")
+
+
+def assert_same(fast, msrest, path="activity"):
+    """Same types, attributes and values all the way down."""
+    assert type(fast) is type(msrest), f"{path}: {type(fast)} != {type(msrest)}"
+    if isinstance(fast, Model):
+        assert list(vars(fast)) == list(vars(msrest)), path
+        for name, value in vars(fast).items():
+            assert_same(value, getattr(msrest, name), f"{path}.{name}")
+    elif isinstance(fast, dict):
+        assert list(fast) == list(msrest) or set(fast) == set(msrest), path
+        for key, value in fast.items():
+            assert_same(value, msrest[key], f"{path}[{key!r}]")
+    elif isinstance(fast, list):
+        assert len(fast) == len(msrest), path
+        for index, (left, right) in enumerate(zip(fast, msrest)):
+            assert_same(left, right, f"{path}[{index}]")
+    else:
+        assert repr(fast) == repr(msrest), f"{path}: {fast!r} != {msrest!r}"
+
+
+class Test_activity_parser(aiounittest.AsyncTestCase):
+
+    def test_matches_msrest_on_channel_payloads(self):
+        parser = ActivityParser()
+        paths = sorted(glob.glob(os.path.join(PAYLOADS, "*.json")))
+        assert paths
+        for path in paths:
+            with open(path, "rb") as payload:
+                body = payload.read()
+            assert_same(parser.parse(body), Activity().deserialize(json.loads(body)), os.path.basename(path))
+        assert parser.fast == len(paths) and parser.fallbacks == 0
+
+    def test_keeps_unknown_keys_as_additional_properties(self):
+        data = {
+            "type": "message",
+            "futureField": {"a": 1},
+            "entities": [{"type": "mention", "text": "<at>bot</at>", "mentioned": {"id": "bot"}}],
+        }
+        activity = ActivityParser().from_dict(data)
+        assert activity.additional_properties == {"futureField": {"a": 1}}
+        assert activity.entities[0].additional_properties["mentioned"] == {"id": "bot"}
+        assert_same(activity, Activity().deserialize(data))
+
+    def test_falls_back_to_msrest_for_unexpected_values(self):
+        parser = ActivityParser()
+        data = {
+            "type": "message",
+            "text": 42,
+            "historyDisclosed": "true",
+            "from": {"id": 7},
+            "membersAdded": [None, {"id": "user"}],
+        }
+        activity = parser.from_dict(data)
+        assert parser.fallbacks == 1
+        assert activity.text == "42" and activity.history_disclosed is True
+        assert_same(activity, Activity().deserialize(data))
+
+    def test_invalid_bodies_raise_like_msrest(self):
+        parser = ActivityParser()
+        with self.assertRaises(Exception) as fast:
+            parser.from_dict({"type": "message", "timestamp": "yesterday"})
+        with self.assertRaises(Exception) as msrest:
+            Activity().deserialize({"type": "message", "timestamp": "yesterday"})
+        assert type(fast.exception) is type(msrest.exception)
+
+if aiounittest.AsyncTestCase == '__main__':
+    aiounittest.main()
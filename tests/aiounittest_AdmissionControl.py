@@ -0,0 +1,134 @@
+import asyncio
+import json
+from http import HTTPStatus
+
+import aiounittest   # The test framework
+
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+
+import app
+from admission_control import AdmissionController, Overloaded
+from helpers.activity_parser import ActivityParser
+from turn_metrics import TurnMetrics
+
+
+class Turns:
+    """Turns that run until `release` is set."""
+
+    def __init__(self, admission: AdmissionController):
+        self.admission = admission
+        self.started = []
+        self.release = asyncio.Event()
+
+    async def run(self, channel_id: str, name: str):
+        async with self.admission.admit(channel_id):
+            self.started.append(name)
+            await self.release.wait()
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+class Test_admission_controller(aiounittest.AsyncTestCase):
+
+    async def test_turns_wait_for_a_slot_in_order(self):
+        admission = AdmissionController(max_concurrent=3, max_concurrent_per_channel=2, max_queued=10)
+        turns = Turns(admission)
+        tasks = [
+            asyncio.ensure_future(turns.run(channel_id, name))
+            for channel_id, name in (("msteams", "t1"), ("msteams", "t2"), ("msteams", "t3"), ("webchat", "w1"), ("webchat", "w2"))
+        ]
+        await settle()
+
+        # msteams is at its limit, so w1 overtakes t3; w2 finds the bot full.
+        assert turns.started == ["t1", "t2", "w1"]
+        assert admission.stats["in_flight"] == 3 and admission.stats["queued"] == 2
+        assert admission.channel_stats == {
+            "msteams": {"in_flight": 2, "queued": 1},
+            "webchat": {"in_flight": 1, "queued": 1},
+        }
+
+        turns.release.set()
+        await asyncio.gather(*tasks)
+        assert turns.started == ["t1", "t2", "w1", "t3", "w2"]
+        assert admission.stats["in_flight"] == 0 and admission.channel_stats == {}
+        assert admission.stats["admitted"] == 5 and admission.stats["queued_total"] == 2
+
+    async def test_overload_is_refused_with_retry_after(self):
+        admission = AdmissionController(
+            max_concurrent=2, max_concurrent_per_channel=1, max_queued=1, queue_timeout_seconds=0.05
+        )
+        admission.turn_seconds = 3.0
+        turns = Turns(admission)
+        running = [asyncio.ensure_future(turns.run("msteams", "t1"))]
+        await settle()
+
+        # The channel is at its limit while the bot is not: 429.
+        with self.assertRaises(Overloaded) as refused:
+            await turns.run("msteams", "t2")
+        assert refused.exception.status == HTTPStatus.TOO_MANY_REQUESTS
+        assert refused.exception.retry_after_seconds == 3
+
+        running.append(asyncio.ensure_future(turns.run("webchat", "w1")))
+        running.append(asyncio.ensure_future(turns.run("directline", "d1")))
+        await settle()
+
+        # The bot is full and so is its queue: 503 at once.
+        with self.assertRaises(Overloaded) as refused:
+            await turns.run("slack", "s1")
+        assert refused.exception.status == HTTPStatus.SERVICE_UNAVAILABLE
+        assert refused.exception.retry_after_seconds == 3
+
+        # A cancelled waiter leaves the queue.
+        running.pop().cancel()
+        await settle()
+        assert admission.stats["queued"] == 0
+
+        turns.release.set()
+        await asyncio.gather(*running)
+        assert admission.stats["rejected_queue_full"] == 1 and admission.stats["rejected_timeout"] == 1
+
+
+class Test_messages(aiounittest.AsyncTestCase):
+
+    async def test_a_saturated_bot_answers_503(self):
+        release = asyncio.Event()
+
+        class Adapter:
+            async def process_activity(self, activity, auth_header, logic):
+                await release.wait()
+
+        class Bot:
+            async def on_turn(self, context):
+                pass
+
+        application = web.Application()
+        application["adapter"] = Adapter()
+        application["bot"] = Bot()
+        application["activity_parser"] = ActivityParser()
+        application["metrics"] = TurnMetrics()
+        application["admission"] = AdmissionController(max_concurrent=1, max_queued=0)
+        application["turn_scheduler"] = None
+        application.router.add_post("/api/messages", app.messages)
+        client = TestClient(TestServer(application))
+        await client.start_server()
+        try:
+            body = json.dumps({"type": "message", "channelId": "webchat", "text": "Hi"})
+            headers = {"Content-Type": "application/json"}
+            first = asyncio.ensure_future(client.post("/api/messages", data=body, headers=headers))
+            await asyncio.sleep(0.05)
+
+            refused = await client.post("/api/messages", data=body, headers=headers)
+            assert refused.status == HTTPStatus.SERVICE_UNAVAILABLE
+            assert refused.headers["Retry-After"] == "1"
+
+            release.set()
+            assert (await first).status == HTTPStatus.OK
+        finally:
+            await client.close()
+
+if aiounittest.AsyncTestCase == '__main__':
+    aiounittest.main()
@@ -0,0 +1,118 @@
+import threading
+import time
+
+import aiounittest   # The test framework
+
+from botbuilder.core import NullTelemetryClient
+
+from background_telemetry_client import AiohttpRequestContext, BackgroundTelemetryClient
+
+
+class RecordingTelemetryClient(NullTelemetryClient):
+    def __init__(self, send_gate: threading.Event = None):
+        super().__init__()
+        self.traces = []
+        self.flushed = []
+        self._send_gate = send_gate
+
+    def track_trace(self, name, properties=None, severity=None):
+        if self._send_gate is not None:
+            self._send_gate.wait()
+        self.traces.append(name)
+
+    def flush(self):
+        self.flushed.append(len(self.traces))
+
+
+class DictRequestContext(AiohttpRequestContext):
+    """Keeps the request bodies in a dict of its own instead of the SDK middleware's."""
+
+    def __init__(self):
+        self.bodies = {}
+
+    def _bodies(self) -> dict:
+        return self.bodies
+
+
+class BodyRecordingClient(NullTelemetryClient):
+    def __init__(self, request_context: DictRequestContext):
+        super().__init__()
+        self.request_context = request_context
+        self.bodies = []
+
+    def track_trace(self, name, properties=None, severity=None):
+        self.bodies.append(self.request_context.bodies.get(threading.current_thread().ident))
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.005)
+    return condition()
+
+
+class Test_background_telemetry(aiounittest.AsyncTestCase):
+
+    def test_flushes_every_batch(self):
+        target = RecordingTelemetryClient()
+        client = BackgroundTelemetryClient(target, batch_size=10, flush_interval_seconds=60)
+        for index in range(25):
+            client.track_trace(f"trace-{index}")
+
+        assert wait_for(lambda: len(target.traces) == 25)
+        assert wait_for(lambda: target.flushed == [10, 20])
+        client.close()
+        assert target.flushed == [10, 20, 25]
+        assert client.stats["forwarded"] == 25 and client.stats["queue_depth"] == 0
+
+    def test_flushes_after_interval(self):
+        target = RecordingTelemetryClient()
+        client = BackgroundTelemetryClient(target, batch_size=100, flush_interval_seconds=0.05)
+        client.track_trace("trace")
+        assert wait_for(lambda: target.flushed == [1])
+        client.close()
+
+    def test_tracking_does_not_wait_for_a_slow_backend(self):
+        gate = threading.Event()
+        target = RecordingTelemetryClient(send_gate=gate)
+        client = BackgroundTelemetryClient(target, max_queue_size=5)
+
+        # The sender picks up the first item and blocks on the backend.
+        client.track_trace("trace")
+        assert wait_for(lambda: client.queue_depth == 0)
+
+        start = time.monotonic()
+        for index in range(20):
+            client.track_trace(f"trace-{index}")
+        assert time.monotonic() - start < 0.5
+
+        assert client.queue_depth == 5
+        assert client.dropped == 15
+        gate.set()
+        client.close()
+        assert len(target.traces) == 6
+
+    def test_flush_does_not_block(self):
+        gate = threading.Event()
+        client = BackgroundTelemetryClient(RecordingTelemetryClient(send_gate=gate))
+        client.track_trace("trace")
+        start = time.monotonic()
+        client.flush()
+        assert time.monotonic() - start < 0.5
+        gate.set()
+        client.close()
+
+    def test_items_carry_the_body_of_their_own_request(self):
+        request_context = DictRequestContext()
+        recording = BodyRecordingClient(request_context)
+        client = BackgroundTelemetryClient(recording, request_context=request_context)
+        request_context.bodies[threading.current_thread().ident] = "request"
+        client.track_trace("during the request")
+        del request_context.bodies[threading.current_thread().ident]
+        client.track_trace("after the request")
+        assert wait_for(lambda: len(recording.bodies) == 2)
+        assert recording.bodies == ["request", None]
+        client.close()
+
+if aiounittest.AsyncTestCase == '__main__':
+    aiounittest.main()
@@ -0,0 +1,91 @@
+import asyncio
+import time
+
+import aiounittest   # The test framework
+
+from botbuilder.core import ConversationState, MemoryStorage, TurnContext, UserState
+from botbuilder.core.adapters import TestAdapter
+from botbuilder.schema import Activity, ActivityTypes, ChannelAccount, ConversationAccount
+
+from helpers.state_helper import ConcurrentBotStateSet
+
+
+class SlowStorage(MemoryStorage):
+    """MemoryStorage with a round trip delay, counting its writes."""
+
+    def __init__(self, delay_seconds: float):
+        super().__init__()
+        self.delay_seconds = delay_seconds
+        self.write_calls = 0
+
+    async def read(self, keys):
+        await asyncio.sleep(self.delay_seconds)
+        return await super().read(keys)
+
+    async def write(self, changes):
+        self.write_calls += 1
+        await asyncio.sleep(self.delay_seconds)
+        await super().write(changes)
+
+
+def create_context() -> TurnContext:
+    return TurnContext(
+        TestAdapter(),
+        Activity(
+            type=ActivityTypes.message,
+            channel_id="test",
+            conversation=ConversationAccount(id="convo"),
+            from_property=ChannelAccount(id="user"),
+        ),
+    )
+
+
+class Test_concurrent_bot_state_set(aiounittest.AsyncTestCase):
+
+    async def test_saves_changed_scopes_concurrently(self):
+        storage = SlowStorage(0.2)
+        conversation_state = ConversationState(storage)
+        user_state = UserState(storage)
+        bot_states = ConcurrentBotStateSet([conversation_state, user_state])
+        context = create_context()
+
+        await bot_states.load_all(context)
+        await conversation_state.create_property("count").set(context, 1)
+        await user_state.create_property("name").set(context, "Ada")
+
+        start = time.monotonic()
+        await bot_states.save_all_changes(context)
+        assert time.monotonic() - start < 0.35
+        assert storage.write_calls == 2
+        assert bot_states.stats == {
+            "ConversationState": {"writes": 1, "skipped": 0},
+            "UserState": {"writes": 1, "skipped": 0},
+        }
+
+    async def test_skips_unchanged_and_unloaded_scopes(self):
+        storage = SlowStorage(0)
+        conversation_state = ConversationState(storage)
+        user_state = UserState(storage)
+        bot_states = ConcurrentBotStateSet([conversation_state, user_state])
+
+        context = create_context()
+        await conversation_state.load(context)
+        await conversation_state.create_property("count").set(context, 1)
+        await bot_states.save_all_changes(context)
+        assert storage.write_calls == 1
+
+        context = create_context()
+        await conversation_state.load(context)
+        assert await conversation_state.create_property("count").get(context) == 1
+        await bot_states.save_all_changes(context)
+        assert storage.write_calls == 1
+        assert bot_states.stats == {
+            "ConversationState": {"writes": 1, "skipped": 1},
+            "UserState": {"writes": 0, "skipped": 2},
+        }
+
+        await bot_states.save_all_changes(context, force=True)
+        assert bot_states.writes["ConversationState"] == 2
+
+if aiounittest.AsyncTestCase == '__main__':
+    aiounittest.main()
@@ -0,0 +1,145 @@
+import asyncio
+
+import aiounittest   # The test framework
+
+from botbuilder.core import ConversationState, MemoryStorage, TurnContext
+from botbuilder.core.adapters import TestAdapter
+from botbuilder.dialogs import DialogInstance, DialogState
+from botbuilder.schema import Activity, ActivityTypes, ChannelAccount, ConversationAccount
+
+from booking_details import BookingDetails
+from bounded_memory_storage import BoundedMemoryStorage
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def state(destination="Paris"):
+    details = BookingDetails(destination=destination)
+    return {"DialogState": DialogState([DialogInstance(id="MainDialog", state={"options": details})])}
+
+
+def destination(item):
+    return item["DialogState"].dialog_stack[0].state["options"].destination
+
+
+class SlowSpill(MemoryStorage):
+    """Holds its first write until `release` is set."""
+
+    def __init__(self):
+        super().__init__()
+        self.release = asyncio.Event()
+        self.writes = 0
+
+    async def write(self, changes):
+        self.writes += 1
+        if self.writes == 1:
+            await self.release.wait()
+        await super().write(changes)
+
+
+class Test_bounded_memory_storage(aiounittest.AsyncTestCase):
+
+    async def test_is_a_drop_in_for_conversation_state(self):
+        storage = BoundedMemoryStorage()
+        conversation_state = ConversationState(storage)
+        activity = Activity(
+            type=ActivityTypes.message,
+            channel_id="test",
+            conversation=ConversationAccount(id="conversation"),
+            from_property=ChannelAccount(id="user"),
+        )
+        context = TurnContext(TestAdapter(), activity)
+        await conversation_state.load(context)
+        await conversation_state.create_property("count").set(context, 3)
+        await conversation_state.save_changes(context)
+
+        context = TurnContext(TestAdapter(), activity)
+        await conversation_state.load(context)
+        assert await conversation_state.create_property("count").get(context) == 3
+        assert storage.stats["items"] == 1 and storage.stats["bytes"] > 0
+
+    async def test_reads_are_copies_and_stale_etags_conflict(self):
+        storage = BoundedMemoryStorage()
+        await storage.write({"conversation": state()})
+        first = (await storage.read(["conversation"]))["conversation"]
+        second = (await storage.read(["conversation"]))["conversation"]
+        assert first is not second and first["e_tag"] == second["e_tag"]
+
+        await storage.write({"conversation": first})
+        with self.assertRaises(KeyError):
+            await storage.write({"conversation": second})
+        second["e_tag"] = "*"
+        await storage.write({"conversation": second})
+
+    async def test_idle_items_expire_and_reads_keep_items_alive(self):
+        clock = Clock()
+        storage = BoundedMemoryStorage(ttl_seconds=60, clock=clock)
+        await storage.write({"idle": state(), "active": state()})
+        clock.now += 40
+        await storage.read(["active"])
+        clock.now += 40
+        data = await storage.read(["idle", "active"])
+        assert list(data) == ["active"]
+        assert storage.stats["expirations"] == 1 and storage.stats["items"] == 1
+
+    async def test_evicts_least_recently_used_past_the_caps(self):
+        storage = BoundedMemoryStorage(max_items=2)
+        await storage.write({"a": state()})
+        await storage.write({"b": state()})
+        await storage.read(["a"])
+        await storage.write({"c": state()})
+        assert set(await storage.read(["a", "b", "c"])) == {"a", "c"}
+        assert storage.stats["evictions"] == 1
+
+        one_item = storage.stats["bytes"] // 2
+        storage = BoundedMemoryStorage(max_bytes=one_item * 3)
+        for key in "abcde":
+            await storage.write({key: state()})
+        assert storage.stats["items"] == 3 and storage.stats["bytes"] <= one_item * 3
+
+    async def test_spills_evicted_items_and_brings_them_back(self):
+        spill = MemoryStorage()
+        storage = BoundedMemoryStorage(max_items=1, spill=spill)
+        await storage.write({"a": state("Paris")})
+        read = (await storage.read(["a"]))["a"]
+        await storage.write({"b": state("Rome")})
+        assert list(spill.memory) == ["a"] and storage.stats["spilled"] == 1
+
+        # The spilled item keeps its etag: a write based on the earlier read succeeds.
+        read["DialogState"].dialog_stack[0].state["options"].destination = "Berlin"
+        await storage.write({"a": read})
+        assert destination((await storage.read(["a"]))["a"]) == "Berlin"
+        assert "a" not in spill.memory
+
+        assert destination((await storage.read(["b"]))["b"]) == "Rome"
+        assert storage.stats["restored"] == 1 and list(spill.memory) == ["a"]
+        await storage.delete(["a", "b"])
+        assert spill.memory == {} and await storage.read(["a", "b"]) == {}
+
+    async def test_an_item_restored_while_it_spills_leaves_no_row(self):
+        spill = SlowSpill()
+        storage = BoundedMemoryStorage(max_items=1, spill=spill)
+        await storage.write({"a": state("Paris")})
+        spilling = asyncio.ensure_future(storage.write({"b": state("Rome")}))
+        await asyncio.sleep(0)
+
+        # Read back from the write still in flight, which then lands in spill.
+        assert destination((await storage.read(["a"]))["a"]) == "Paris"
+        spill.release.set()
+        await spilling
+        # Only "b", which the read evicted in turn, is left in spill.
+        assert list(spill.memory) == ["b"]
+
+        # Evicted again, "a" is spilled afresh rather than found stale.
+        await storage.write({"a": state("Berlin")})
+        await storage.write({"c": state("Oslo")})
+        assert destination((await storage.read(["a"]))["a"]) == "Berlin"
+
+if aiounittest.AsyncTestCase == '__main__':
+    aiounittest.main()
@@ -0,0 +1,161 @@
+import asyncio
+import base64
+import io
+import json
+import threading
+
+import aiounittest   # The test framework
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from botbuilder.schema import Activity, ActivityTypes
+from botframework.connector.auth import AppCredentials, MicrosoftAppCredentials
+
+from benchmarks import connector_stand_in
+from connector_pool import ConnectorClientPool, ServiceTokenCache
+
+
+def jwt(number: int, expires_at: float) -> str:
+    claims = base64.urlsafe_b64encode(json.dumps({"exp": expires_at, "n": number}).encode()).decode().rstrip("=")
+    return f"header.{claims}.signature"
+
+
+class CountingCredentials(AppCredentials):
+    """Issues numbered tokens valid for an hour of the test clock."""
+
+    def __init__(self, clock):
+        super(CountingCredentials, self).__init__(app_id="bot-app-id", oauth_scope="https://api.botframework.com")
+        self.clock = clock
+        self.issued = 0
+        self.threads = set()
+
+    def get_access_token(self, force_refresh: bool = False) -> str:
+        self.threads.add(threading.get_ident())
+        self.issued += 1
+        return jwt(self.issued, self.clock[0] + 3600)
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0.01)
+
+
+class Test_service_token_cache(aiounittest.AsyncTestCase):
+
+    async def test_tokens_are_fetched_once_and_refreshed_ahead_of_expiry(self):
+        clock = [1000.0]
+        credentials = CountingCredentials(clock)
+        cache = ServiceTokenCache(refresh_margin_seconds=300, clock=lambda: clock[0])
+
+        tokens = await asyncio.gather(*(cache.token(credentials) for _ in range(10)))
+        assert set(tokens) == {jwt(1, 4600.0)}
+        assert credentials.issued == 1
+        assert threading.get_ident() not in credentials.threads
+
+        # Within the margin the current token is returned while a new one is fetched.
+        clock[0] = 4400.0
+        assert await cache.token(credentials) == jwt(1, 4600.0)
+        await settle()
+        assert credentials.issued == 2
+        assert await cache.token(credentials) == jwt(2, 8000.0)
+
+        # Past its expiry a token is never returned.
+        clock[0] = 9000.0
+        assert await cache.token(credentials) == jwt(3, 12600.0)
+        assert cache.stats == {"tokens": 1, "hits": 2, "fetches": 3, "refreshes": 1, "errors": 0}
+
+
+class Test_connector_client_pool(aiounittest.AsyncTestCase):
+
+    async def test_replies_share_keep_alive_connections(self):
+        connector = TestServer(connector_stand_in.create_app(latency_ms=5))
+        await connector.start_server()
+        pool = ConnectorClientPool(max_connections_per_host=4)
+        try:
+            service_url = str(connector.make_url("")).rstrip("/")
+            client = pool.client(service_url, MicrosoftAppCredentials.empty())
+            assert pool.client(service_url, MicrosoftAppCredentials.empty()) is client
+
+            for _ in range(2):
+                await asyncio.gather(
+                    *(
+                        client.conversations.send_to_conversation(
+                            "conversation", Activity(type=ActivityTypes.message, text=str(index))
+                        )
+                        for index in range(20)
+                    )
+                )
+
+            assert connector.app["stats"]["activities"] == 40
+            assert connector.app["stats"]["connections"] == 4
+            assert pool.stats["requests"] == 40
+            assert pool.stats["connections_opened"] == 4
+        finally:
+            await pool.close()
+            await connector.close()
+
+    async def test_a_refused_token_is_replaced_once(self):
+        clock = [1000.0]
+        credentials = CountingCredentials(clock)
+        authorizations = []
+
+        async def post_activity(req):
+            authorizations.append(req.headers.get("Authorization"))
+            if req.headers.get("Authorization") == f"Bearer {jwt(1, 4600.0)}":
+                return web.Response(status=401)
+            return web.json_response({"id": "reply"})
+
+        app = web.Application()
+        app.router.add_post("/v3/conversations/{conversation_id}/activities", post_activity)
+        connector = TestServer(app)
+        await connector.start_server()
+        pool = ConnectorClientPool(ServiceTokenCache(clock=lambda: clock[0]))
+        try:
+            client = pool.client(str(connector.make_url("")).rstrip("/"), credentials)
+            response = await client.conversations.send_to_conversation(
+                "conversation", Activity(type=ActivityTypes.message, text="Hi")
+            )
+            assert response.id == "reply"
+            assert authorizations == [f"Bearer {jwt(1, 4600.0)}", f"Bearer {jwt(2, 4600.0)}"]
+        finally:
+            await pool.close()
+            await connector.close()
+
+    async def test_attachments_stream_and_forms_are_multipart(self):
+        received = {}
+
+        async def get_attachment(req):
+            return web.Response(body=b"x" * 25000, content_type="application/octet-stream")
+
+        async def upload(req):
+            form = await req.post()
+            received["note"] = form["note"]
+            received["file"] = (form["file"].filename, form["file"].file.read())
+            return web.json_response({"id": "uploaded"})
+
+        app = web.Application()
+        app.router.add_get("/v3/attachments/{attachment_id}/views/{view_id}", get_attachment)
+        app.router.add_post("/upload", upload)
+        connector = TestServer(app)
+        await connector.start_server()
+        pool = ConnectorClientPool()
+        try:
+            client = pool.client(str(connector.make_url("")).rstrip("/"), MicrosoftAppCredentials("", ""))
+            chunks = [chunk async for chunk in await client.attachments.get_attachment("attachment", "original")]
+            assert b"".join(chunks) == b"x" * 25000 and len(chunks) > 1
+
+            service_client = client._client  # pylint: disable=protected-access
+            request = service_client.post("/upload")
+            upload_file = io.BytesIO(b"ticket")
+            upload_file.name = "ticket.txt"
+            request.add_formdata({"note": "booked", "file": upload_file})
+            response = await service_client.async_send(request, stream=False)
+            assert response.status_code == 200
+            assert received == {"note": "booked", "file": ("ticket.txt", b"ticket")}
+            assert pool.stats["requests"] == 2
+        finally:
+            await pool.close()
+            await connector.close()
+
+if aiounittest.AsyncTestCase == '__main__':
+    aiounittest.main()
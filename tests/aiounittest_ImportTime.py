@@ -0,0 +1,70 @@
+import os
+import subprocess
+import sys
+
+import aiounittest   # The test framework
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+
+# `import app` took about 1.3 s when it built the bot at import; it now takes
+# about 0.3 s. The budget leaves room for slower machines but not for that.
+IMPORT_BUDGET_SECONDS = float(os.environ.get("ImportBudgetSeconds", 0.8))
+
+# Optional subsystems that must not be loaded when they are not configured.
+OPTIONAL_MODULES = [
+    "botbuilder.applicationinsights", "botbuilder.ai.luis", "dateutil.parser", "word2number", "sampling_profiler",
+]
+
+
+def run(code: str, *options: str) -> subprocess.CompletedProcess:
+    env = {
+        **os.environ,
+        "AppInsightsInstrumentationKey": "",
+        "LuisAppId": "",
+        "StateStorage": "memory",
+        "AdminToken": "",
+    }
+    return subprocess.run(
+        [sys.executable, *options, "-c", code],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=120,
+        check=True,
+    )
+
+
+def import_times(stderr: str) -> dict:
+    """Cumulative microseconds per module from `-X importtime` output."""
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+class Test_import_time(aiounittest.AsyncTestCase):
+
+    def test_importing_app_stays_within_budget(self):
+        times = import_times(run("import app", "-X", "importtime").stderr)
+        assert "app" in times
+        assert times["app"] / 1e6 < IMPORT_BUDGET_SECONDS, (
+            f"import app took {times['app'] / 1e6:.2f} s (budget {IMPORT_BUDGET_SECONDS} s); slowest: "
+            + ", ".join(f"{name} {us / 1e3:.0f} ms" for name, us in sorted(times.items(), key=lambda item: -item[1])[1:6])
+        )
+        # The bot is built by init_func, so the import does not need the SDK at all.
+        assert not [name for name in times if name.startswith("botbuilder")]
+
+    def test_unconfigured_subsystems_are_not_imported(self):
+        loaded = run(
+            "import sys, app\n"
+            "app.init_func(None)\n"
+            f"print([name for name in {OPTIONAL_MODULES!r} if name in sys.modules])"
+        ).stdout
+        assert loaded.strip() == "[]", loaded
+
+if aiounittest.AsyncTestCase == '__main__':
+    aiounittest.main()
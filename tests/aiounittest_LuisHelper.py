@@ -0,0 +1,69 @@
+import aiounittest   # The test framework
+
+from botbuilder.core import IntentScore, RecognizerResult
+
+from booking_details import BookingDetails
+from helpers.luis_helper import LuisHelper
+
+
+def booking_result(**texts):
+    return RecognizerResult(
+        text="",
+        intents={"book": IntentScore(0.9)},
+        entities={
+            "$instance": {
+                entity: [{"text": text, "startIndex": 0, "endIndex": len(text)}]
+                for entity, text in texts.items()
+            }
+        },
+    )
+
+
+class Test_luis_helper(aiounittest.AsyncTestCase):
+
+    def test_maps_entities_onto_booking_details(self):
+        details = LuisHelper.booking_details(
+            booking_result(
+                dst_city="berlin",
+                or_city="paris",
+                str_date="march 3 2031",
+                end_date="march 10 2031",
+                n_adults="two adults",
+                n_children="1 child",
+                budget="500",
+            )
+        )
+        assert details == BookingDetails(
+            destination="Berlin",
+            origin="Paris",
+            travel_start_date="2031-03-03",
+            travel_end_date="2031-03-10",
+            n_passengers=3,
+            budget="500",
+            unsupported_airports=[],
+        )
+
+    def test_return_date_from_duration(self):
+        details = LuisHelper.booking_details(
+            booking_result(dst_city="london", str_date="june 2 2031", max_duration="for 5 days")
+        )
+        assert details.travel_end_date == "2031-06-07"
+
+        details = LuisHelper.booking_details(
+            booking_result(str_date="june 2 2031", end_date="june 4 2031", max_duration="5 days")
+        )
+        assert details.travel_end_date == "2031-06-04"
+
+    def test_unparsable_entity_leaves_its_slot_empty(self):
+        details = LuisHelper.booking_details(
+            booking_result(dst_city="paris", str_date="whenever", budget="300")
+        )
+        assert details.travel_start_date is None
+        assert details.destination == "Paris" and details.budget == "300"
+
+    def test_ignores_unknown_entities(self):
+        details = LuisHelper.booking_details(booking_result(airline="klm"))
+        assert details == LuisHelper.booking_details(booking_result())
+
+if aiounittest.AsyncTestCase == '__main__':
+    aiounittest.main()
@@ -0,0 +1,86 @@
+import asyncio
+import random
+
+import aiounittest   # The test framework
+
+from botbuilder.core import ConversationState, MemoryStorage, NullTelemetryClient, UserState
+from botbuilder.core.adapters import TestAdapter
+from botbuilder.schema import Activity, ActivityTypes, ChannelAccount, ConversationAccount
+
+from bots import DialogAndWelcomeBot
+from config import DefaultConfig
+from dialogs import BookingDialog, MainDialog
+from flight_booking_recognizer import FlightBookingRecognizer
+
+CONVERSATIONS = 200
+CITIES = ["Paris", "London", "Berlin", "New york"]
+
+
+class InterleavingRecognizer(FlightBookingRecognizer):
+    """Yields to the event loop so concurrent turns interleave inside luis_step."""
+
+    async def recognize(self, turn_context, bypass_cache=False):
+        await asyncio.sleep(random.random() / 1000)
+        return await super().recognize(turn_context, bypass_cache)
+
+
+def booking(index):
+    origin = CITIES[index % 4]
+    destination = CITIES[(index + 1 + index // 4 % 3) % 4]
+    passengers = 1 + index % 7
+    return origin, destination, passengers
+
+
+class Test_main_dialog_concurrency(aiounittest.AsyncTestCase):
+
+    async def test_interleaved_conversations_keep_their_own_luis_result(self):
+        telemetry = NullTelemetryClient()
+        storage = MemoryStorage()
+        conversation_state = ConversationState(storage)
+        dialog = MainDialog(
+            InterleavingRecognizer(DefaultConfig()), BookingDialog(), telemetry
+        )
+        bot = DialogAndWelcomeBot(conversation_state, UserState(storage), dialog, telemetry)
+        adapter = TestAdapter(bot.on_turn)
+
+        async def say(index, text):
+            await asyncio.sleep(random.random() / 1000)
+            await adapter.receive_activity(
+                Activity(
+                    type=ActivityTypes.message,
+                    text=text,
+                    from_property=ChannelAccount(id=f"user-{index}"),
+                    conversation=ConversationAccount(id=f"conversation-{index}"),
+                )
+            )
+
+        async def converse(index):
+            origin, destination, passengers = booking(index)
+            await say(index, "hi")
+            await say(
+                index,
+                f"book flight from {origin.lower()} to {destination.lower()} "
+                f"on feb {1 + index % 20} 2031 for {passengers} adults with a budget of {100 + index}",
+            )
+            await say(index, "yes")
+            await say(index, "march 30 2031")
+            await say(index, "yes")
+
+        await asyncio.gather(*(converse(index) for index in range(CONVERSATIONS)))
+
+        confirmations = {}
+        for reply in adapter.activity_buffer:
+            if reply.text and reply.text.startswith("I have you booked"):
+                confirmations[reply.conversation.id] = reply.text
+        assert len(confirmations) == CONVERSATIONS
+
+        for index in range(CONVERSATIONS):
+            origin, destination, passengers = booking(index)
+            assert confirmations[f"conversation-{index}"] == (
+                f"I have you booked to {destination} from {origin} "
+                f"on 2031-02-{1 + index % 20:02d} and back on 2031-03-30"
+                f" for {passengers} people, with a budget of {100 + index}$."
+            )
+
+if aiounittest.AsyncTestCase == '__main__':
+    aiounittest.main()
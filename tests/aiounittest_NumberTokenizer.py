@@ -0,0 +1,45 @@
+import json
+import os
+
+import aiounittest   # The test framework
+
+from helpers.luis_helper import int_extraction
+from helpers.number_tokenizer import NumberMatch, NumberTokenizer
+
+CORPUS = os.path.join(os.path.dirname(__file__), os.pardir, "benchmarks", "number_corpus.json")
+
+
+class Test_number_tokenizer(aiounittest.AsyncTestCase):
+
+    def test_totals_match_the_corpus(self):
+        numbers = NumberTokenizer()
+        with open(CORPUS, encoding="utf-8") as corpus_file:
+            for case in json.load(corpus_file):
+                assert numbers.total(case["text"]) == case["expected"], case["text"]
+                assert int_extraction(case["text"]) == case["expected"], case["text"]
+
+    def test_returns_values_with_spans_of_the_original_text(self):
+        text = "Me, my Wife and Twenty-Two friends; a couple of kids and 1,200 bags"
+        assert NumberTokenizer().tokenize(text) == [
+            NumberMatch(1, 0, 2, "Me"),
+            NumberMatch(1, 4, 11, "my Wife"),
+            NumberMatch(22, 16, 26, "Twenty-Two"),
+            NumberMatch(2, 36, 44, "a couple"),
+            NumberMatch(1200, 57, 62, "1,200"),
+        ]
+
+    def test_separate_numbers_are_not_joined(self):
+        numbers = NumberTokenizer()
+        assert [match.value for match in numbers.tokenize("two twenty")] == [2, 20]
+        assert [match.value for match in numbers.tokenize("five 5")] == [5, 5]
+        assert [match.value for match in numbers.tokenize("my two kids")] == [2]
+        assert [match.value for match in numbers.tokenize("a week and my kids")] == []
+
+    def test_batches_read_repeated_texts_once(self):
+        numbers = NumberTokenizer()
+        batch = numbers.tokenize_many(["2 adults", "me and my wife", "2 adults"])
+        assert [[match.value for match in matches] for matches in batch] == [[2], [1, 1], [2]]
+        assert batch[0] is batch[2]
+
+if aiounittest.AsyncTestCase == '__main__':
+    aiounittest.main()
@@ -0,0 +1,82 @@
+import aiounittest   # The test framework
+
+from botbuilder.core import TurnContext
+from botbuilder.core.adapters import TestAdapter
+from botbuilder.schema import Activity, ActivityTypes
+
+from config import DefaultConfig
+from flight_booking_recognizer import FlightBookingRecognizer
+from helpers.luis_helper import LuisHelper, Intent
+from offline_recognizer import OfflineRecognizer
+
+
+def turn(text):
+    return TurnContext(
+        TestAdapter(), Activity(type=ActivityTypes.message, text=text, locale="en-US")
+    )
+
+
+class FailingLuis:
+    def __init__(self):
+        self.calls = 0
+
+    async def recognize(self, turn_context: TurnContext):
+        self.calls += 1
+        raise ConnectionError("LUIS is unreachable")
+
+
+class Test_offline_recognizer(aiounittest.AsyncTestCase):
+
+    def test_instance_data_matches_luis_shape(self):
+        result = OfflineRecognizer().recognize_text(
+            "Book a flight from Paris to New York on feb 14th 2031 for 2 adults with a budget of 800"
+        )
+        instance = result.entities["$instance"]
+        assert instance["or_city"][0]["text"] == "paris"
+        assert instance["dst_city"][0]["text"] == "new york"
+        assert instance["dst_city"][0]["startIndex"] == 28
+        assert instance["dst_city"][0]["endIndex"] == 36
+        assert instance["str_date"][0]["text"] == "feb 14th 2031"
+        assert instance["n_adults"][0]["text"] == "2 adults"
+        assert instance["budget"][0]["text"] == "800"
+
+    def test_confidence_requires_known_words(self):
+        recognizer = OfflineRecognizer()
+        assert recognizer.is_confident(recognizer.recognize_text("flight to paris from london"))
+        assert not recognizer.is_confident(recognizer.recognize_text("fly to tokyo"))
+        assert not recognizer.is_confident(recognizer.recognize_text("yes"))
+
+    def test_cities_do_not_make_a_booking(self):
+        recognizer = OfflineRecognizer()
+        result = recognizer.recognize_text("cancel my flight to paris")
+        assert result.intents["Cancel"].score > 0
+        assert not recognizer.is_confident(result)
+        assert recognizer.is_confident(recognizer.recognize_text("cancel"))
+
+    async def test_luis_helper_reads_offline_result(self):
+        recognizer = FlightBookingRecognizer(DefaultConfig())
+        # Without LUIS settings only the offline recognizer answers.
+        assert recognizer.can_recognize and not recognizer.is_configured
+        intent, details = await LuisHelper.execute_luis_query(
+            recognizer, turn("book flight from london to paris for 3 adults")
+        )
+        assert intent == Intent.BOOK_FLIGHT.value
+        assert details.origin == "London"
+        assert details.destination == "Paris"
+        assert details.n_passengers == 3
+
+    async def test_confident_results_skip_luis(self):
+        recognizer = FlightBookingRecognizer(DefaultConfig())
+        recognizer._recognizer = FailingLuis()  # pylint: disable=protected-access
+        await recognizer.recognize(turn("go to berlin"))
+        assert recognizer._recognizer.calls == 0  # pylint: disable=protected-access
+
+    async def test_falls_back_when_luis_fails(self):
+        recognizer = FlightBookingRecognizer(DefaultConfig())
+        recognizer._recognizer = FailingLuis()  # pylint: disable=protected-access
+        result = await recognizer.recognize(turn("fly to tokyo from paris"))
+        assert recognizer._recognizer.calls == 1  # pylint: disable=protected-access
+        assert result.entities["$instance"]["or_city"][0]["text"] == "paris"
+
+if aiounittest.AsyncTestCase == '__main__':
+    aiounittest.main()
@@ -0,0 +1,115 @@
+import aiounittest   # The test framework
+
+from botbuilder.core import IntentScore, RecognizerResult, TurnContext
+from botbuilder.core.adapters import TestAdapter
+from botbuilder.schema import Activity, ActivityTypes
+
+from config import DefaultConfig
+from flight_booking_recognizer import FlightBookingRecognizer
+from helpers.recognition_cache import RecognitionCache
+
+
+def luis_result(text):
+    return RecognizerResult(
+        text=text,
+        intents={"book": IntentScore(0.9)},
+        entities={"$instance": {"dst_city": [{"text": "paris", "startIndex": 0}]}},
+    )
+
+
+class CacheOnlyConfig(DefaultConfig):
+    OFFLINE_RECOGNIZER_ENABLED = False
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class CountingRecognizer:
+    def __init__(self):
+        self.calls = 0
+        self.logged = []
+
+    async def recognize(self, turn_context: TurnContext):
+        self.calls += 1
+        return luis_result(turn_context.activity.text)
+
+    def on_recognizer_result(self, recognizer_result, turn_context, telemetry_properties=None):
+        self.logged.append(telemetry_properties)
+
+
+class Test_recognition_cache(aiounittest.AsyncTestCase):
+
+    def test_keys_on_the_exact_text(self):
+        cache = RecognitionCache()
+        cache.put("Book  a Flight ", "en-US", luis_result("Book  a Flight "))
+        assert cache.get("Book  a Flight ", "en-us").text == "Book  a Flight "
+        # Other spellings have other entity offsets.
+        assert cache.get("book a flight", "en-us") is None
+        assert cache.get("Book  a Flight ", "fr-fr") is None
+        assert cache.hits == 1 and cache.misses == 2
+
+    def test_keeps_intent_properties(self):
+        cache = RecognitionCache()
+        original = luis_result("paris")
+        original.intents["book"].properties = {"childApp": "flights"}
+        cache.put("paris", None, original)
+        assert cache.get("paris").intents["book"].properties == {"childApp": "flights"}
+
+    def test_evicts_least_recently_used(self):
+        cache = RecognitionCache(max_size=2)
+        cache.put("paris", None, luis_result("paris"))
+        cache.put("london", None, luis_result("london"))
+        cache.get("paris")
+        cache.put("berlin", None, luis_result("berlin"))
+        assert cache.get("london") is None
+        assert cache.get("paris") is not None
+        assert cache.evictions == 1
+
+    def test_expires_after_ttl(self):
+        clock = FakeClock()
+        cache = RecognitionCache(ttl_seconds=10, clock=clock)
+        cache.put("yes", None, luis_result("yes"))
+        clock.now = 9.9
+        assert cache.get("yes") is not None
+        clock.now = 10.0
+        assert cache.get("yes") is None
+        assert cache.expirations == 1 and len(cache) == 0
+
+    def test_hits_are_independent_copies(self):
+        cache = RecognitionCache()
+        original = luis_result("paris")
+        cache.put("paris", None, original)
+        original.entities["$instance"]["dst_city"][0]["text"] = "changed"
+
+        first = cache.get("paris")
+        first.entities["$instance"]["dst_city"].clear()
+        first.intents["book"].score = 0
+
+        second = cache.get("paris")
+        assert second.entities["$instance"]["dst_city"][0]["text"] == "paris"
+        assert second.intents["book"].score == 0.9
+
+    async def test_recognizer_uses_cache_unless_bypassed(self):
+        recognizer = FlightBookingRecognizer(CacheOnlyConfig())
+        recognizer._recognizer = CountingRecognizer()  # pylint: disable=protected-access
+        context = TurnContext(
+            TestAdapter(), Activity(type=ActivityTypes.message, text="Paris", locale="en-US")
+        )
+
+        await recognizer.recognize(context)
+        result = await recognizer.recognize(context)
+        assert result.text == "Paris"
+        assert recognizer._recognizer.calls == 1  # pylint: disable=protected-access
+        # The hit is still logged, as a cache hit.
+        assert recognizer._recognizer.logged == [{"cacheHit": "true"}]  # pylint: disable=protected-access
+
+        await recognizer.recognize(context, bypass_cache=True)
+        assert recognizer._recognizer.calls == 2  # pylint: disable=protected-access
+
+if aiounittest.AsyncTestCase == '__main__':
+    aiounittest.main()
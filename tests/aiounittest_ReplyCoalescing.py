@@ -0,0 +1,197 @@
+import aiounittest   # The test framework
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from botbuilder.core import BotFrameworkAdapterSettings, ConversationState, MemoryStorage, MessageFactory
+from botbuilder.schema import (
+    Activity,
+    ActivityTypes,
+    Attachment,
+    CardAction,
+    ChannelAccount,
+    ConversationAccount,
+    ExpectedReplies,
+    InputHints,
+    SuggestedActions,
+)
+from botframework.connector.auth import ClaimsIdentity
+
+from adapter_with_error_handler import AdapterWithErrorHandler
+from benchmarks import connector_stand_in
+from helpers.reply_coalescing import coalesce_replies
+
+
+def message(text, **fields):
+    fields.setdefault("reply_to_id", "1")
+    return Activity(type=ActivityTypes.message, text=text, conversation=ConversationAccount(id="c"), **fields)
+
+
+class Test_reply_coalescing(aiounittest.AsyncTestCase):
+
+    def test_text_is_merged_into_the_next_message(self):
+        prompt = message(
+            "Is this correct?",
+            input_hint=InputHints.expecting_input,
+            suggested_actions=SuggestedActions(actions=[CardAction(type="imBack", title="Yes", value="Yes")]),
+        )
+        card = message(None, attachments=[Attachment(content_type="application/vnd.microsoft.card.adaptive")])
+        trace = Activity(type=ActivityTypes.trace, name="LuisRecognizer")
+
+        replies = coalesce_replies(
+            [message("I have you booked.", speak="Booked."), prompt, card, message("Welcome!"), trace, message("Hi")]
+        )
+
+        assert [reply.text for reply in replies] == ["I have you booked.\n\nIs this correct?", None, "Welcome!", None, "Hi"]
+        assert replies[0].speak == "Booked. Is this correct?"
+        assert replies[0].input_hint == InputHints.expecting_input
+        assert replies[0].suggested_actions is prompt.suggested_actions
+        assert prompt.text == "Is this correct?"
+        assert replies[1] is card and replies[3] is trace
+
+        other_reply = message("Later", reply_to_id="2")
+        assert len(coalesce_replies([message("Now"), other_reply])) == 2
+        assert len(coalesce_replies([message("Now", text_format="xml"), message("Later")])) == 2
+
+
+class Test_adapter_with_error_handler(aiounittest.AsyncTestCase):
+
+    async def run_turn(self, adapter, service_url, logic, **fields):
+        activity = Activity(
+            type=ActivityTypes.message,
+            id="1",
+            text="yes",
+            channel_id="webchat",
+            service_url=service_url,
+            from_property=ChannelAccount(id="user"),
+            recipient=ChannelAccount(id="bot"),
+            conversation=ConversationAccount(id="conversation"),
+            **fields,
+        )
+        return await adapter.process_activity_with_identity(activity, ClaimsIdentity({}, True), logic)
+
+    async def test_a_turn_posts_its_replies_once_it_ends(self):
+        connector = TestServer(connector_stand_in.create_app())
+        await connector.start_server()
+        service_url = str(connector.make_url("")).rstrip("/")
+        posted = connector.app["stats"]
+        posted_during_turn = []
+
+        async def logic(context):
+            await context.send_activity(MessageFactory.text("I have you booked.", input_hint=InputHints.ignoring_input))
+            await context.send_trace_activity("Trace", "value")
+            await context.send_activity(MessageFactory.text("Would you like to book another flight?"))
+            posted_during_turn.append(posted["activities"])
+
+        conversation_state = ConversationState(MemoryStorage())
+
+        async def failing_logic(context):
+            await conversation_state.load(context)
+            await context.send_activity("Working on it")
+            raise ValueError("Failed")
+
+        try:
+            for coalesce, calls in ((False, 2), (True, 1)):
+                adapter = AdapterWithErrorHandler(
+                    BotFrameworkAdapterSettings("", ""), conversation_state, coalesce_replies=coalesce
+                )
+                posted["activities"] = 0
+                await self.run_turn(adapter, service_url, logic)
+                assert posted["activities"] == calls
+                assert posted_during_turn.pop() == (0 if coalesce else 2)
+                assert adapter.stats == {"turns": 1, "activities": 3, "connector_calls": calls}
+
+            # The replies sent before an error and those of on_turn_error go out together.
+            posted["activities"] = 0
+            await self.run_turn(adapter, service_url, failing_logic)
+            assert posted["activities"] == 1
+        finally:
+            await connector.close()
+
+    async def test_a_failed_delivery_goes_to_on_turn_error(self):
+        posted = []
+
+        async def post_activity(req):
+            text = (await req.json())["text"]
+            posted.append(text)
+            if text == "I have you booked.":
+                return web.Response(status=500)
+            return web.json_response({"id": "reply"})
+
+        app = web.Application()
+        app.router.add_post("/v3/conversations/{conversation_id}/activities", post_activity)
+        app.router.add_post("/v3/conversations/{conversation_id}/activities/{activity_id}", post_activity)
+        connector = TestServer(app)
+        await connector.start_server()
+        conversation_state = ConversationState(MemoryStorage())
+        adapter = AdapterWithErrorHandler(
+            BotFrameworkAdapterSettings("", ""), conversation_state, coalesce_replies=True
+        )
+
+        async def logic(context):
+            await conversation_state.load(context)
+            await context.send_activity("I have you booked.")
+
+        try:
+            response = await self.run_turn(adapter, str(connector.make_url("")).rstrip("/"), logic)
+            assert response is None
+            assert posted == [
+                "I have you booked.",
+                "The bot encountered an error or bug.\n\nTo continue to run this bot, please fix the bot source code.",
+            ]
+        finally:
+            await connector.close()
+
+    async def test_expected_replies_are_merged_in_the_response(self):
+        adapter = AdapterWithErrorHandler(
+            BotFrameworkAdapterSettings("", ""), ConversationState(MemoryStorage()), coalesce_replies=True
+        )
+
+        async def logic(context):
+            await context.send_activity("I have you booked.")
+            await context.send_trace_activity("Trace", "value")
+            await context.send_activity(MessageFactory.text("Would you like to book another flight?"))
+
+        response = await self.run_turn(adapter, "https://unused.example", logic, delivery_mode="expectReplies")
+
+        assert response.status == 200
+        replies = ExpectedReplies().deserialize(response.body).activities
+        assert [reply.text for reply in replies] == ["I have you booked.\n\nWould you like to book another flight?"]
+        assert adapter.stats == {"turns": 1, "activities": 3, "connector_calls": 0}
+
+    async def test_buffered_replies_get_the_ids_the_channel_assigns(self):
+        updated = []
+
+        async def post_activity(req):
+            return web.json_response({"id": f"channel-{(await req.json())['text']}"})
+
+        async def put_activity(req):
+            updated.append((req.match_info["activity_id"], (await req.json())["text"]))
+            return web.json_response({"id": req.match_info["activity_id"]})
+
+        app = web.Application()
+        app.router.add_post("/v3/conversations/{conversation_id}/activities", post_activity)
+        app.router.add_put("/v3/conversations/{conversation_id}/activities/{activity_id}", put_activity)
+        connector = TestServer(app)
+        await connector.start_server()
+        adapter = AdapterWithErrorHandler(
+            BotFrameworkAdapterSettings("", ""), ConversationState(MemoryStorage()), coalesce_replies=True
+        )
+        responses = []
+
+        async def logic(context):
+            responses.append(await context.send_activity("Searching"))
+            responses.append(await context.send_activity(MessageFactory.attachment(Attachment(content_type="card"))))
+            update = MessageFactory.text("Found it")
+            update.id = responses[0].id
+            await context.update_activity(update)
+
+        try:
+            await self.run_turn(adapter, str(connector.make_url("")).rstrip("/"), logic)
+            # The text was merged into the card, which the update then replaced.
+            assert [response.id for response in responses] == ["channel-Searching", "channel-Searching"]
+            assert updated == [("channel-Searching", "Found it")]
+        finally:
+            await connector.close()
+
+if aiounittest.AsyncTestCase == '__main__':
+    aiounittest.main()
@@ -0,0 +1,82 @@
+import asyncio
+import threading
+import time
+
+import aiounittest   # The test framework
+
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+
+from sampling_profiler import ProfilerRoute, SamplingProfiler
+
+
+def spin_until(stop: threading.Event):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+async def wait_for_reply():
+    await asyncio.sleep(10)
+
+
+class Test_sampling_profiler(aiounittest.AsyncTestCase):
+
+    async def test_samples_threads_and_tasks(self):
+        loop = asyncio.get_event_loop()
+        stop = threading.Event()
+        worker = threading.Thread(target=spin_until, args=(stop,), name="busy worker")
+        worker.start()
+        waiting = asyncio.ensure_future(wait_for_reply())
+        await asyncio.sleep(0)
+        try:
+            profiler = SamplingProfiler(loop, threading.get_ident(), interval_seconds=0.002)
+            profile = await loop.run_in_executor(None, profiler.run, 0.1)
+        finally:
+            stop.set()
+            worker.join()
+            waiting.cancel()
+
+        assert profile["samples"] >= 10
+        assert profile["threads"]["busy_worker"] == profile["samples"]
+        busy = [line for line in profile["collapsed"].splitlines() if line.startswith("busy_worker;")]
+        assert busy and all("spin_until (" in line and "aiounittest_SamplingProfiler.py:" in line for line in busy)
+        assert sum(int(line.rsplit(" ", 1)[1]) for line in busy) == profile["samples"]
+        task = next(task for task in profile["tasks"] if task["coroutine"] == "wait_for_reply")
+        assert task["wall_seconds"] > 0.05 and not task["done"]
+        assert task["awaiting"].startswith("sleep (asyncio/tasks.py")
+
+    async def test_route_is_authenticated_and_runs_one_profile_at_a_time(self):
+        app = web.Application()
+        ProfilerRoute("secret", max_seconds=1).install(app)
+
+        async def ping(req):  # pylint: disable=unused-argument
+            return web.Response(text="pong")
+
+        app.router.add_get("/ping", ping)
+        client = TestClient(TestServer(app))
+        await client.start_server()
+        try:
+            auth = {"Authorization": "Bearer secret"}
+            assert (await client.post("/admin/profile?seconds=0.05")).status == 401
+            assert (await client.post("/admin/profile?seconds=0.05", headers={"Authorization": "Bearer guess"})).status == 401
+            assert (await client.post("/admin/profile?seconds=5", headers=auth)).status == 400
+            assert (await client.post("/admin/profile?interval_ms=x", headers=auth)).status == 400
+
+            running = asyncio.ensure_future(client.post("/admin/profile?seconds=0.3&interval_ms=5", headers=auth))
+            await asyncio.sleep(0.1)
+            assert (await client.post("/admin/profile?seconds=0.05", headers=auth)).status == 409
+            # The event loop keeps serving while it is sampled.
+            started = time.perf_counter()
+            assert await (await client.get("/ping")).text() == "pong"
+            assert time.perf_counter() - started < 0.1
+            profile = await (await running).json()
+            assert profile["samples"] > 0 and "event-loop" in profile["threads"]
+
+            collapsed = await client.post("/admin/profile?seconds=0.05&format=collapsed", headers=auth)
+            assert collapsed.status == 200 and collapsed.content_type == "text/plain"
+            assert (await collapsed.text()).startswith(("event-loop;", "MainThread;"))
+        finally:
+            await client.close()
+
+if aiounittest.AsyncTestCase == '__main__':
+    aiounittest.main()
@@ -0,0 +1,145 @@
+import asyncio
+import os
+import shutil
+import tempfile
+
+import aiounittest   # The test framework
+import jsonpickle
+
+from botbuilder.core import ConversationState, TurnContext
+from botbuilder.core.adapters import TestAdapter
+from botbuilder.dialogs import DialogInstance, DialogState
+from botbuilder.schema import Activity, ActivityTypes, ChannelAccount, ConversationAccount
+
+from booking_details import BookingDetails
+from sqlite_storage import SqliteStorage
+
+
+class Test_sqlite_storage(aiounittest.AsyncTestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "bot_state.db")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    async def test_state_survives_a_restart(self):
+        storage = SqliteStorage(self.path)
+        details = BookingDetails(destination="Paris", origin="London")
+        await storage.write(
+            {"conversation": {"DialogState": DialogState([DialogInstance(id="MainDialog", state={"options": details})])}}
+        )
+        await storage.close()
+
+        reopened = SqliteStorage(self.path)
+        item = (await reopened.read(["conversation", "unknown"]))["conversation"]
+        options = item["DialogState"].dialog_stack[0].state["options"]
+        assert isinstance(options, BookingDetails) and options.destination == "Paris"
+        await reopened.close()
+
+    async def test_reads_rows_written_as_jsonpickle(self):
+        storage = SqliteStorage(self.path)
+        document = jsonpickle.encode({"DialogState": DialogState(), "count": 3}, keys=True)
+        storage._write_connection.execute(  # pylint: disable=protected-access
+            "INSERT INTO state (key, e_tag, document) VALUES (?, ?, ?)", ("conversation", "1", document)
+        )
+        item = (await storage.read(["conversation"]))["conversation"]
+        assert item["count"] == 3 and item["e_tag"] == "1"
+        assert isinstance(item["DialogState"], DialogState)
+        await storage.close()
+
+    async def test_reads_are_independent_copies(self):
+        storage = SqliteStorage(self.path)
+        await storage.write({"conversation": {"values": [1]}})
+        first = (await storage.read(["conversation"]))["conversation"]
+        first["values"].append(2)
+        second = (await storage.read(["conversation"]))["conversation"]
+        assert second["values"] == [1]
+        assert storage.cache_hits == 2
+        await storage.close()
+
+    async def test_stale_etag_raises(self):
+        storage = SqliteStorage(self.path)
+        await storage.write({"conversation": {"count": 1}})
+        first = (await storage.read(["conversation"]))["conversation"]
+        second = (await storage.read(["conversation"]))["conversation"]
+
+        first["count"] = 2
+        await storage.write({"conversation": first})
+        second["count"] = 3
+        with self.assertRaises(KeyError):
+            await storage.write({"conversation": second})
+
+        second["e_tag"] = "*"
+        await storage.write({"conversation": second})
+        assert (await storage.read(["conversation"]))["conversation"]["count"] == 3
+        await storage.close()
+
+    async def test_concurrent_writes_share_a_transaction(self):
+        storage = SqliteStorage(self.path, read_cache_size=0)
+        await storage.write({"conversation-0": {"count": 0}})
+        stale = (await storage.read(["conversation-0"]))["conversation-0"]
+        await storage.write({"conversation-0": {"count": 1, "e_tag": "*"}})
+        transactions = storage.transactions
+
+        results = await asyncio.gather(
+            storage.write({"conversation-0": stale}),
+            *(storage.write({f"conversation-{index}": {"count": index}}) for index in range(1, 100)),
+            return_exceptions=True,
+        )
+        assert isinstance(results[0], KeyError)
+        assert all(result is None for result in results[1:])
+        assert storage.transactions - transactions <= 2
+
+        items = await storage.read([f"conversation-{index}" for index in range(100)])
+        assert [items[f"conversation-{index}"]["count"] for index in range(100)] == [1] + list(range(1, 100))
+        await storage.close()
+
+    async def test_a_cancelled_conflicting_write_does_not_stall_the_batch(self):
+        storage = SqliteStorage(self.path)
+        await storage.write({"conversation": {"count": 1}})
+        stale = (await storage.read(["conversation"]))["conversation"]
+        await storage.write({"conversation": {"count": 2, "e_tag": "*"}})
+
+        conflicting = asyncio.ensure_future(storage.write({"conversation": stale}))
+        other = asyncio.ensure_future(storage.write({"other": {"count": 1}}))
+        await asyncio.sleep(0)
+        conflicting.cancel()
+
+        await asyncio.wait_for(other, 5)
+        assert "conversation" not in storage._cache  # pylint: disable=protected-access
+        assert (await storage.read(["conversation"]))["conversation"]["count"] == 2
+        await asyncio.wait_for(storage.close(), 5)
+
+    async def test_delete_removes_cached_items(self):
+        storage = SqliteStorage(self.path)
+        await storage.write({"conversation": {"count": 1}})
+        await storage.delete(["conversation"])
+        assert await storage.read(["conversation"]) == {}
+        await storage.close()
+
+    async def test_conversation_state_round_trip(self):
+        storage = SqliteStorage(self.path)
+        conversation_state = ConversationState(storage)
+        accessor = conversation_state.create_property("DialogState")
+        activity = Activity(
+            type=ActivityTypes.message,
+            channel_id="test",
+            conversation=ConversationAccount(id="convo"),
+            from_property=ChannelAccount(id="user"),
+        )
+
+        for turn in range(3):
+            context = TurnContext(TestAdapter(), activity)
+            await conversation_state.load(context)
+            state = await accessor.get(context, DialogState)
+            assert len(state.dialog_stack) == turn
+            state.dialog_stack.append(DialogInstance(id=f"dialog-{turn}"))
+            await conversation_state.save_changes(context)
+            # A second save in the same turn carries the new etag.
+            await conversation_state.save_changes(context, force=True)
+        await storage.close()
+
+if aiounittest.AsyncTestCase == '__main__':
+    aiounittest.main()
@@ -0,0 +1,111 @@
+import json
+from datetime import datetime
+from decimal import Decimal
+
+import aiounittest   # The test framework
+import jsonpickle
+
+from botbuilder.core import MessageFactory
+from botbuilder.dialogs import DialogInstance, DialogState
+from botbuilder.dialogs.prompts import PromptOptions
+from botbuilder.schema import ActivityTypes, InputHints
+
+from booking_details import BookingDetails
+from helpers.state_codec import StateCodec
+
+
+def booking_state():
+    details = BookingDetails(destination="Paris", origin="London", n_passengers=Decimal("2"))
+    prompt = PromptOptions(
+        prompt=MessageFactory.text("When?", input_hint=InputHints.expecting_input),
+        retry_prompt=MessageFactory.text("Sorry, when?"),
+    )
+    booking = DialogState(
+        [
+            DialogInstance("DateResolverDialog", {"options": prompt, "state": {}}),
+            DialogInstance("WaterfallDialog", {"options": details, "values": {}, "stepIndex": 2}),
+        ]
+    )
+    main = DialogState(
+        [
+            DialogInstance("BookingDialog", {"dialogs": booking}),
+            DialogInstance("WFDialog", {"options": None, "values": {"luis_result": details}}),
+        ]
+    )
+    return {"DialogState": main, "e_tag": "*"}
+
+
+class Note:
+    def __init__(self, text):
+        self.text = text
+
+
+class Test_state_codec(aiounittest.AsyncTestCase):
+
+    def test_round_trip_of_a_booking_state(self):
+        for compression in ("none", "zlib"):
+            codec = StateCodec(compression)
+            item = codec.decode(codec.encode(booking_state()))
+
+            booking_dialog, main_waterfall = item["DialogState"].dialog_stack
+            prompt_instance, booking_waterfall = booking_dialog.state["dialogs"].dialog_stack
+            details = booking_waterfall.state["options"]
+            assert details == BookingDetails(destination="Paris", origin="London", n_passengers=Decimal("2"))
+            # Both dialogs keep sharing one BookingDetails, as with jsonpickle.
+            assert main_waterfall.state["values"]["luis_result"] is details
+            prompt = prompt_instance.state["options"]
+            assert prompt.prompt.type == ActivityTypes.message and prompt.prompt.text == "When?"
+            assert prompt.prompt.input_hint == InputHints.expecting_input
+            assert prompt.retry_prompt.text == "Sorry, when?" and prompt.number_of_attempts == 0
+            assert booking_waterfall.state["stepIndex"] == 2 and item["e_tag"] == "*"
+
+    def test_containers_and_unknown_objects(self):
+        codec = StateCodec()
+        item = {
+            "tuple": (1, "a"),
+            "numbers": {1: "one", (2, 3): ["two", "three"]},
+            "empty": [],
+            "when": datetime(2031, 3, 3, 12, 30),
+        }
+        assert codec.decode(codec.encode(item)) == item
+
+    def test_is_smaller_than_jsonpickle_and_reads_it(self):
+        codec = StateCodec()
+        legacy = jsonpickle.encode(booking_state(), keys=True)
+        assert len(codec.encode(booking_state())) * 4 < len(legacy)
+        details = codec.decode(legacy)["DialogState"].dialog_stack[1].state["values"]["luis_result"]
+        assert details.destination == "Paris"
+
+    def test_rejects_unknown_versions_and_compressions(self):
+        document = StateCodec("none").encode({"a": 1})
+        with self.assertRaises(ValueError):
+            StateCodec().decode(bytes([document[0] + 0x10]) + document[1:])
+        with self.assertRaises(ValueError):
+            StateCodec("lzma")
+
+    def test_only_rebuilds_allowed_classes(self):
+        codec = StateCodec()
+        with self.assertRaises(TypeError):
+            codec.encode({"unknown": Note("hi")})
+        assert StateCodec(pickled_classes=[Note]).decode(
+            StateCodec(pickled_classes=[Note]).encode({"note": Note("hi")})
+        )["note"].text == "hi"
+
+        for tree in (
+            {"py/object": "subprocess.Popen", "args": "true"},
+            {"py/reduce": [{"py/function": "os.system"}, {"py/tuple": ["true"]}]},
+        ):
+            with self.assertRaises(ValueError):
+                codec.decode(json.dumps({"DialogState": tree}))
+            with self.assertRaises(ValueError):
+                # 10 is the tag of an object flattened by jsonpickle.
+                codec.decode(StateCodec("none")._header + json.dumps([10, tree]).encode())  # pylint: disable=protected-access
+
+    def test_booking_details_compare_by_value_and_are_not_hashable(self):
+        assert BookingDetails(destination="Paris") == BookingDetails(destination="Paris")
+        assert BookingDetails.__hash__ is None
+        with self.assertRaises(TypeError):
+            hash(BookingDetails())
+
+if aiounittest.AsyncTestCase == '__main__':
+    aiounittest.main()
@@ -0,0 +1,57 @@
+import threading
+
+import aiounittest   # The test framework
+
+from datatypes_date_time.timex import Timex
+
+from dialogs import BookingDialog
+from helpers.timex_cache import TIMEX_CACHE, TimexCache
+
+
+class Test_timex_cache(aiounittest.AsyncTestCase):
+
+    def test_types_match_timex_and_are_parsed_once(self):
+        cache = TimexCache()
+        for timex in ["2031-03-03", "XXXX-03-03", "2031-03", "XXXX-WXX-1", "2031-03-03T10"]:
+            assert cache.types(timex) == frozenset(Timex(timex).types)
+            assert cache.types(timex) is cache.types(timex)
+        assert cache.misses == 5 and cache.hits == 10
+        assert cache.is_definite("2031-03-03") and not cache.is_definite("XXXX-03-03")
+        assert cache.stats["hit_rate"] == 12 / 17
+
+    def test_evicts_least_recently_used(self):
+        cache = TimexCache(max_size=2)
+        cache.types("2031-03-03")
+        cache.types("2031-03-04")
+        cache.types("2031-03-03")
+        cache.types("2031-03-05")
+        assert cache.evictions == 1 and len(cache) == 2
+        cache.types("2031-03-03")
+        cache.types("2031-03-04")
+        assert cache.misses == 4
+
+    def test_shared_between_threads(self):
+        cache = TimexCache(max_size=8)
+        timexes = [f"2031-03-{day:02d}" for day in range(1, 21)]
+
+        def resolve():
+            for _ in range(50):
+                for timex in timexes:
+                    assert cache.is_definite(timex)
+
+        threads = [threading.Thread(target=resolve) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(cache) == 8
+        assert cache.hits + cache.misses == 4 * 50 * len(timexes)
+
+    def test_dialogs_use_the_shared_cache(self):
+        misses = TIMEX_CACHE.misses
+        assert BookingDialog().is_ambiguous("XXXX-07-04")
+        assert BookingDialog().is_ambiguous("XXXX-07-04")
+        assert TIMEX_CACHE.misses - misses <= 1 and "XXXX-07-04" in TIMEX_CACHE._entries
+
+if aiounittest.AsyncTestCase == '__main__':
+    aiounittest.main()
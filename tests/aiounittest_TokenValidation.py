@@ -0,0 +1,131 @@
+import asyncio
+import json
+import time
+
+import aiounittest   # The test framework
+import jwt
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from botbuilder.core import BotFrameworkAdapterSettings, ConversationState, MemoryStorage
+from botbuilder.schema import Activity, ActivityTypes
+from botframework.connector.auth import ChannelValidation
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jwt.algorithms import RSAAlgorithm
+
+from adapter_with_error_handler import AdapterWithErrorHandler
+from token_validation import SigningKeyCache, TokenValidationCache
+
+SERVICE_URL = "https://smba.example"
+
+
+def signing_key():
+    return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+
+def jwk(private_key, key_id: str) -> dict:
+    document = json.loads(RSAAlgorithm.to_jwk(private_key.public_key()))
+    document.update(kid=key_id, endorsements=["webchat"])
+    return document
+
+
+def channel_token(private_key, key_id: str = "key-1", lifetime: float = 3600, **claims) -> str:
+    now = time.time()
+    payload = {
+        "iss": "https://api.botframework.com",
+        "aud": "bot-app-id",
+        "serviceurl": SERVICE_URL,
+        "nbf": now - 10,
+        "exp": now + lifetime,
+        **claims,
+    }
+    return jwt.encode(payload, private_key, algorithm="RS256", headers={"kid": key_id})
+
+
+def activity(service_url: str = SERVICE_URL) -> Activity:
+    return Activity(type=ActivityTypes.message, channel_id="webchat", service_url=service_url)
+
+
+class Test_token_validation(aiounittest.AsyncTestCase):
+
+    async def start_issuer(self, keys):
+        fetched = []
+
+        async def metadata(req):
+            return web.json_response({"jwks_uri": str(req.url.with_path("/keys"))})
+
+        async def signing_keys(req):  # pylint: disable=unused-argument
+            fetched.append(time.monotonic())
+            return web.json_response({"keys": keys})
+
+        app = web.Application()
+        app.router.add_get("/metadata", metadata)
+        app.router.add_get("/keys", signing_keys)
+        issuer = TestServer(app)
+        await issuer.start_server()
+        return issuer, str(issuer.make_url("/metadata")), fetched
+
+    async def test_a_burst_of_one_token_is_validated_once(self):
+        private_key = signing_key()
+        issuer, metadata_url, fetched = await self.start_issuer([jwk(private_key, "key-1")])
+        clock = [time.time()]
+        cache = TokenValidationCache(clock=lambda: clock[0])
+        adapter = AdapterWithErrorHandler(
+            BotFrameworkAdapterSettings("bot-app-id", "secret"),
+            ConversationState(MemoryStorage()),
+            token_validation_cache=cache,
+        )
+        signing_keys = SigningKeyCache()
+        ChannelValidation.open_id_metadata_endpoint = metadata_url
+        signing_keys.install([metadata_url])
+        try:
+            header = "Bearer " + channel_token(private_key)
+            identities = await asyncio.gather(
+                *(adapter._authenticate_request(activity(), header) for _ in range(20))
+            )
+            assert {identity.claims["aud"] for identity in identities} == {"bot-app-id"}
+            assert all(identity.is_authenticated for identity in identities)
+            assert (await adapter._authenticate_request(activity(), header)).claims["serviceurl"] == SERVICE_URL
+            assert cache.stats == {"entries": 1, "hits": 20, "misses": 1, "failures": 0, "hit_ratio": 20 / 21}
+            assert len(fetched) == 1
+
+            # The serviceurl claim is checked for every service URL the token comes with.
+            with self.assertRaises(PermissionError):
+                await adapter._authenticate_request(activity("https://elsewhere.example"), header)
+            # Past "exp" the SDK validates the token again.
+            clock[0] += 3601
+            await adapter._authenticate_request(activity(), header)
+            assert cache.stats["misses"] == 3 and cache.stats["failures"] == 1
+
+            # Another signature or signing key is never taken from the cache.
+            forged = "Bearer " + channel_token(signing_key())
+            with self.assertRaises(jwt.InvalidSignatureError):
+                await adapter._authenticate_request(activity(), forged)
+            with self.assertRaises(PermissionError):
+                await adapter._authenticate_request(activity(), "Bearer " + channel_token(private_key, "key-2"))
+            assert len(fetched) == 1
+        finally:
+            ChannelValidation.open_id_metadata_endpoint = None
+            signing_keys.close()
+            await issuer.close()
+
+    async def test_signing_keys_are_refreshed_in_the_background(self):
+        old_key, new_key = signing_key(), signing_key()
+        keys = [jwk(old_key, "key-1")]
+        issuer, metadata_url, fetched = await self.start_issuer(keys)
+        signing_keys = SigningKeyCache(refresh_interval_seconds=0.05, min_refresh_interval_seconds=0)
+        signing_keys.install([metadata_url])
+        try:
+            metadata = signing_keys.metadata[metadata_url]
+            assert (await metadata.get("key-1")).endorsements == ["webchat"]
+            keys.append(jwk(new_key, "key-2"))
+            await asyncio.sleep(0.2)
+            assert len(fetched) >= 2
+            # Known by now, so no request waits for the issuer.
+            assert await metadata.get("key-2") is metadata.keys["key-2"]
+        finally:
+            signing_keys.close()
+            await issuer.close()
+
+if aiounittest.AsyncTestCase == '__main__':
+    aiounittest.main()
@@ -0,0 +1,45 @@
+import json
+import os
+from datetime import date
+
+import aiounittest   # The test framework
+
+from helpers.travel_dates import TravelDateParser
+
+CORPUS = os.path.join(os.path.dirname(__file__), os.pardir, "benchmarks", "date_corpus.json")
+
+
+class FakeClock:
+    def __init__(self, today: date):
+        self.today = today
+
+    def __call__(self):
+        return self.today
+
+
+class Test_travel_dates(aiounittest.AsyncTestCase):
+
+    def test_resolves_the_correctness_corpus(self):
+        with open(CORPUS, encoding="utf-8") as corpus_file:
+            corpus = json.load(corpus_file)
+        parser = TravelDateParser(clock=FakeClock(date.fromisoformat(corpus["today"])))
+        for case in corpus["cases"]:
+            resolved = parser.parse(case["text"])
+            assert (resolved.strftime("%Y-%m-%d") if resolved else None) == case["expected"], case
+
+    def test_follows_the_clock_across_midnight(self):
+        clock = FakeClock(date(2031, 1, 15))
+        parser = TravelDateParser(clock=clock)
+        assert parser.parse("asap").date() == date(2031, 1, 15)
+        clock.today = date(2031, 1, 16)
+        assert parser.parse("asap").date() == date(2031, 1, 16)
+        assert parser.parse("tomorrow").date() == date(2031, 1, 17)
+
+    def test_caches_results(self):
+        parser = TravelDateParser(clock=FakeClock(date(2031, 1, 15)))
+        parser.parse("whenever")
+        parser.parse("whenever")
+        assert parser.fallbacks == 1
+
+if aiounittest.AsyncTestCase == '__main__':
+    aiounittest.main()
@@ -0,0 +1,73 @@
+import aiounittest   # The test framework
+
+from botbuilder.core import ConversationState, MemoryStorage, UserState
+from botbuilder.core.adapters import TestAdapter
+from botbuilder.schema import Activity
+
+from bots import DialogAndWelcomeBot
+from config import DefaultConfig
+from dialogs import BookingDialog, MainDialog
+from flight_booking_recognizer import FlightBookingRecognizer
+from turn_metrics import HistogramFamily, MetricsMiddleware, TurnMetrics
+from warm_up import WARM_UP_SCRIPT
+
+
+def samples(text):
+    return dict(line.rsplit(" ", 1) for line in text.splitlines() if line and not line.startswith("#"))
+
+
+class Test_turn_metrics(aiounittest.AsyncTestCase):
+
+    def test_renders_cumulative_buckets(self):
+        family = HistogramFamily("bot_step_seconds", "Step time.", "step", bounds=(0.01, 0.1))
+        for seconds in (0.005, 0.05, 0.05, 3.0):
+            family.observe(seconds, 'say "hi"')
+        lines = []
+        family.render(lines)
+        rendered = samples("\n".join(lines))
+        assert rendered['bot_step_seconds_bucket{step="say \\"hi\\"",le="0.01"}'] == "1"
+        assert rendered['bot_step_seconds_bucket{step="say \\"hi\\"",le="0.1"}'] == "3"
+        assert rendered['bot_step_seconds_bucket{step="say \\"hi\\"",le="+Inf"}'] == "4"
+        assert rendered['bot_step_seconds_count{step="say \\"hi\\""}'] == "4"
+        assert float(rendered['bot_step_seconds_sum{step="say \\"hi\\""}']) == 3.105
+        assert "# TYPE bot_step_seconds histogram" in lines
+
+    def test_exports_stats_as_gauges(self):
+        metrics = TurnMetrics()
+        metrics.add_stats("storage", lambda: {"items": 3, "path": "bot_state.db", "full": False})
+        metrics.add_stats("state", lambda: {"ConversationState": {"writes": 2}}, label="scope")
+        rendered = samples(metrics.render())
+        assert rendered["bot_storage_items"] == "3.0"
+        assert rendered['bot_state_writes{scope="ConversationState"}'] == "2.0"
+        assert not any(name.startswith(("bot_storage_path", "bot_storage_full")) for name in rendered)
+
+    async def test_records_every_stage_of_a_booking(self):
+        metrics = TurnMetrics()
+        storage = MemoryStorage()
+        recognizer = FlightBookingRecognizer(DefaultConfig(), metrics=metrics)
+        dialog = MainDialog(recognizer, BookingDialog(metrics=metrics), metrics=metrics)
+        bot = DialogAndWelcomeBot(ConversationState(storage), UserState(storage), dialog, None, metrics)
+        adapter = TestAdapter(bot.on_turn)
+        adapter.use(MetricsMiddleware(metrics))
+        for text in WARM_UP_SCRIPT:
+            await adapter.receive_activity(text)
+
+        turns = len(WARM_UP_SCRIPT)
+        assert metrics.turn.labels("message").count == turns
+        # Types are client-supplied, so unknown ones share one series.
+        for activity_type in ("made-up-1", "made-up-2"):
+            await adapter.receive_activity(Activity(type=activity_type))
+        assert metrics.turn.labels("other").count == 2
+        assert set(metrics.turn.histograms) == {"message", "other"}
+        assert metrics.state_load.labels().count == turns
+        assert metrics.state_save.labels().count == turns
+        assert metrics.send.labels().count >= turns
+        assert metrics.recognizer.labels("offline").count == 1
+        assert metrics.step.labels("MainDialog.luis_step").count == 1
+        assert metrics.step.labels("BookingDialog.budget_step").count == 1
+        assert metrics.step.labels("DateResolverDialog.final_step").count == 2
+        for prompt in ("TextPrompt", "ConfirmPrompt", "DateTimePrompt", "PassengerNumberPrompt", "BudgetPrompt"):
+            assert metrics.prompt.labels(prompt).count >= 1, prompt
+
+if aiounittest.AsyncTestCase == '__main__':
+    aiounittest.main()
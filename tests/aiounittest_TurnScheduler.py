@@ -0,0 +1,111 @@
+import asyncio
+from http import HTTPStatus
+
+import aiounittest   # The test framework
+
+from admission_control import Overloaded
+from turn_scheduler import TurnScheduler
+
+
+class Turns:
+    """Turns that record when they start and end, and run until released."""
+
+    def __init__(self, scheduler: TurnScheduler):
+        self.scheduler = scheduler
+        self.events = []
+        self.release = {}
+
+    def start(self, key: str, name: str) -> asyncio.Future:
+        self.release[name] = asyncio.Event()
+
+        async def turn():
+            self.events.append(f"{name} started")
+            await self.release[name].wait()
+            self.events.append(f"{name} ended")
+            return name
+
+        return asyncio.ensure_future(self.scheduler.run(key, turn))
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0.001)
+
+
+class Test_turn_scheduler(aiounittest.AsyncTestCase):
+
+    async def test_turns_of_a_conversation_run_in_order(self):
+        scheduler = TurnScheduler()
+        turns = Turns(scheduler)
+        a1, a2, b1, a3 = turns.start("a", "a1"), turns.start("a", "a2"), turns.start("b", "b1"), turns.start("a", "a3")
+        await settle()
+
+        # Conversations run at once; the turns of one wait for each other.
+        assert turns.events == ["a1 started", "b1 started"]
+        assert scheduler.stats["conversations"] == 2 and scheduler.stats["queued"] == 2
+
+        turns.release["a2"].set()
+        turns.release["a1"].set()
+        await settle()
+        assert turns.events == ["a1 started", "b1 started", "a1 ended", "a2 started", "a2 ended", "a3 started"]
+
+        turns.release["a3"].set()
+        turns.release["b1"].set()
+        assert await asyncio.gather(a1, a2, b1, a3) == ["a1", "a2", "b1", "a3"]
+
+        # Idle conversations leave the table.
+        assert scheduler.stats["conversations"] == 0
+        assert scheduler.stats["turns"] == 4 and scheduler.stats["waited"] == 2
+
+    async def test_a_cancelled_turn_keeps_the_order_of_the_others(self):
+        scheduler = TurnScheduler()
+        turns = Turns(scheduler)
+        first, second, third = turns.start("a", "a1"), turns.start("a", "a2"), turns.start("a", "a3")
+        await settle()
+
+        second.cancel()
+        await settle()
+        assert turns.events == ["a1 started"]
+
+        turns.release["a1"].set()
+        turns.release["a3"].set()
+        assert await asyncio.gather(first, third) == ["a1", "a3"]
+        assert turns.events == ["a1 started", "a1 ended", "a3 started", "a3 ended"]
+        assert scheduler.stats["conversations"] == 0
+
+        # A turn that fails still lets the next one run.
+        async def failing_turn():
+            raise ValueError("turn failed")
+
+        with self.assertRaises(ValueError):
+            await scheduler.run("a", failing_turn)
+        assert scheduler.stats["conversations"] == 0
+
+    async def test_retries_of_a_hung_turn_are_refused(self):
+        scheduler = TurnScheduler(max_queued_per_key=1, queue_timeout_seconds=0.05)
+        scheduler.turn_seconds = 2.0
+        turns = Turns(scheduler)
+        hung = turns.start("a", "a1")
+        await settle()
+
+        # The one queued retry gives up after the deadline...
+        with self.assertRaises(Overloaded) as refused:
+            await turns.start("a", "a2")
+        assert refused.exception.status == HTTPStatus.TOO_MANY_REQUESTS
+        assert refused.exception.retry_after_seconds == 4
+
+        # ...and retries beyond the queue are refused at once.
+        queued = turns.start("a", "a3")
+        await settle()
+        with self.assertRaises(Overloaded):
+            await turns.start("a", "a4")
+        assert scheduler.stats["rejected_timeout"] == 1 and scheduler.stats["rejected_queue_full"] == 1
+
+        turns.release["a1"].set()
+        turns.release["a3"].set()
+        assert await asyncio.gather(hung, queued) == ["a1", "a3"]
+        assert turns.events == ["a1 started", "a1 ended", "a3 started", "a3 ended"]
+        assert scheduler.stats["conversations"] == 0
+
+if aiounittest.AsyncTestCase == '__main__':
+    aiounittest.main()
@@ -0,0 +1,102 @@
+import aiounittest   # The test framework
+
+from aiohttp import web
+from botbuilder.core import IntentScore, NullTelemetryClient, RecognizerResult, TurnContext
+from botbuilder.core.adapters import TestAdapter
+from botbuilder.schema import Activity, ActivityTypes
+
+from config import DefaultConfig
+from flight_booking_recognizer import FlightBookingRecognizer
+from helpers.recognition_cache import RecognitionCache
+from turn_metrics import TurnMetrics
+from warm_up import WARM_UP_SCRIPT, WarmUp
+
+
+class MetricsClient(NullTelemetryClient):
+    def __init__(self):
+        super().__init__()
+        self.metrics = {}
+
+    def track_metric(self, name, value, *args, **kwargs):  # pylint: disable=arguments-differ
+        self.metrics[name] = value
+
+
+class RecordingRecognizer(FlightBookingRecognizer):
+    """The offline recognizer, recording the turns it sees and the LUIS warm-up."""
+
+    def __init__(self, luis_error: Exception = None):
+        super().__init__(DefaultConfig())
+        self.texts = []
+        self.luis_warm_ups = 0
+        self.luis_senders = []
+        self._luis_error = luis_error
+
+    async def warm_up(self, turn_context: TurnContext):
+        self.luis_warm_ups += 1
+        self.luis_senders.append(turn_context.activity.from_property.id)
+        if self._luis_error:
+            raise self._luis_error
+
+    async def recognize(self, turn_context: TurnContext, bypass_cache: bool = False):
+        self.texts.append(turn_context.activity.text)
+        return await super().recognize(turn_context, bypass_cache)
+
+
+class CountingLuis:
+    def __init__(self):
+        self.calls = 0
+
+    async def recognize(self, turn_context: TurnContext):
+        self.calls += 1
+        return RecognizerResult(text=turn_context.activity.text, intents={"book": IntentScore(0.9)}, entities={})
+
+
+class Test_warm_up(aiounittest.AsyncTestCase):
+
+    async def test_recognizer_warm_up_always_queries_luis(self):
+        recognizer = FlightBookingRecognizer(DefaultConfig())
+        luis = recognizer._recognizer = CountingLuis()  # pylint: disable=protected-access
+        context = TurnContext(TestAdapter(), Activity(type=ActivityTypes.message, text="book a flight to paris"))
+        await recognizer.warm_up(context)
+        await recognizer.warm_up(context)
+        assert luis.calls == 2 and len(recognizer.cache) == 0
+
+    async def test_runs_every_phase_and_reports_the_duration(self):
+        recognizer = RecordingRecognizer()
+        telemetry = MetricsClient()
+        warm_up = WarmUp(recognizer, telemetry_client=telemetry)
+        app = web.Application()
+        await warm_up.on_startup(app)
+
+        assert warm_up.errors == {}
+        assert set(warm_up.durations) == {"recognizers", "luis", "conversation", "total"}
+        assert telemetry.metrics["warm_up_seconds"] == warm_up.durations["total"]
+        assert app["warm_up"]["seconds"]["total"] == warm_up.durations["total"]
+        assert recognizer.luis_warm_ups == 1 and recognizer.luis_senders[0]
+        # The booking utterance reached the recognizer, so the conversation got past the intro.
+        assert WARM_UP_SCRIPT[1] in recognizer.texts
+
+    async def test_failures_do_not_stop_startup(self):
+        recognizer = RecordingRecognizer(luis_error=ConnectionError("no route to LUIS"))
+        warm_up = WarmUp(recognizer)
+        await warm_up.run()
+        assert set(warm_up.errors) == {"luis"}
+        assert "no route to LUIS" in warm_up.errors["luis"]
+        assert WARM_UP_SCRIPT[1] in recognizer.texts
+
+    async def test_the_conversation_stays_off_luis_the_cache_and_the_metrics(self):
+        metrics = TurnMetrics()
+        recognizer = FlightBookingRecognizer(DefaultConfig(), cache=RecognitionCache(16), metrics=metrics)
+        luis = recognizer._recognizer = CountingLuis()  # pylint: disable=protected-access
+        warm_up = WarmUp(recognizer)
+        metrics.add_stats("warm_up", lambda: warm_up.phase_stats, label="phase")
+        await warm_up.run()
+
+        assert warm_up.errors == {}
+        # Only the query that opens the connection went to LUIS.
+        assert luis.calls == 1 and len(recognizer.cache) == 0
+        assert metrics.recognizer.histograms == {}
+        assert f'bot_warm_up_seconds{{phase="total"}} {warm_up.durations["total"]}' in metrics.render()
+
+if aiounittest.AsyncTestCase == '__main__':
+    aiounittest.main()
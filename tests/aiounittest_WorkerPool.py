@@ -0,0 +1,92 @@
+import json
+import os
+import shutil
+import signal
+import socket
+import tempfile
+import time
+import urllib.request
+from functools import partial
+
+import aiounittest   # The test framework
+from aiohttp import web
+
+from worker_pool import WorkerPool
+
+
+def create_app(directory: str) -> web.Application:
+    async def record_cleanup(app):  # pylint: disable=unused-argument
+        with open(os.path.join(directory, f"cleanup-{os.getpid()}"), "w"):
+            pass
+
+    app = web.Application()
+    app.on_cleanup.append(record_cleanup)
+    return app
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def get_health(port: int) -> dict:
+    with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=5) as response:
+        return json.loads(response.read())
+
+
+class Test_worker_pool(aiounittest.AsyncTestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.port = free_port()
+        self.pool = WorkerPool(
+            partial(create_app, self.directory),
+            "127.0.0.1",
+            self.port,
+            2,
+            health_interval_seconds=0.1,
+            shutdown_timeout_seconds=5,
+        )
+
+    def tearDown(self):
+        self.pool.stop()
+        shutil.rmtree(self.directory)
+
+    def wait_for_workers(self, pids):
+        seen = set()
+        deadline = time.monotonic() + 60
+        while seen != set(pids) and time.monotonic() < deadline:
+            try:
+                seen.add(get_health(self.port)["pid"])
+            except OSError:
+                time.sleep(0.1)
+        return seen
+
+    def test_workers_share_the_port_and_stop_gracefully(self):
+        self.pool.start()
+        pids = self.pool.pids
+        assert self.wait_for_workers(pids) == set(pids)
+
+        self.pool.poll(0.5)
+        assert {report["pid"] for report in self.pool.health.values()} == set(pids)
+
+        self.pool.stop()
+        assert sorted(os.listdir(self.directory)) == sorted(f"cleanup-{pid}" for pid in pids)
+        assert all(report["status"] == "stopping" for report in self.pool.health.values())
+
+    def test_replaces_a_worker_that_exits(self):
+        self.pool.start()
+        first, second = self.pool.pids
+        assert self.wait_for_workers([first, second]) == {first, second}
+
+        os.kill(first, signal.SIGKILL)
+        time.sleep(0.5)
+        self.pool.poll()
+        assert self.pool.restarts == 1
+        replacement = self.pool.pids[0]
+        assert replacement != first
+        assert self.wait_for_workers([replacement, second]) == {replacement, second}
+
+if aiounittest.AsyncTestCase == '__main__':
+    aiounittest.main()
@@ -0,0 +1,280 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Caches for authenticating the Bot Framework JWTs of inbound requests."""
+
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+import aiohttp
+from botframework.connector.auth import (
+    AuthenticationConstants,
+    ChannelValidation,
+    ClaimsIdentity,
+    GovernmentConstants,
+)
+from botframework.connector.auth.jwt_token_extractor import JwtTokenExtractor
+from jwt.algorithms import RSAAlgorithm
+
+
+class TokenValidationCache:
+    """
+    Claims of the Authorization headers that passed validation, keyed by a
+    SHA-256 of the header and the channel id and service URL they were
+    validated for (the token's endorsements and "serviceurl" claim are
+    checked against both).
+
+    An entry is used from the token's "nbf" claim, less the SDK's
+    `clock_tolerance_seconds`, until its "exp" claim, so the SDK validates
+    again any token past its expiry. Requests carrying a header that is
+    being validated wait for that validation instead of starting their own,
+    so a burst of messages with one channel token checks its signature
+    once. Failed validations are not cached. At most `max_entries` headers
+    are kept, least recently used first out.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 10000,
+        clock_tolerance_seconds: float = 5 * 60,
+        clock: Callable[[], float] = time.time,
+    ):
+        if max_entries <= 0:
+            raise ValueError("TokenValidationCache(): max_entries must be positive.")
+        self.max_entries = max_entries
+        self.clock_tolerance_seconds = clock_tolerance_seconds
+        self._clock = clock
+        # key -> (claims, authentication type, not before, expires at), least recently used first.
+        self._entries: "OrderedDict[bytes, Tuple[dict, str, float, float]]" = OrderedDict()
+        self._validating: Dict[bytes, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.failures = 0
+
+    @property
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "failures": self.failures,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+    async def authenticate(
+        self,
+        auth_header: str,
+        channel_id: str,
+        service_url: str,
+        validate: Callable[[], Awaitable[ClaimsIdentity]],
+    ) -> Tuple[ClaimsIdentity, bool]:
+        """
+        The identity of `auth_header`, from the cache or from `validate()`,
+        and whether this request was spared the validation.
+        """
+        key = hashlib.sha256(
+            "\n".join((auth_header, channel_id or "", service_url or "")).encode()
+        ).digest()
+        entry = self._entries.get(key)
+        if entry is not None:
+            claims, authentication_type, not_before, expires_at = entry
+            if not_before <= self._clock() < expires_at:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return ClaimsIdentity(dict(claims), True, authentication_type), True
+            del self._entries[key]
+
+        validating = self._validating.get(key)
+        validated = validating is None
+        if validated:
+            self.misses += 1
+            validating = self._validating[key] = asyncio.ensure_future(self._validate(key, validate))
+        else:
+            # Served by the validation already running for this header.
+            self.hits += 1
+        identity = await asyncio.shield(validating)
+        return (
+            ClaimsIdentity(dict(identity.claims), identity.is_authenticated, identity.authentication_type),
+            not validated,
+        )
+
+    async def _validate(self, key: bytes, validate: Callable[[], Awaitable[ClaimsIdentity]]) -> ClaimsIdentity:
+        try:
+            identity = await validate()
+        except Exception:
+            self.failures += 1
+            raise
+        finally:
+            del self._validating[key]
+
+        expires_at = _number(identity.claims.get("exp"))
+        if identity.is_authenticated and expires_at is not None:
+            not_before = _number(identity.claims.get("nbf"))
+            self._entries[key] = (
+                dict(identity.claims),
+                identity.authentication_type,
+                (not_before if not_before is not None else float("-inf")) - self.clock_tolerance_seconds,
+                expires_at,
+            )
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return identity
+
+
+class SigningKeyCache:
+    """
+    OpenID signing keys of the Bot Framework token issuers, for the SDK's
+    `JwtTokenExtractor`.
+
+    The SDK fetches the metadata and JWKS documents with `requests` on the
+    event loop, inline in the first request of every day, and parses the
+    public key of a token on every request. `install` puts a
+    `_SigningKeys` in the SDK's metadata cache for each issuer instead: it
+    fetches both documents with aiohttp, parses each key once, and after
+    the first fetch refreshes them in the background every
+    `refresh_interval_seconds`. A token signed with an unknown key
+    triggers a refresh at most once per `min_refresh_interval_seconds`.
+    """
+
+    def __init__(
+        self,
+        refresh_interval_seconds: float = 24 * 60 * 60,
+        min_refresh_interval_seconds: float = 5 * 60,
+        timeout_seconds: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.refresh_interval_seconds = refresh_interval_seconds
+        self.min_refresh_interval_seconds = min_refresh_interval_seconds
+        self.timeout_seconds = timeout_seconds
+        self._clock = clock
+        self.metadata: Dict[str, _SigningKeys] = {}
+
+    @property
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {url: keys.stats for url, keys in self.metadata.items()}
+
+    def install(self, metadata_urls: Iterable[str] = None):
+        """Serves the keys of `metadata_urls`, by default those of the public, government and Emulator issuers."""
+        if metadata_urls is None:
+            metadata_urls = [
+                ChannelValidation.open_id_metadata_endpoint
+                or AuthenticationConstants.TO_BOT_FROM_CHANNEL_OPENID_METADATA_URL,
+                AuthenticationConstants.TO_BOT_FROM_EMULATOR_OPENID_METADATA_URL,
+                GovernmentConstants.TO_BOT_FROM_CHANNEL_OPENID_METADATA_URL,
+                GovernmentConstants.TO_BOT_FROM_EMULATOR_OPENID_METADATA_URL,
+            ]
+        for url in metadata_urls:
+            keys = self.metadata.get(url)
+            if keys is None:
+                keys = self.metadata[url] = _SigningKeys(url, self)
+            JwtTokenExtractor.metadataCache[url] = keys
+
+    def close(self):
+        """Stops the background refreshes and hands the issuers back to the SDK."""
+        for url, keys in self.metadata.items():
+            keys.close()
+            if JwtTokenExtractor.metadataCache.get(url) is keys:
+                del JwtTokenExtractor.metadataCache[url]
+
+
+class _SigningKey:
+    """What `JwtTokenExtractor._validate_token` reads from its metadata."""
+
+    __slots__ = ("public_key", "endorsements")
+
+    def __init__(self, public_key, endorsements: List[str]):
+        self.public_key = public_key
+        self.endorsements = endorsements
+
+
+class _SigningKeys:
+    def __init__(self, url: str, cache: SigningKeyCache):
+        self.url = url
+        self.cache = cache
+        self.keys: Dict[str, _SigningKey] = {}
+        self.last_refresh: Optional[float] = None
+        self._refreshing: Optional[asyncio.Future] = None
+        self._scheduled: Optional[asyncio.TimerHandle] = None
+        self.refreshes = 0
+        self.errors = 0
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return {"keys": len(self.keys), "refreshes": self.refreshes, "errors": self.errors}
+
+    async def get(self, key_id: str) -> _SigningKey:
+        if self.last_refresh is None:
+            await self._refresh()
+        key = self.keys.get(key_id)
+        if key is None and self.cache._clock() >= self.last_refresh + self.cache.min_refresh_interval_seconds:  # pylint: disable=protected-access
+            await self._refresh()
+            key = self.keys.get(key_id)
+        if key is None:
+            raise PermissionError(f"Unauthorized. Unknown signing key {key_id!r}.")
+        return key
+
+    def close(self):
+        if self._scheduled is not None:
+            self._scheduled.cancel()
+            self._scheduled = None
+
+    async def _refresh(self):
+        if self._refreshing is None:
+            self._refreshing = asyncio.ensure_future(self._fetch())
+        await asyncio.shield(self._refreshing)
+
+    async def _fetch(self):
+        try:
+            keys = await self._download()
+        except Exception:
+            self.errors += 1
+            if self.last_refresh is None:
+                # Nothing to fall back on; the next request tries again.
+                raise
+            keys = self.keys
+        else:
+            self.refreshes += 1
+        finally:
+            self._refreshing = None
+        self.keys = keys
+        self.last_refresh = self.cache._clock()  # pylint: disable=protected-access
+        self._schedule()
+
+    async def _download(self) -> Dict[str, _SigningKey]:
+        timeout = aiohttp.ClientTimeout(total=self.cache.timeout_seconds)
+        # trust_env: honour HTTP(S)_PROXY and NO_PROXY, as the SDK's `requests` calls do.
+        async with aiohttp.ClientSession(timeout=timeout, trust_env=True) as session:
+            async with session.get(self.url) as response:
+                response.raise_for_status()
+                jwks_uri = (await response.json(content_type=None))["jwks_uri"]
+            async with session.get(jwks_uri) as response:
+                response.raise_for_status()
+                documents = (await response.json(content_type=None))["keys"]
+        return {
+            document["kid"]: _SigningKey(
+                RSAAlgorithm.from_jwk(json.dumps(document)), document.get("endorsements", [])
+            )
+            for document in documents
+            if document.get("kid") is not None
+        }
+
+    def _schedule(self):
+        self.close()
+        loop = asyncio.get_event_loop()
+        self._scheduled = loop.call_later(
+            self.cache.refresh_interval_seconds, lambda: asyncio.ensure_future(self._refresh_quietly())
+        )
+
+    async def _refresh_quietly(self):
+        try:
+            await self._refresh()
+        except Exception:  # pylint: disable=broad-except
+            pass
+
+
+def _number(value) -> Optional[float]:
+    return float(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else None
@@ -0,0 +1,223 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Latency histograms of the stages of a turn, served in Prometheus text format."""
+
+import time
+from bisect import bisect_left
+from functools import wraps
+from typing import Callable, Dict, List, Tuple
+
+from botbuilder.core import Middleware, TurnContext
+from botbuilder.dialogs import WaterfallDialog
+from botbuilder.dialogs.prompts import Prompt
+from botbuilder.schema import ActivityTypes
+
+# Upper bounds in seconds; a turn's stages range from microseconds (parsing)
+# to seconds (a slow LUIS call).
+DEFAULT_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+
+class Histogram:
+    """
+    Counts observations in fixed buckets allocated up front. Observations are
+    only made on the event loop, so the counters need no lock; rendering
+    reads them between two turns.
+    """
+
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.bounds = bounds
+        # One counter per bound, and a last one for values above every bound.
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, seconds: float):
+        self.counts[bisect_left(self.bounds, seconds)] += 1
+        self.sum += seconds
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+
+class HistogramFamily:
+    """Histograms of one metric, one per value of its label."""
+
+    def __init__(self, name: str, documentation: str, label: str = None, bounds: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label = label
+        self.bounds = bounds
+        self.histograms: Dict[str, Histogram] = {}
+
+    def labels(self, value: str = "") -> Histogram:
+        histogram = self.histograms.get(value)
+        if histogram is None:
+            histogram = self.histograms[value] = Histogram(self.bounds)
+        return histogram
+
+    def observe(self, seconds: float, value: str = ""):
+        self.labels(value).observe(seconds)
+
+    def render(self, lines: List[str]):
+        lines.append(f"# HELP {self.name} {self.documentation}")
+        lines.append(f"# TYPE {self.name} histogram")
+        for value, histogram in sorted(self.histograms.items()):
+            labels = f'{self.label}="{_escape(value)}",' if self.label else ""
+            cumulative = 0
+            for bound, count in zip(self.bounds, histogram.counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{labels}le="{bound}"}} {cumulative}')
+            cumulative += histogram.counts[-1]
+            lines.append(f'{self.name}_bucket{{{labels}le="+Inf"}} {cumulative}')
+            selector = f"{{{labels[:-1]}}}" if labels else ""
+            lines.append(f"{self.name}_sum{selector} {histogram.sum}")
+            lines.append(f"{self.name}_count{selector} {cumulative}")
+
+
+class TurnMetrics:
+    """
+    Where the time of a turn goes. `MetricsMiddleware` records whole turns and
+    outbound sends, `DialogBot` the state load and save, the dialogs their
+    waterfall steps and prompt recognition, `FlightBookingRecognizer` the
+    recognizer calls, `AdapterWithErrorHandler` the authentication of
+    requests and the delivery of buffered replies, and `app.messages` the
+    request parsing.
+
+    `add_stats` exports the counters other components keep in a `stats` dict
+    as gauges; `render` returns everything in Prometheus text format.
+    """
+
+    def __init__(self):
+        self.parse = HistogramFamily("bot_request_parse_seconds", "Time to parse the request body into an activity.")
+        self.auth = HistogramFamily(
+            "bot_request_auth_seconds", "Time to authenticate a request's token, by result (cached or validated).", "result"
+        )
+        self.turn = HistogramFamily("bot_turn_seconds", "Time to process a turn, by activity type.", "type")
+        self.state_load = HistogramFamily("bot_state_load_seconds", "Time to load conversation state.")
+        self.recognizer = HistogramFamily(
+            "bot_recognizer_seconds", "Time to recognize an utterance, by recognizer (offline or luis).", "recognizer"
+        )
+        self.step = HistogramFamily(
+            "bot_waterfall_step_seconds", "Time in a waterfall step, including dialogs it begins.", "step"
+        )
+        self.prompt = HistogramFamily("bot_prompt_recognition_seconds", "Time a prompt takes to recognize its input.", "prompt")
+        self.send = HistogramFamily("bot_send_activities_seconds", "Time to send the activities of one send_activity call.")
+        self.reply_flush = HistogramFamily(
+            "bot_reply_flush_seconds", "Time to deliver the replies a turn buffered to the channel."
+        )
+        self.state_save = HistogramFamily("bot_state_save_seconds", "Time to save changed conversation and user state.")
+        self.families = [
+            self.parse, self.auth, self.turn, self.state_load, self.recognizer, self.step, self.prompt, self.send,
+            self.reply_flush, self.state_save,
+        ]
+        self._stats: List[Tuple[str, Callable[[], dict], str]] = []
+
+    def add_stats(self, prefix: str, stats: Callable[[], dict], label: str = "key"):
+        """Exports the numbers of `stats()` as gauges named `bot_<prefix>_<key>`.
+
+        A nested dict becomes one gauge per inner key, with the outer key as `label`.
+        """
+        self._stats.append((prefix, stats, label))
+
+    def instrument_prompt(self, prompt: Prompt) -> Prompt:
+        """Times the recognition of every input `prompt` receives."""
+        recognize = prompt.on_recognize
+        histogram = self.prompt.labels(prompt.id)
+
+        @wraps(recognize)
+        async def on_recognize(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await recognize(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - started)
+
+        prompt.on_recognize = on_recognize
+        return prompt
+
+    def render(self) -> str:
+        lines = []
+        for family in self.families:
+            family.render(lines)
+        for prefix, stats, label in self._stats:
+            self._render_stats(f"bot_{prefix}", stats(), label, lines)
+        lines.append("")
+        return "\n".join(lines)
+
+    @staticmethod
+    def _render_stats(prefix: str, stats: dict, label: str, lines: List[str]):
+        gauges: Dict[str, List[str]] = {}
+        for key, value in stats.items():
+            if isinstance(value, dict):
+                for inner_key, inner_value in value.items():
+                    if _is_number(inner_value):
+                        gauges.setdefault(f"{prefix}_{inner_key}", []).append(
+                            f'{{{label}="{_escape(str(key))}"}} {float(inner_value)}'
+                        )
+            elif _is_number(value):
+                gauges.setdefault(f"{prefix}_{key}", []).append(f" {float(value)}")
+        for name, samples in gauges.items():
+            lines.append(f"# TYPE {name} gauge")
+            lines.extend(name + sample for sample in samples)
+
+
+class TimedWaterfallDialog(WaterfallDialog):
+    """`WaterfallDialog` recording the duration of its steps in `metrics.step`."""
+
+    def __init__(self, dialog_id: str, steps: list = None, metrics: TurnMetrics = None):
+        super(TimedWaterfallDialog, self).__init__(dialog_id, steps)
+        self.metrics = metrics
+
+    async def on_step(self, step_context):
+        if self.metrics is None:
+            return await super().on_step(step_context)
+        started = time.perf_counter()
+        try:
+            return await super().on_step(step_context)
+        finally:
+            self.metrics.step.observe(time.perf_counter() - started, self.get_step_name(step_context.index))
+
+
+class MetricsMiddleware(Middleware):
+    """Adapter middleware timing every turn and the sends made during it."""
+
+    def __init__(self, metrics: TurnMetrics):
+        self.metrics = metrics
+
+    async def on_turn(self, context: TurnContext, logic: Callable):
+        send = self.metrics.send.labels()
+
+        async def time_send(_context, activities, next_send):
+            started = time.perf_counter()
+            try:
+                return await next_send()
+            finally:
+                send.observe(time.perf_counter() - started)
+
+        context.on_send_activities(time_send)
+        started = time.perf_counter()
+        try:
+            await logic()
+        finally:
+            self.metrics.turn.observe(time.perf_counter() - started, _turn_type(context.activity.type))
+
+
+# The "type" label of bot_turn_seconds: the activity type comes from the
+# caller, so anything but a known type is counted as "other".
+_TURN_TYPES = {kind.value: kind.value for kind in ActivityTypes}
+
+
+def _turn_type(activity_type: str) -> str:
+    return _TURN_TYPES.get(activity_type, "other")
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
@@ -0,0 +1,125 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Runs the turns of one conversation one after another, and of different conversations at once."""
+
+import asyncio
+import math
+import time
+from http import HTTPStatus
+from typing import Awaitable, Callable, Dict, TypeVar
+
+from admission_control import Overloaded
+
+T = TypeVar("T")
+
+
+class _Key:
+    """The turns of one conversation: the future the next turn waits for, and how many hold it."""
+
+    __slots__ = ("tail", "turns")
+
+    def __init__(self, tail: asyncio.Future):
+        self.tail = tail
+        self.turns = 0
+
+
+class TurnScheduler:
+    """
+    Serializes turns by key (the conversation id).
+
+    A channel can deliver two activities of one conversation at once (a
+    double-send, or a retry of a turn that is still running). Run in
+    parallel, both turns load the same `ConversationState`, advance the
+    dialog stack on their own copy, and the last one saved wins. `run`
+    starts a turn once the previous turn of its key has ended, in arrival
+    order, and runs turns of different keys at once.
+
+    At most `max_queued_per_key` turns wait behind the running one, each
+    for at most `queue_timeout_seconds`, so the retries of a hung turn do
+    not pile up: a turn that finds the queue full or waits too long is
+    refused with a 429 `Overloaded`, whose Retry-After is the time the
+    turns ahead of it should take from a moving average of turn durations.
+
+    Each key holds one future per queued turn, chained to the previous
+    one, and is dropped as soon as its last turn ends, so the table only
+    holds the conversations with a turn running. The scheduler only runs
+    on the event loop, so it needs no lock.
+    """
+
+    def __init__(
+        self,
+        max_queued_per_key: int = 8,
+        queue_timeout_seconds: float = 5.0,
+        clock: Callable[[], float] = time.perf_counter,
+    ):
+        self.max_queued_per_key = max_queued_per_key
+        self.queue_timeout_seconds = queue_timeout_seconds
+        self._clock = clock
+        self._keys: Dict[str, _Key] = {}
+        # Moving average of how long a scheduled turn runs.
+        self.turn_seconds = 0.0
+        self.turns = 0
+        self.waited = 0
+        self.rejected_full = 0
+        self.rejected_timeout = 0
+
+    @property
+    def stats(self) -> Dict[str, float]:
+        return {
+            "conversations": len(self._keys),
+            "queued": sum(key.turns for key in self._keys.values()) - len(self._keys),
+            "turns": self.turns,
+            "waited": self.waited,
+            "rejected_queue_full": self.rejected_full,
+            "rejected_timeout": self.rejected_timeout,
+        }
+
+    async def run(self, key: str, turn: Callable[[], Awaitable[T]]) -> T:
+        """Awaits `turn()` once every turn of `key` that came before it has ended; raises `Overloaded` instead."""
+        if not key:
+            self.turns += 1
+            return await turn()
+
+        entry = self._keys.get(key)
+        if entry is not None and entry.turns > self.max_queued_per_key:
+            self.rejected_full += 1
+            raise self._overloaded(entry, "Too many turns of this conversation are queued.")
+        self.turns += 1
+
+        done = asyncio.get_event_loop().create_future()
+        if entry is None:
+            previous = None
+            entry = self._keys[key] = _Key(done)
+        else:
+            previous = entry.tail
+            entry.tail = done
+        entry.turns += 1
+        try:
+            if previous is not None:
+                self.waited += 1
+                try:
+                    await asyncio.wait_for(asyncio.shield(previous), self.queue_timeout_seconds)
+                except (asyncio.CancelledError, asyncio.TimeoutError) as error:
+                    # Not run: the next turn still waits for the one before this.
+                    previous.add_done_callback(lambda _: done.done() or done.set_result(None))
+                    if isinstance(error, asyncio.TimeoutError):
+                        self.rejected_timeout += 1
+                        raise self._overloaded(entry, "The turn waited too long for the conversation.")
+                    raise
+            started = self._clock()
+            try:
+                return await turn()
+            finally:
+                elapsed = self._clock() - started
+                self.turn_seconds = elapsed if not self.turn_seconds else 0.9 * self.turn_seconds + 0.1 * elapsed
+        finally:
+            if previous is None or previous.done():
+                if not done.done():
+                    done.set_result(None)
+            entry.turns -= 1
+            if not entry.turns and self._keys.get(key) is entry:
+                del self._keys[key]
+
+    def _overloaded(self, entry: _Key, reason: str) -> Overloaded:
+        retry_after = max(1, math.ceil(self.turn_seconds * entry.turns))
+        return Overloaded(HTTPStatus.TOO_MANY_REQUESTS, retry_after, reason)
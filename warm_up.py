@@ -0,0 +1,139 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Startup warm-up, so a worker's first users do not pay for lazy initialization."""
+
+import sys
+import time
+from copy import copy
+from typing import Dict, List
+
+from aiohttp import web
+from botbuilder.core import (
+    BotTelemetryClient,
+    ConversationState,
+    MemoryStorage,
+    NullTelemetryClient,
+    TurnContext,
+    UserState,
+)
+from botbuilder.core.adapters import TestAdapter
+from botbuilder.schema import Activity, ActivityTypes, ChannelAccount
+from recognizers_choice import recognize_boolean
+from recognizers_date_time import recognize_datetime
+from recognizers_number import recognize_number
+from recognizers_text import Culture
+
+from bots import DialogAndWelcomeBot
+from dialogs import BookingDialog, MainDialog
+from flight_booking_recognizer import FlightBookingRecognizer
+
+# One booking that visits every prompt: the dates, passengers and budget are
+# left out of the first utterance so the DateTimePrompt and NumberPrompts run.
+WARM_UP_SCRIPT = [
+    "hi",
+    "book a flight from paris to london",
+    "yes",
+    "march 3 2031",
+    "march 10 2031",
+    "2",
+    "500",
+    "yes",
+    "no",
+]
+
+
+class WarmUp:
+    """
+    Runs before the application accepts requests (register `on_startup`).
+
+    It primes the recognizers-text models behind the date, number and confirm
+    prompts, sends one query to LUIS so its connection is open, and runs
+    `WARM_UP_SCRIPT` through a `DialogAndWelcomeBot` with in-memory state.
+    That bot gets its own dialogs without telemetry, and an offline-only copy
+    of the recognizer without the cache and metrics, so the synthetic
+    conversation is neither sent to LUIS, stored nor reported.
+    `phase_stats` holds the seconds per phase, exported on /metrics as
+    `bot_warm_up_seconds`. Failures are printed and do not stop the
+    application from starting.
+    """
+
+    def __init__(
+        self,
+        recognizer: FlightBookingRecognizer,
+        telemetry_client: BotTelemetryClient = None,
+        script: List[str] = None,
+        culture: str = Culture.English,
+    ):
+        self.recognizer = recognizer
+        self.telemetry_client = telemetry_client or NullTelemetryClient()
+        self.script = WARM_UP_SCRIPT if script is None else script
+        self.culture = culture
+        # Seconds per phase and in total, and the phases that failed.
+        self.durations: Dict[str, float] = {}
+        self.errors: Dict[str, str] = {}
+
+    async def on_startup(self, app: web.Application):
+        await self.run()
+        app["warm_up"] = self.stats
+
+    async def run(self) -> Dict[str, float]:
+        started = time.perf_counter()
+        await self._phase("recognizers", self._prime_recognizers)
+        await self._phase("luis", self._open_luis)
+        await self._phase("conversation", self._converse)
+        self.durations["total"] = time.perf_counter() - started
+        self.telemetry_client.track_metric("warm_up_seconds", self.durations["total"])
+        return self.durations
+
+    @property
+    def stats(self) -> dict:
+        return {"seconds": dict(self.durations), "errors": dict(self.errors)}
+
+    @property
+    def phase_stats(self) -> Dict[str, Dict[str, float]]:
+        """The seconds of each phase, for `TurnMetrics.add_stats(..., label="phase")`."""
+        return {phase: {"seconds": seconds} for phase, seconds in self.durations.items()}
+
+    async def _phase(self, name: str, warm):
+        started = time.perf_counter()
+        try:
+            await warm()
+        except Exception as error:  # pylint: disable=broad-except
+            self.errors[name] = repr(error)
+            print(f"Warm-up of {name} failed: {error!r}", file=sys.stderr)
+        self.durations[name] = time.perf_counter() - started
+
+    async def _prime_recognizers(self):
+        recognize_datetime("march 3 2031", self.culture)
+        recognize_number("2", self.culture)
+        recognize_boolean("yes", self.culture)
+
+    async def _open_luis(self):
+        adapter = TestAdapter()
+        # LUIS traces the query with the sender and conversation of the activity.
+        activity = copy(adapter.template)
+        activity.type = ActivityTypes.message
+        activity.text = self.script[1]
+        activity.locale = self.culture
+        await self.recognizer.warm_up(TurnContext(adapter, activity))
+
+    async def _converse(self):
+        dialog = MainDialog(self.recognizer.offline_copy(), BookingDialog(), NullTelemetryClient())
+        bot = DialogAndWelcomeBot(
+            ConversationState(MemoryStorage()),
+            UserState(MemoryStorage()),
+            dialog,
+            NullTelemetryClient(),
+        )
+        adapter = TestAdapter(bot.on_turn)
+        await adapter.receive_activity(
+            Activity(
+                type=ActivityTypes.conversation_update,
+                members_added=[ChannelAccount(id="warm-up-user")],
+            )
+        )
+        for text in self.script:
+            await adapter.receive_activity(self._activity(text))
+
+    def _activity(self, text: str) -> Activity:
+        return Activity(type=ActivityTypes.message, text=text, locale=self.culture)
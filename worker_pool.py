@@ -0,0 +1,250 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Pre-fork worker processes serving the bot on one port."""
+
+import asyncio
+import multiprocessing
+import os
+import queue
+import signal
+import socket
+import sys
+import time
+from typing import Callable, Dict, List
+
+from aiohttp import web
+from aiohttp.web import Request, Response, json_response
+
+
+def create_socket(host: str, port: int) -> socket.socket:
+    """
+    A socket other processes can bind to the same port.
+
+    It is not listening yet: the server calls listen() once the application's
+    startup handlers (e.g. the warm-up) have run, so the kernel only hands
+    connections to workers that are ready for them.
+    """
+    if not hasattr(socket, "SO_REUSEPORT"):
+        raise RuntimeError("Multiple workers require SO_REUSEPORT (Linux, macOS or BSD).")
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    sock.setblocking(False)
+    return sock
+
+
+class WorkerHealth:
+    """Counts the requests of one worker and reports them to the pool."""
+
+    def __init__(self, index: int, reports: multiprocessing.Queue, interval_seconds: float):
+        self.index = index
+        self.pid = os.getpid()
+        self.started = time.time()
+        self.requests = 0
+        self.in_flight = 0
+        self.errors = 0
+        self._reports = reports
+        self._interval_seconds = interval_seconds
+        self._heartbeat: asyncio.Task = None
+
+    def snapshot(self) -> Dict[str, object]:
+        return {
+            "worker": self.index,
+            "pid": self.pid,
+            "uptime_s": time.time() - self.started,
+            "requests": self.requests,
+            "in_flight": self.in_flight,
+            "errors": self.errors,
+        }
+
+    @web.middleware
+    async def middleware(self, request: Request, handler) -> Response:
+        self.requests += 1
+        self.in_flight += 1
+        try:
+            response = await handler(request)
+            if response.status >= 500:
+                self.errors += 1
+            return response
+        except Exception:
+            self.errors += 1
+            raise
+        finally:
+            self.in_flight -= 1
+
+    async def get_health(self, req: Request) -> Response:  # pylint: disable=unused-argument
+        return json_response(self.snapshot())
+
+    def install(self, app: web.Application):
+        app.middlewares.append(self.middleware)
+        app.router.add_get("/health", self.get_health)
+        app.on_startup.append(self._start_heartbeat)
+        app.on_shutdown.append(self._stop_heartbeat)
+
+    async def _start_heartbeat(self, app: web.Application):  # pylint: disable=unused-argument
+        self._heartbeat = asyncio.ensure_future(self._beat())
+
+    async def _stop_heartbeat(self, app: web.Application):  # pylint: disable=unused-argument
+        self._heartbeat.cancel()
+        self._reports.put({**self.snapshot(), "status": "stopping"})
+
+    async def _beat(self):
+        while True:
+            self._reports.put({**self.snapshot(), "status": "serving"})
+            await asyncio.sleep(self._interval_seconds)
+
+
+def _serve(
+    app_factory: Callable[[], web.Application],
+    host: str,
+    port: int,
+    index: int,
+    reports: multiprocessing.Queue,
+    health_interval_seconds: float,
+    shutdown_timeout_seconds: float,
+):
+    app = app_factory()
+    WorkerHealth(index, reports, health_interval_seconds).install(app)
+    # SIGTERM and SIGINT make run_app stop accepting connections, wait for the
+    # requests in flight and run the application's cleanup handlers.
+    web.run_app(
+        app,
+        sock=create_socket(host, port),
+        shutdown_timeout=shutdown_timeout_seconds,
+        print=None,
+    )
+
+
+class WorkerPool:
+    """
+    Runs `app_factory()` in `workers` processes listening on the same port.
+
+    The kernel spreads incoming connections over the workers (SO_REUSEPORT).
+    Workers are started with the "spawn" method, so each builds its own
+    adapter, storage and clients; bot state must therefore live in a store all
+    of them can reach. Every worker serves `GET /health` and reports the same
+    numbers to the pool, which restarts workers that exit or stop reporting.
+    """
+
+    def __init__(
+        self,
+        app_factory: Callable[[], web.Application],
+        host: str,
+        port: int,
+        workers: int,
+        health_interval_seconds: float = 5.0,
+        shutdown_timeout_seconds: float = 30.0,
+    ):
+        self.app_factory = app_factory
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.health_interval_seconds = health_interval_seconds
+        self.shutdown_timeout_seconds = shutdown_timeout_seconds
+        self.health: Dict[int, Dict[str, object]] = {}
+        self.restarts = 0
+        self._context = multiprocessing.get_context("spawn")
+        self._reports = self._context.Queue()
+        self._processes: List[multiprocessing.Process] = [None] * workers
+        self._last_report: Dict[int, float] = {}
+        self._stopping = False
+
+    @property
+    def pids(self) -> List[int]:
+        return [process.pid for process in self._processes if process is not None]
+
+    def start(self):
+        # Binding here first reports a port already in use before any worker starts.
+        create_socket(self.host, self.port).close()
+        for index in range(self.workers):
+            self._spawn(index)
+
+    def poll(self, timeout: float = None):
+        """Collects health reports and replaces workers that died or went silent."""
+        deadline = time.monotonic() + (timeout or 0.0)
+        while True:
+            try:
+                report = self._reports.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            self.health[report["worker"]] = report
+            self._last_report[report["worker"]] = time.monotonic()
+
+        if self._stopping:
+            return
+        silent_after = 3 * self.health_interval_seconds + self.shutdown_timeout_seconds
+        for index, process in enumerate(self._processes):
+            silent = time.monotonic() - self._last_report.get(index, 0.0) > silent_after
+            if process.is_alive() and not silent:
+                continue
+            print(
+                f"Worker {index} (pid {process.pid}) "
+                f"{'stopped reporting' if process.is_alive() else f'exited with {process.exitcode}'}"
+                ", restarting it.",
+                file=sys.stderr,
+            )
+            if process.is_alive():
+                process.kill()
+                process.join()
+            self.restarts += 1
+            self._spawn(index)
+
+    def stop(self):
+        """Asks every worker to finish its requests and waits for it to exit."""
+        self._stopping = True
+        processes = [process for process in self._processes if process is not None]
+        for process in processes:
+            if process.is_alive():
+                os.kill(process.pid, signal.SIGTERM)
+        deadline = time.monotonic() + self.shutdown_timeout_seconds + 5.0
+        for process in processes:
+            process.join(max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                process.kill()
+                process.join()
+        self.poll()
+
+    def run(self):
+        """Serves until SIGINT or SIGTERM, then shuts the workers down."""
+        self.start()
+        stop_signals = []
+
+        def request_stop(signum, frame):  # pylint: disable=unused-argument
+            stop_signals.append(signum)
+
+        previous = {
+            signum: signal.signal(signum, request_stop)
+            for signum in (signal.SIGINT, signal.SIGTERM)
+        }
+        try:
+            print(
+                f"======== Running on http://{self.host}:{self.port} "
+                f"with {self.workers} workers ========"
+            )
+            while not stop_signals:
+                self.poll(self.health_interval_seconds)
+        finally:
+            self.stop()
+            for signum, handler in previous.items():
+                signal.signal(signum, handler)
+
+    def _spawn(self, index: int):
+        process = self._context.Process(
+            target=_serve,
+            args=(
+                self.app_factory,
+                self.host,
+                self.port,
+                index,
+                self._reports,
+                self.health_interval_seconds,
+                self.shutdown_timeout_seconds,
+            ),
+            name=f"bot-worker-{index}",
+            daemon=False,
+        )
+        process.start()
+        self._processes[index] = process
+        self._last_report[index] = time.monotonic()